@@ -165,7 +165,8 @@ class Logic:
                                       self._net_console,
                                       masterScreen,
                                       self._configuration['port'],
-                                      complements)
+                                      complements,
+                                      self._configuration['network'])
             self._update_status()
             self.update_user_files(True)
 
@@ -299,6 +300,14 @@ class Logic:
         self._screens.send_to_blender_player('console_to_virtual_environment',
                                                                     message)
 
+    def profileSynchronization(self, enable):
+        """Start or stop profiling the synchronization on the master: the
+        report is written to its log when stopping"""
+        if self.get_blender_player_state() != 'running':
+            return False
+        self._screens.send_to_blender_player('profile_synchronization',
+                                             enable)
+
     def receivedFromVirtualEnvironment(self, message):
         if self._processor:
             command, argument = protocol.decomposeMessage(message)
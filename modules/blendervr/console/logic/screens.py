@@ -48,7 +48,7 @@ class Logic:
         self.set_screens({}, None, None, None, None)
 
     def set_screens(self, configurations, net_console, master_name,
-                                                        port, complements):
+                                port, complements, synchronization=None):
         to_remove = []
         for name in list(self._screens.keys()):
             if name not in configurations:
@@ -72,14 +72,23 @@ class Logic:
 
         #TODO : remove connexion and slaves !
         self._master_name = master_name
+        # Only the master needs the synchronization configuration: it
+        # announces the codec to the slaves at the beginning of the session
+        # The slaves running on the computer of the master share its memory
+        master_hostname = self.getMaster().getHostname()
+        local_nodes = [name for name, obj in self._screens.items()
+                       if name != self._master_name
+                       and obj.getHostname() == master_hostname]
         self.getMaster().setHierarchy({'port': port,
-                                       'nodes': list(self._screens.keys())})
+                                       'nodes': list(self._screens.keys()),
+                                       'local_nodes': local_nodes,
+                                       'synchronization': synchronization or {}})
 
-        slave_informations = {'port': port,
-                              'master': self.getMaster().getHostname()}
         for name, obj in self._screens.items():
             if name != self._master_name:
-                obj.setHierarchy(slave_informations)
+                obj.setHierarchy({'port': port,
+                                  'master': master_hostname,
+                                  'local': name in local_nodes})
         obj = None
 
         self.update_gui()
@@ -67,6 +67,8 @@ class GUI(base.Base, common_GUI):
         self._options_ui.reload_processor.clicked.connect(
                                                     self.cb_reload_processor)
         self._options_ui.executables.stateChanged.connect(self.cb_executables)
+        self._options_ui.profile_synchronization.stateChanged.connect(
+                                            self.cb_profile_synchronization)
 
     def __del__(self):
         common_GUI.__del__(self)
@@ -106,6 +108,10 @@ class GUI(base.Base, common_GUI):
         self.profile.setValue(['debug', 'processor'],
                                 self._options_ui.debug_processor.isChecked())
 
+    def cb_profile_synchronization(self):
+        self.getConsole().profileSynchronization(
+                    self._options_ui.profile_synchronization.isChecked())
+
     def cb_restart_daemons(self):
         for name, obj in self.getConsole()._screens._screens.items():
             obj.restartDaemon()
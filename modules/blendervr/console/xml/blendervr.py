@@ -40,13 +40,14 @@ class XML(base.XML):
 
     def __init__(self, parent, name, attrs):
         super(XML, self).__init__(parent, name, attrs)
-        self._class_list     += ['computers', 'screens', 'users', 'processors', 'starter', 'plugins']
+        self._class_list     += ['computers', 'screens', 'users', 'processors', 'starter', 'plugins', 'network']
         self._attribute_list += ['port', 'focus_master']
         self._computers       = None
         self._screens         = None
         self._users           = None
         self._processors      = None
         self._starter         = None
+        self._network         = None
 
         if 'port' in attrs:
             self._port = attrs['port']
@@ -66,7 +67,7 @@ class XML(base.XML):
         getattr(self, _name)[node_name] = node_obj
 
     def _getChildren(self, name, attrs):
-        for module_name in ('system', 'display', 'behaviour', 'starter', 'processors', 'plugins'):
+        for module_name in ('system', 'display', 'behaviour', 'starter', 'processors', 'plugins', 'network'):
             if name == module_name:
                 module = importlib.import_module('..'+module_name, __name__)
                 setattr(self, '_'+module_name, module.XML(self, name, attrs))
@@ -0,0 +1,87 @@
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer, 
+## 
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+## 
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use, 
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info". 
+## 
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability. 
+## 
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or 
+## data to be ensured and,  more generally, to use and operate it in the 
+## same conditions as regards security. 
+## 
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+## 
+
+from . import base
+
+CODECS = ('raw', 'quantized')
+
+class XML(base.mono):
+    def __init__(self, parent, name, attrs):
+        super(XML, self).__init__(parent, name, attrs)
+        self._attribute_list += ['codec', 'position_precision', 'orientation_bits',
+                                 'transform_epsilon', 'byte_budget', 'record',
+                                 'late_latch']
+
+        self._codec              = None
+        self._position_precision = None
+        self._orientation_bits   = None
+        self._transform_epsilon  = None
+        self._byte_budget        = None
+        self._record             = None
+        self._late_latch         = None
+
+        if 'codec' in attrs:
+            self._codec = attrs['codec'].lower()
+            if self._codec not in CODECS:
+                self.raise_error('Invalid network codec (' + self._codec + ') : must be one of ' + ', '.join(CODECS))
+        if 'position_precision' in attrs:
+            self._position_precision = attrs['position_precision']
+        if 'orientation_bits' in attrs:
+            self._orientation_bits = attrs['orientation_bits']
+        if 'transform_epsilon' in attrs:
+            self._transform_epsilon = attrs['transform_epsilon']
+        if 'byte_budget' in attrs:
+            self._byte_budget = attrs['byte_budget']
+        if 'record' in attrs:
+            self._record = attrs['record']
+        if 'late_latch' in attrs:
+            self._late_latch = self.getBoolean(attrs['late_latch'])
+
+    def _default(self):
+        super(XML, self)._default()
+        if self._codec is None:
+            self._codec = 'raw'
+        if self._position_precision is None:
+            self._position_precision = '0.0001'
+        if self._orientation_bits is None:
+            self._orientation_bits = '20'
+        if self._transform_epsilon is None:
+            self._transform_epsilon = '0'
+        if self._byte_budget is None:
+            self._byte_budget = '0'
+        if self._record is None:
+            self._record = ''
+        if self._late_latch is None:
+            self._late_latch = False
@@ -45,9 +45,11 @@ Player Module
 
 import sys
 import os
+import time
 from . import exceptions
 from .buffer import Buffer
 from ..tools import protocol
+from ..tools import profiler
 
 from .. import is_virtual_environment
 if not is_virtual_environment():
@@ -55,10 +57,11 @@ if not is_virtual_environment():
 
 import bge
 LEFT_EYE = bge.render.LEFT_EYE
+RIGHT_EYE = bge.render.RIGHT_EYE
 
 class Main:
 
-    MESSAGE_PAUSE = b'p'
+    MESSAGE_PAUSE = profiler.MESSAGE_PAUSE
     MESSAGE_PROCESSOR = b'r'
 
     def __init__(self):
@@ -121,6 +124,13 @@ class Main:
             # standalone screen, resume can occure inside the constructor ...
             self._scene.suspend()
 
+            # Poses of the users latched by the master at the end of the
+            # frame, applied by the screen right before drawing
+            self._late_latch = bool(configuration['network'].get(
+                            'synchronization', {}).get('late_latch', False))
+            self._latched_poses = []
+            self._pose_latency = {}
+
             # Configure the network connexions: deals with network
             from . import network
             self._connector, self._net_synchro = network.getNetworks(
@@ -264,6 +274,8 @@ class Main:
 
                 # this has to be preppended so the screen pre_draw_setup callback runs afterwards
                 self._scene.pre_draw_setup.insert(0, self._pre_draw_setup)
+                if self.isMaster():
+                    self._scene.post_draw.append(self._post_draw)
                 self._startSimulation()
         except SystemExit:
             pass
@@ -309,7 +321,12 @@ class Main:
         try:
             self._controller.run()
             self._connector.run()
+            if hasattr(self, '_processor'):
+                self._processor.clock(self._net_synchro.getFrameNumber(),
+                                    self._net_synchro.getSimulationTime())
             self._plugin_hook('run')
+            if self._late_latch and self.isMaster():
+                self._latchPoses()
             self._connector.endFrame()
             self._connector.barrier()
 
@@ -321,6 +338,25 @@ class Main:
 
         self._previous_pre_draw_setup = True
 
+    def _post_draw(self):
+        """
+        runs on the master after the scene is drawn, for each eye
+        """
+
+        # The objects are drawn at the transforms decoded by the slaves up
+        # to the last eye
+        if self._is_stereo and bge.render.getStereoEye() != RIGHT_EYE:
+            return
+
+        try:
+            self._net_synchro.getSceneSynchronizer().restoreTransforms()
+
+        except SystemExit:
+            pass
+
+        except:
+            self.stopDueToError()
+
     def getComputerName(self):
         return self._computer_name
 
@@ -344,10 +380,99 @@ class Main:
         """Get the array of all the users"""
         return self._users
 
+    def setLateLatch(self, enable=True):
+        """Sample the freshest poses of the users at the end of each frame
+        and ship them to the slaves with it: the screens of all the nodes
+        apply them right before drawing (master only)"""
+        self._late_latch = enable
+
+    def _latchPoses(self):
+        # Last chance for the trackers to update the users
+        self._plugin_hook('latch')
+        buff = Buffer()
+        for user in self._users.values():
+            buff.unsigned_char(user.getID())
+            buff.double(user.getPositionTime())
+            buff.matrix_4x4(user.getPosition())
+        self._connector.sendLatch(buff)
+
+    def _latchFromMaster(self, buff):
+        users = dict((user.getID(), user) for user in self._users.values())
+        while not buff.isEmpty():
+            user = users[buff.unsigned_char()]
+            timestamp = buff.double()
+            self._latched_poses.append((user, buff.matrix_4x4(), timestamp))
+
+    def applyLatchedPoses(self, users):
+        """Apply the poses latched by the master, if any, then measure the
+        latency of the poses of users, that are going to be drawn (see
+        getPoseLatency())"""
+        for user, position, timestamp in self._latched_poses:
+            user.setPosition(position, timestamp)
+        del(self._latched_poses[:])
+        now = time.time()
+        self._pose_latency = dict((user.getName(),
+                                   now - user.getPositionTime())
+                                  for user in users)
+
+    def getPoseLatency(self):
+        """Get the time, in seconds, from the tracker sample of the pose of
+        each user of the screen to its last drawing, by user name. Between
+        computers, it includes the offset of their clocks"""
+        return self._pose_latency
+
+    def getNetworkStatistics(self):
+        """Get the number of socket syscalls and of bytes of the network
+        connector during the last frame, and its barrier latencies, as a
+        dictionary"""
+        return self._connector.getStatistics()
+
+    def startRecording(self, path):
+        """Record the synchronization stream inside the file path (master
+        only)"""
+        if self.isMaster():
+            self._connector.startRecording(path)
+
+    def stopRecording(self):
+        """Stop recording the synchronization stream (master only)"""
+        if self.isMaster():
+            self._connector.stopRecording()
+
+    def startSynchronizationProfile(self):
+        """Profile the synchronization stream (master only), see
+        blendervr.tools.profiler"""
+        if self.isMaster():
+            self._net_synchro.startProfile()
+
+    def stopSynchronizationProfile(self, top=10):
+        """Stop profiling the synchronization stream: log and return the
+        report, with its top objects"""
+        if not self.isMaster():
+            return None
+        profile = self._net_synchro.stopProfile()
+        if profile is None:
+            return None
+        report = profile.getReport(top)
+        self.logger.info(report)
+        return report
+
+    def getFrameNumber(self):
+        """Get the number of the current frame, shared by all the nodes"""
+        return self._net_synchro.getFrameNumber()
+
+    def getSimulationTime(self):
+        """Get the simulation time of the current frame, in seconds, shared
+        by all the nodes"""
+        return self._net_synchro.getSimulationTime()
+
     def getSceneSynchronizer(self):
         """Get the main synchronizer module"""
         return self._net_synchro.getSceneSynchronizer()
 
+    def getSynchronizationCodec(self):
+        """Get the codec of the poses inside the synchronization stream"""
+        return self._net_synchro.getCodec()
+
     def addObjectToSynchronize(self, object, name):
         """Add an object to the synchronizer"""
         self._net_synchro.addObjectToSynchronize(object, name)
@@ -444,6 +569,8 @@ class Main:
         if hasattr(self, '_pre_draw_setup') and \
                             self._pre_draw_setup in self._scene.pre_draw_setup:
             self._scene.pre_draw_setup.remove(self._pre_draw_setup)
+        if self._post_draw in self._scene.post_draw:
+            self._scene.post_draw.remove(self._post_draw)
 
     def _suspendResumeInternal(self):
         """Internal method to pause and resume the scene"""
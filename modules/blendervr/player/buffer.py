@@ -36,21 +36,67 @@
 ## knowledge of the CeCILL license and that you accept its terms.
 ##
 
+import sys
+import array
 import struct
 import mathutils
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_structs = {}
+
+
+def getStruct(format):
+    """Compiled struct.Struct for format, shared by all buffers"""
+    try:
+        return _structs[format]
+    except KeyError:
+        _structs[format] = struct.Struct(format)
+        return _structs[format]
+
+SIZE_STRUCT = getStruct('>i')
+NUMPY_TYPES = {'b': 'i1', 'B': 'u1', 'h': '>i2', 'H': '>u2', 'i': '>i4',
+               'I': '>u4', 'Q': '>u8', 'f': '>f4'}
+INITIAL_CAPACITY = 256
+
 
 class Buffer:
+    """Binary buffer used by the synchronization protocol.
+
+    A buffer created without data is a writer: it packs fields with
+    precompiled struct.Struct objects directly into a growable bytearray.
+    A buffer created from received data is a reader: it walks a memoryview
+    of that data with an offset cursor, so reading fields and sub-buffers
+    never copies the remaining bytes of the frame.
+    """
 
-    def __init__(self):
-        self._buffer = b''
+    def __init__(self, data=None):
+        if data is None:
+            self._buffer = bytearray(INITIAL_CAPACITY)
+            self._size = 0
+        else:
+            self._buffer = memoryview(data)
+            self._size = len(self._buffer)
+        self._offset = 0
 
     def __len__(self):
-        return len(self._buffer)
+        return self._size - self._offset
 
     def isEmpty(self):
         return (len(self) == 0)
 
+    def reset(self):
+        """Empty the buffer but keep its allocated memory for next frame"""
+        self._size = 0
+        self._offset = 0
+
+    def getData(self):
+        """Unread content of the buffer, as a memoryview (no copy)"""
+        return memoryview(self._buffer)[self._offset:self._size]
+
     def command(self, data=None):
         return self._simpleData('c', data)
 
@@ -60,11 +106,29 @@ class Buffer:
     def unsigned_char(self, data=None):
         return self._simpleData('B', data)
 
+    def unsigned_long(self, data=None):
+        return self._simpleData('>Q', data)
+
     def size(self, data=None):
         return self.integer(data)
 
     def itemID(self, data=None):
-        return self._simpleData('>Q', data)
+        """Identifier of a synchronized item, as an unsigned varint: seven
+        bits per byte, the high bit set on every byte but the last one"""
+        if data is None:
+            result = 0
+            shift = 0
+            while True:
+                byte = self._buffer[self._offset]
+                self._offset += 1
+                result |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    return result
+                shift += 7
+        while data >= 0x80:
+            self._pack('B', (data & 0x7f) | 0x80)
+            data >>= 7
+        self._pack('B', data)
 
     def integer(self, data=None):
         return self._simpleData('>i', data)
@@ -72,29 +136,110 @@ class Buffer:
     def float(self, data=None):
         return self._simpleData('>f', data)
 
+    def double(self, data=None):
+        return self._simpleData('>d', data)
+
+    def array(self, typecode, data=None):
+        """Homogeneous array of numbers, stored as its length followed by
+        its big-endian items.
+
+        Multi-dimensional numpy arrays are flattened, in row-major order.
+        On reading, the values are returned as a read-only numpy array over
+        the received data when numpy is available, as an array.array
+        otherwise."""
+        if data is None:
+            count = self.size()
+            if numpy is not None:
+                values = numpy.frombuffer(self._buffer,
+                                          NUMPY_TYPES[typecode], count,
+                                          self._offset)
+                self._offset += values.nbytes
+                return values
+            values = array.array(typecode)
+            end = self._offset + count * values.itemsize
+            values.frombytes(self._buffer[self._offset:end])
+            self._offset = end
+            if sys.byteorder == 'little':
+                values.byteswap()
+            return values
+        if numpy is not None and isinstance(data, numpy.ndarray):
+            data = data.astype(NUMPY_TYPES[typecode]).ravel()
+            self.size(data.size)
+            self._write(data.tobytes())
+            return
+        # Private copy, so it can be swapped in place
+        data = array.array(typecode, data)
+        if sys.byteorder == 'little':
+            data.byteswap()
+        self.size(len(data))
+        self._write(memoryview(data).cast('B'))
+
     def subBuffer(self, data=None):
         if data is None:
-            data = Buffer()
-            data._buffer = self._subBytes(None)
-            return data
-        self._subBytes(data._buffer)
+            return Buffer(self._subBytes(None))
+        self._subBytes(data.getData())
+
+    def openSubBuffer(self, header=b''):
+        """Start a sub-buffer written in place, after the header bytes.
+
+        Write its content directly into this buffer, then give the returned
+        position to closeSubBuffer() to back-patch its length prefix."""
+        start = self._size
+        position = self._reserve(len(header) + SIZE_STRUCT.size) \
+                                                            + len(header)
+        self._buffer[start:position] = header
+        return position
+
+    def closeSubBuffer(self, position, header=None):
+        """Back-patch the length prefix of the sub-buffer opened at
+        position, and return that length. An empty sub-buffer opened with a
+        header is dropped, with its header"""
+        size = self._size - position - SIZE_STRUCT.size
+        if size:
+            SIZE_STRUCT.pack_into(self._buffer, position, size)
+        elif header is not None:
+            self._size = position - len(header)
+        return size
+
+    def wrapSubBuffer(self, start, header=b''):
+        """Turn what has been written since start into a sub-buffer after
+        the header bytes, and return its length. Unlike openSubBuffer(),
+        nothing is reserved before the content is known: the content is
+        moved after its prefix, so wrap only small contents"""
+        size = self._size - start
+        prefix = len(header) + SIZE_STRUCT.size
+        self._reserve(prefix)
+        buffer = self._buffer
+        buffer[start + prefix:self._size] = buffer[start:start + size]
+        buffer[start:start + len(header)] = header
+        SIZE_STRUCT.pack_into(buffer, start + len(header), size)
+        return size
+
+    def raw(self, data=None, size=0):
+        """Bytes without length prefix: the reader must know their size.
+        They are read as a memoryview (no copy)"""
+        if data is None:
+            start = self._offset
+            self._offset += size
+            return memoryview(self._buffer)[start:self._offset]
+        self._write(data)
 
     def string(self, data=None):
         if data is None:
-            return self._subBytes(None).decode('UTF-8')
+            return str(self._subBytes(None), 'UTF-8')
         self._subBytes(bytes(data, 'UTF-8'))
 
     def vector_3(self, data=None):
         if data is None:
             data = self._extract(">3f")
             return mathutils.Vector(data)
-        self._buffer += struct.pack(">3f", data[0], data[1], data[2])
+        self._pack(">3f", data[0], data[1], data[2])
 
     def vector_4(self, data=None):
         if data is None:
             data = self._extract(">4f")
             return mathutils.Vector(data)
-        self._buffer += struct.pack(">4f", data[0], data[1], data[2], data[3])
+        self._pack(">4f", data[0], data[1], data[2], data[3])
 
     def matrix_3x3(self, data=None):
         if data is None:
@@ -102,9 +247,9 @@ class Buffer:
             return mathutils.Matrix(((data[0], data[1], data[2]),
                                      (data[3], data[4], data[5]),
                                      (data[6], data[7], data[8])))
-        self._buffer += struct.pack(">9f", data[0][0], data[0][1], data[0][2],
-                                           data[1][0], data[1][1], data[1][2],
-                                           data[2][0], data[2][1], data[2][2])
+        self._pack(">9f", data[0][0], data[0][1], data[0][2],
+                          data[1][0], data[1][1], data[1][2],
+                          data[2][0], data[2][1], data[2][2])
 
     def matrix_4x4(self, data=None):
         if data is None:
@@ -115,7 +260,7 @@ class Buffer:
                          (data[8], data[9], data[10], data[11]),
                          (data[12], data[13], data[14], data[15])))
 
-        self._buffer += struct.pack(">16f",
+        self._pack(">16f",
                         data[0][0], data[0][1], data[0][2], data[0][3],
                         data[1][0], data[1][1], data[1][2], data[1][3],
                         data[2][0], data[2][1], data[2][2], data[2][3],
@@ -123,60 +268,89 @@ class Buffer:
 
     def addPrefix(self, prefix):
         if isinstance(prefix, Buffer):
-            self._buffer = prefix._buffer + self._buffer
+            content = bytes(self.getData())
+            self.reset()
+            self._write(prefix.getData())
+            self._write(content)
             return self
 
+    def _reserve(self, size):
+        """Reserve size bytes at the end of the buffer, return their
+        position"""
+        position = self._size
+        self._size += size
+        if self._size > len(self._buffer):
+            # Reallocate rather than resize: views given by getData() or
+            # read sub-buffers may still reference the previous storage.
+            buffer = bytearray(max(self._size, 2 * len(self._buffer)))
+            buffer[:position] = self._buffer[:position]
+            self._buffer = buffer
+        return position
+
+    def _write(self, data):
+        position = self._reserve(len(data))
+        self._buffer[position:self._size] = data
+
+    def _pack(self, format, *data):
+        codec = getStruct(format)
+        position = self._reserve(codec.size)
+        codec.pack_into(self._buffer, position, *data)
+
     def _subBytes(self, data=None):
         if data is None:
             size = self.size()
-            buff = self._buffer[:size]
-            self._buffer = self._buffer[size:]
-            return buff
+            start = self._offset
+            self._offset += size
+            return memoryview(self._buffer)[start:self._offset]
         self.size(len(data))
-        self._buffer += data
+        self._write(data)
 
     def _extract(self, format):
-        values = struct.unpack_from(format, self._buffer)
-        self._buffer = self._buffer[struct.calcsize(format):]
+        codec = getStruct(format)
+        values = codec.unpack_from(self._buffer, self._offset)
+        self._offset += codec.size
         return values
 
     def _simpleData(self, format, data):
         if data is None:
             data = self._extract(format)
             return data[0]
-        self._buffer += struct.pack(format, data)
+        self._pack(format, data)
 
     def __iadd__(self, other):
         if isinstance(other, Buffer):
-            self._buffer += other._buffer
+            self._write(other.getData())
             return self
 
     def __add__(self, other):
         if isinstance(other, Buffer):
             result = Buffer()
-            result._buffer = self._buffer + other._buffer
+            result._write(self.getData())
+            result._write(other.getData())
             return result
 
 
 def data_size(data_type):
     if data_type == 'command':
-        return struct.calcsize('c')
+        return getStruct('c').size
     if data_type == 'boolean':
-        return struct.calcsize('?')
+        return getStruct('?').size
     if data_type == 'unsigned_char':
-        return struct.calcsize('B')
+        return getStruct('B').size
     if data_type == 'size':
         return data_size('integer')
     if data_type == 'itemID':
-        return struct.calcsize('>Q')
+        # Maximal size of the varint of a 64 bits identifier
+        return 10
     if data_type == 'integer':
-        return struct.calcsize('>i')
+        return getStruct('>i').size
     if data_type == 'float':
-        return struct.calcsize('>f')
+        return getStruct('>f').size
+    if data_type == 'double':
+        return getStruct('>d').size
     if data_type == 'vector3':
-        return struct.calcsize('>3f')
+        return getStruct('>3f').size
     if data_type == 'matrix_3x3':
-        return struct.calcsize('>9f')
+        return getStruct('>9f').size
     if data_type == 'matrix_4x4':
-        return struct.calcsize('>16f')
-
+        return getStruct('>16f').size
@@ -60,7 +60,8 @@ def getNetworks(BlenderVR, config):
         if 'master' in config:
             synchronizer_object = synchronizer.Slave(BlenderVR)
         else:
-            synchronizer_object = synchronizer.Master(BlenderVR)
+            synchronizer_object = synchronizer.Master(BlenderVR,
+                                    config.get('synchronization', {}))
 
     connector_object._synchronizer = synchronizer_object
     synchronizer_object._connector = connector_object
@@ -36,29 +36,67 @@
 ## knowledge of the CeCILL license and that you accept its terms.
 ##
 
+import os
+import mmap
 import struct
 import socket
+import tempfile
 import select
+import selectors
+import time
 from .. import exceptions
 from .. import base
 from ..buffer import Buffer
+from ...tools import recording
+from ...tools import profiler
 #import time
 
-# Beware: we limit to 256 nodes
-ID_SIZE = 1024
+# Size of the screen name sent by each slave when it connects
+ID_SIZE = recording.ID_SIZE
 SIZE_FORMAT = '>i'
 SIZE_SIZE = struct.calcsize(SIZE_FORMAT)
 
-COMMAND_SIZE = 1
-EVERYBODY_HERE = b'r'
-BARRIER = b'b'
+COMMAND_SIZE = recording.COMMAND_SIZE
+EVERYBODY_HERE = recording.EVERYBODY_HERE
+BARRIER = recording.BARRIER
+NACK = b'n'
+# Sent by a slave before its barrier token, with the identifier of a
+# synchronized object whose whole state it needs again
+RESEND = recording.RESEND
+RESEND_ID = recording.RESEND_ID
+
+# Multicast frames are cut in fragments that fit inside an ethernet frame.
+# Each fragment starts with the sequence number of the frame, its index and
+# the number of fragments of the frame.
+FRAGMENT_SIZE = 1400
+FRAGMENT_HEADER = struct.Struct('>IHH')
+MULTICAST_ANNOUNCE = struct.Struct('>IH')
+FRAGMENT_INDEX = struct.Struct('>H')
+MULTICAST_TIMEOUT = 0.02
+MULTICAST_RECEIVE_BUFFER = 4 * 1024 * 1024
+
+# The slaves running on the computer of the master read the frames inside a
+# file mapped in memory: only the size of each frame goes through TCP. The
+# master creates the file, readable only by its user, and sends its path to
+# these slaves when everybody is connected
+SHARED_FRAME_PREFIX = 'blendervr-'
+SHARED_FRAME_SUFFIX = '.frame'
+SHARED_ANNOUNCE = struct.Struct('>I')
+SHARED_INITIAL_SIZE = 1024 * 1024
+
+# Slaves receive their frames inside a buffer that grows to the biggest frame
+RECEIVE_INITIAL_SIZE = 64 * 1024
 
 
 class Connector(base.Base):
 
-    CMD_FINISHED = b'f'
-    CMD_MSG = b'm'
-    CMD_SYNCHRO = b's'
+    CMD_FINISHED = recording.CMD_FINISHED
+    CMD_MSG = recording.CMD_MSG
+    CMD_SYNCHRO = recording.CMD_SYNCHRO
+    CMD_MULTICAST = b'u'
+    CMD_SHARED = b'l'
+    # Freshest poses of the users, at the end of the frame
+    CMD_LATCH = recording.CMD_LATCH
 
     def __init__(self, parent, config):
         base.Base.__init__(self, parent)
@@ -75,6 +113,23 @@ class Connector(base.Base):
 
         self.isReady = lambda *args: False
 
+        self._statistics = self._newStatistics()
+        self._frameStatistics = self._newStatistics()
+        self._multicast = None
+        self._shared = None
+
+    def getStatistics(self):
+        """Number of socket syscalls and of bytes sent or received by this
+        node during the last frame, and the time spent in its barrier"""
+        return self._frameStatistics
+
+    def _newStatistics(self):
+        return {'syscalls': 0, 'bytes': 0, 'barrier': None}
+
+    def _endFrameStatistics(self):
+        self._frameStatistics = self._statistics
+        self._statistics = self._newStatistics()
+
     def selectSocket(self):
         inputready, outputready, exceptready = \
                                     select.select([self._socket], [], [])
@@ -87,6 +142,8 @@ class Connector(base.Base):
             data = b''
             while len(data) < size:
                 chunk = socket.recv(size - len(data))
+                self._statistics['syscalls'] += 1
+                self._statistics['bytes'] += len(chunk)
                 if len(chunk) == 0:
                     raise Exception()
                 data += chunk
@@ -100,6 +157,8 @@ class Connector(base.Base):
             buffer_size = len(buffer)
             while sended_size < buffer_size:
                 chunk_size = socket.send(buffer[sended_size:])
+                self._statistics['syscalls'] += 1
+                self._statistics['bytes'] += chunk_size
                 if chunk_size == 0:
                     raise Exception()
                 sended_size += chunk_size
@@ -114,7 +173,12 @@ class Master(Connector):
         self.isMaster = lambda *args: True
 
         self._number_slaves = len(config['nodes']) - 1
+        self._local_nodes = config.get('local_nodes', [])
         self._clients = {}
+        # Barrier tokens of all the clients are gathered through epoll (or
+        # the best mechanism of the platform), that is not limited in the
+        # number of sockets as select is
+        self._selector = selectors.DefaultSelector()
 
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -122,12 +186,33 @@ class Master(Connector):
         self._socket.listen(self._number_slaves)
 
         self._session = self.CMD_FINISHED
+        # The whole frame is assembled here and sent once per client
+        self._frame = Buffer()
 
         if self._address is not None:
             self._multicast = socket.socket(socket.AF_INET,
                                     socket.SOCK_DGRAM, socket.IPPROTO_UDP)
             self._multicast.setsockopt(socket.IPPROTO_IP,
                                     socket.IP_MULTICAST_TTL, 2)
+            self._sequence = 0
+            # Fragments of the last frame, kept to repair slaves that lost
+            # some of them
+            self._fragments = []
+
+        if len(self._local_nodes) > 0:
+            # mkstemp never opens an existing file (nor follows a symbolic
+            # link) and gives it the 0600 mode
+            descriptor, self._shared_path = tempfile.mkstemp(
+                            prefix=SHARED_FRAME_PREFIX,
+                            suffix=SHARED_FRAME_SUFFIX)
+            self._shared_file = os.fdopen(descriptor, 'w+b')
+            self._mapSharedFile(SHARED_INITIAL_SIZE)
+
+        self._recorder = None
+        self._recorder_waiting = False
+        record = config.get('synchronization', {}).get('record')
+        if record:
+            self.startRecording(record)
 
     def wait_for_everybody(self):
         if (self._number_slaves > 0) and self.selectSocket():
@@ -147,10 +232,17 @@ class Master(Connector):
                                                 "already defined !")
             self._clients[client_socket] = {'name': screen_name,
                                             'socket': client_socket,
-                                            'address': address}
+                                            'address': address,
+                                            'local': (screen_name in
+                                                      self._local_nodes)}
+            self._selector.register(client_socket, selectors.EVENT_READ)
         if len(self._clients) == self._number_slaves:
-            for client in self._clients.keys():
+            for client, information in self._clients.items():
                 client.send(EVERYBODY_HERE)
+                if information['local']:
+                    path = self._shared_path.encode()
+                    self.sendTo(client,
+                                struct.pack(SIZE_FORMAT, len(path)) + path)
             self.isReady = lambda *args: True
 
     def run(self):
@@ -158,21 +250,145 @@ class Master(Connector):
 
     def endFrame(self):
         self.send(self.CMD_FINISHED, None)
+        if self.isReady():
+            frame = self._frame.getData()
+            remotes = [client for client, information
+                       in self._clients.items() if not information['local']]
+            if len(remotes) < len(self._clients):
+                self._shareFrame(frame)
+            if self._multicast is not None:
+                if len(remotes) > 0:
+                    self._multicastFrame(frame, remotes)
+            else:
+                for client in remotes:
+                    self.sendTo(client, frame)
+            if self._recorder is not None:
+                # A recording started during the session waits for the frame
+                # holding the snapshot of the synchronization
+                if self._recorder_waiting:
+                    self._recorder_waiting = \
+                                    self._synchronizer.isSnapshotPending()
+                if not self._recorder_waiting:
+                    self._recorder.addFrame(frame)
+            del(frame)
+            self._frame.reset()
+
+    def startRecording(self, path):
+        """Write each frame sent to the slaves inside the recording file
+        path (see blendervr.tools.recording). During the session, the
+        recording starts at next frame, with a snapshot of everything the
+        previous frames created"""
+        self.stopRecording()
+        self._recorder = recording.Recorder(path)
+        self._recorder_waiting = hasattr(self, '_synchronizer')
+        if self._recorder_waiting:
+            self._synchronizer.sendSnapshot()
+        self.logger.info('Recording the synchronization inside', path)
+
+    def stopRecording(self):
+        if self._recorder is not None:
+            self._recorder.close()
+            self.logger.info('Recorded', self._recorder.getFramesNumber(),
+                             'frames inside', self._recorder.getPath())
+            self._recorder = None
+
+    def _mapSharedFile(self, size):
+        # Growing the file does not invalidate the mapping of the slaves:
+        # they map it again when they see a bigger frame
+        if self._shared is not None:
+            self._shared.close()
+        self._shared_file.truncate(size)
+        self._shared = mmap.mmap(self._shared_file.fileno(), size)
+
+    def _shareFrame(self, frame):
+        """Write the frame once inside the shared file, then announce its
+        size to the slaves of this computer. The barrier guarantees that they
+        all read the previous frame before it is overwritten"""
+        size = len(frame)
+        if size > len(self._shared):
+            self._mapSharedFile(max(size, 2 * len(self._shared)))
+        self._shared[:size] = frame
+        announce = self.CMD_SHARED + SHARED_ANNOUNCE.pack(size)
+        for client, information in self._clients.items():
+            if information['local']:
+                self.sendTo(client, announce)
+
+    def _multicastFrame(self, frame, clients):
+        """Send the frame once to the given slaves through the multicast
+        group, then announce it on each of their TCP connexion"""
+        self._sequence = (self._sequence + 1) & 0xffffffff
+        self._fragments = [bytes(frame[index:index + FRAGMENT_SIZE])
+                           for index in range(0, len(frame), FRAGMENT_SIZE)]
+        count = len(self._fragments)
+        for index, fragment in enumerate(self._fragments):
+            datagram = FRAGMENT_HEADER.pack(self._sequence, index, count) \
+                                                                + fragment
+            self._multicast.sendto(datagram, (self._address, self._port))
+            self._statistics['syscalls'] += 1
+            self._statistics['bytes'] += len(datagram)
+        announce = self.CMD_MULTICAST \
+                        + MULTICAST_ANNOUNCE.pack(self._sequence, count)
+        for client in clients:
+            self.sendTo(client, announce)
+
+    def _repairFrame(self, client):
+        """Send back through TCP the fragments a slave did not receive"""
+        sequence, count = MULTICAST_ANNOUNCE.unpack(
+                    self.receiveFrom(client, MULTICAST_ANNOUNCE.size))
+        indexes = self.receiveFrom(client, count * FRAGMENT_INDEX.size)
+        if sequence != self._sequence:
+            self._loosedConnexion(client)
+            return
+        self.logger.debug('Repair', count, 'multicast fragments of frame',
+                          sequence, 'for',  self._clients[client]['name'])
+        repair = Buffer()
+        for index in range(count):
+            index = FRAGMENT_INDEX.unpack_from(indexes,
+                                               index * FRAGMENT_INDEX.size)[0]
+            repair.subBuffer(Buffer(self._fragments[index]))
+        self.sendTo(client, repair.getData())
 
     def barrier(self):
+        """Wait for the barrier tokens of all the clients, in their order of
+        arrival, then release them all. The arrival latency of each client,
+        in seconds, is recorded in the statistics"""
         if self.isReady():
-            for client in self._clients.keys():
-                message = self.receiveFrom(client, COMMAND_SIZE)
-                if message != BARRIER:
-                    self._loosedConnexion(client)
+            start = time.time()
+            latencies = {}
+            waiting = set(self._clients.keys())
+            while waiting:
+                events = self._selector.select()
+                self._statistics['syscalls'] += 1
+                for key, mask in events:
+                    client = key.fileobj
+                    if client not in waiting:
+                        continue
+                    message = self.receiveFrom(client, COMMAND_SIZE)
+                    if message == NACK:
+                        self._repairFrame(client)
+                        continue
+                    if message == RESEND:
+                        object_id = RESEND_ID.unpack(self.receiveFrom(
+                                            client, RESEND_ID.size))[0]
+                        self._synchronizer.resendObject(object_id)
+                        continue
+                    if message != BARRIER:
+                        self._loosedConnexion(client)
+                        return
+                    latencies[self._clients[client]['name']] = \
+                                                        time.time() - start
+                    waiting.discard(client)
             for client in self._clients.keys():
                 self.sendTo(client, BARRIER)
+            self._statistics['barrier'] = latencies
+        self._endFrameStatistics()
 
     def quit(self, reason):
         if hasattr(self, '_socket'):
             clients = list(self._clients.keys())
             for client in clients:
                 try:
+                    self._selector.unregister(client)
                     client.shutdown(socket.SHUT_RDWR)
                     client.close()
                     del(self._clients[client])
@@ -182,6 +398,15 @@ class Master(Connector):
                 client = None
             del(clients)
             del(self._socket)
+            if self._shared is not None:
+                try:
+                    self._shared.close()
+                    self._shared_file.close()
+                    os.remove(self._shared_path)
+                except:
+                    self.logger.log_traceback(False)
+                self._shared = None
+            self.stopRecording()
             self.BlenderVR._quitByNetwork(reason)
 
     def send(self, session, buff):
@@ -189,24 +414,36 @@ class Master(Connector):
             return
         if self._session != session:
             if self._session is not self.CMD_FINISHED:
-                self._sendSize(0)
+                self._frame.size(0)
                 self._session = None
             if session == self.CMD_MSG or\
                      session == self.CMD_SYNCHRO or \
+                     session == self.CMD_LATCH or \
                      session == self.CMD_FINISHED:
                 self._session = session
-                self._sending(self._session)
-        if (session == self.CMD_MSG or session == self.CMD_SYNCHRO) and \
-                                                        (len(buff) > 0):
-            self._sendSize(len(buff._buffer))
-            self._sending(buff._buffer)
+                self._frame.command(self._session)
+        if (session == self.CMD_MSG or session == self.CMD_SYNCHRO or
+                session == self.CMD_LATCH) and (len(buff) > 0):
+            self._frame.subBuffer(buff)
 
     def sendToSlave(self, buff):
         self.send(self.CMD_MSG, buff)
+        profile = self._synchronizer.getProfile()
+        if profile is not None and self.isReady():
+            profile.addCommand(profiler.getMessageCategory(buff.getData()),
+                               len(buff))
+
+    def sendLatch(self, buff):
+        """Send the latched poses, as the trailer of the frame"""
+        self.send(self.CMD_LATCH, buff)
+        profile = self._synchronizer.getProfile()
+        if profile is not None and self.isReady():
+            profile.addCommand('LATE_LATCH', len(buff))
 
     def _loosedConnexion(self, client):
         if client in self._clients:
             try:
+                self._selector.unregister(client)
                 client.shutdown(socket.SHUT_RDWR)
                 client.close()
             except:
@@ -219,17 +456,6 @@ class Master(Connector):
             message = 'Loosed connexion to a client'
         self.BlenderVR.quit(message)
 
-    def _sendSize(self, size):
-        self._sending(struct.pack(SIZE_FORMAT, size))
-
-    def _sending(self, data):
-        clients = list(self._clients.keys())
-        if len(clients) > 0:
-            inputready, outputready, exceptready = \
-                                            select.select([], clients, [])
-            for client in clients:
-                self.sendTo(client, data)
-
 
 class Slave(Connector):
 
@@ -238,8 +464,20 @@ class Slave(Connector):
         self.isMaster = lambda *args: False
 
         self._master = config['master']
+        # The master runs on the same computer: it shares its frames through
+        # memory instead of the network
+        self._local = config.get('local', False)
 
         self._command = None
+        self._shared_path = None
+        # Synchronized objects to send again, asked with the next barrier
+        self._resend = []
+
+        # Bytes received from the master lie between _received_start and
+        # _received_end of this buffer
+        self._received = bytearray(RECEIVE_INITIAL_SIZE)
+        self._received_start = 0
+        self._received_end = 0
 
     def wait_for_everybody(self):
         if not hasattr(self, '_socket'):
@@ -260,39 +498,143 @@ class Slave(Connector):
             self.logger.info('Connected to master, waiting everybody '
                              'connected !')
 
+            if self._address is not None and not self._local:
+                self._joinMulticastGroup()
+
         if self.selectSocket():
             ready = self._socket.recv(COMMAND_SIZE)
             if ready != EVERYBODY_HERE:
                 raise exceptions.Controller("Protocol error: server don't "
                                             "send Everybody is here !")
+            if self._local:
+                self._shared_path = bytes(
+                            self._receive(self._receiveSize())).decode()
             self.isReady = lambda *args: True
 
     def run(self):
+        self._compactReceived()
+        command = bytes(self._receive(COMMAND_SIZE))
+        if command == self.CMD_MULTICAST:
+            frame = Buffer(self._receiveMulticastFrame())
+            self._processFrame(lambda size: frame.raw(size=size))
+        elif command == self.CMD_SHARED:
+            frame = Buffer(self._readSharedFrame())
+            self._processFrame(lambda size: frame.raw(size=size))
+        else:
+            self._processFrame(
+                        lambda size: self._receive(size),
+                        command)
+
+    def _processFrame(self, read, command=None):
+        """Dispatch the sub-buffers of a frame, given the function that reads
+        its next bytes"""
         while True:
-            command = self.receiveFrom(self._socket, COMMAND_SIZE)
+            if command is None:
+                command = bytes(read(COMMAND_SIZE))
             if command == self.CMD_MSG:
-                command = self.BlenderVR._messageFromMaster
+                callback = self.BlenderVR._messageFromMaster
             elif command == self.CMD_SYNCHRO:
-                command = self._synchronizer.process
+                callback = self._synchronizer.process
+            elif command == self.CMD_LATCH:
+                callback = self.BlenderVR._latchFromMaster
             else:     # self.CMD_FINISHED
                 break
             while True:
-                size = self._receiveSize()
+                size = struct.unpack_from(SIZE_FORMAT, read(SIZE_SIZE))[0]
                 if size == 0:
                     break
-                buff = Buffer()
-                buff._buffer = self.receiveFrom(self._socket, size)
-                command(buff)
+                callback(Buffer(read(size)))
+            command = None
+
+    def _joinMulticastGroup(self):
+        self._multicast = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
+                                        socket.IPPROTO_UDP)
+        # Several blenderplayers can run on the same computer
+        self._multicast.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._multicast.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                   MULTICAST_RECEIVE_BUFFER)
+        self._multicast.bind(('', self._port))
+        group = struct.pack('4sl', socket.inet_aton(self._address),
+                            socket.INADDR_ANY)
+        self._multicast.setsockopt(socket.IPPROTO_IP,
+                                   socket.IP_ADD_MEMBERSHIP, group)
+        self._multicast.settimeout(MULTICAST_TIMEOUT)
+
+    def _receiveMulticastFrame(self):
+        """Gather the fragments of the frame announced by the master, and
+        ask it for the missing ones through TCP"""
+        sequence, count = MULTICAST_ANNOUNCE.unpack(
+                    self._receive(MULTICAST_ANNOUNCE.size))
+        fragments = [None] * count
+        missing = count
+        while missing > 0:
+            try:
+                datagram = self._multicast.recv(FRAGMENT_HEADER.size
+                                                + FRAGMENT_SIZE)
+            except socket.timeout:
+                break
+            self._statistics['syscalls'] += 1
+            self._statistics['bytes'] += len(datagram)
+            frame_sequence, index, frame_count = \
+                                        FRAGMENT_HEADER.unpack_from(datagram)
+            # Late fragments of previous frames are dropped
+            if frame_sequence != sequence or fragments[index] is not None:
+                continue
+            fragments[index] = datagram[FRAGMENT_HEADER.size:]
+            missing -= 1
+
+        if missing > 0:
+            indexes = [index for index in range(count)
+                       if fragments[index] is None]
+            request = Buffer()
+            request.command(NACK)
+            request.raw(MULTICAST_ANNOUNCE.pack(sequence, len(indexes)))
+            for index in indexes:
+                request.raw(FRAGMENT_INDEX.pack(index))
+            self.sendTo(self._socket, request.getData())
+            for index in indexes:
+                fragments[index] = self._receive(self._receiveSize())
+        return b''.join(fragments)
+
+    def _readSharedFrame(self):
+        """View, without any copy, the frame the master wrote inside the
+        shared file"""
+        size = SHARED_ANNOUNCE.unpack(
+                    self._receive(SHARED_ANNOUNCE.size))[0]
+        if self._shared is None or size > len(self._shared):
+            if self._shared is not None:
+                try:
+                    self._shared.close()
+                except BufferError:
+                    # Views on the previous frame still exist: the mapping
+                    # is released with them
+                    pass
+            with open(self._shared_path, 'rb') as shared:
+                self._shared = mmap.mmap(shared.fileno(), 0,
+                                         access=mmap.ACCESS_READ)
+        return memoryview(self._shared)[:size]
 
     def endFrame(self):
         pass
 
+    def requestResend(self, object_id):
+        """Ask the master, with the next barrier, to send the whole state
+        of a synchronized object"""
+        self._resend.append(object_id)
+
     def barrier(self):
         if self.isReady():
-            self.sendTo(self._socket, BARRIER)
-            message = self.receiveFrom(self._socket, COMMAND_SIZE)
+            start = time.time()
+            tokens = b''.join(RESEND + RESEND_ID.pack(object_id)
+                              for object_id in self._resend)
+            self._resend = []
+            self.sendTo(self._socket, tokens + BARRIER)
+            message = bytes(self._receive(COMMAND_SIZE))
             if message != BARRIER:
                 self._loosedConnexion(self._socket)
+            # Time this slave waited for the slowest one
+            self._statistics['barrier'] = time.time() - start
+        self._endFrameStatistics()
 
     def quit(self, reason):
         if hasattr(self, '_socket'):
@@ -305,9 +647,50 @@ class Slave(Connector):
                 pass
             self.BlenderVR._quitByNetwork(reason)
 
+    def _compactReceived(self):
+        """Move the bytes not read yet at the beginning of the receive
+        buffer. The views of the previous frame are not used anymore"""
+        pending = self._received_end - self._received_start
+        if pending > 0 and self._received_start > 0:
+            self._received[:pending] = \
+                self._received[self._received_start:self._received_end]
+        self._received_start = 0
+        self._received_end = pending
+
+    def _receive(self, size):
+        """View on the next bytes sent by the master. Each recv_into gets
+        as many bytes as available, so a whole frame usually needs one
+        syscall"""
+        try:
+            while self._received_end - self._received_start < size:
+                if self._received_start + size > len(self._received):
+                    # Views on the previous buffer stay valid: it is not
+                    # resized but replaced
+                    pending = self._received_end - self._received_start
+                    received = bytearray(max(2 * len(self._received),
+                                             pending + size))
+                    received[:pending] = memoryview(self._received)[
+                            self._received_start:self._received_end]
+                    self._received = received
+                    self._received_start = 0
+                    self._received_end = pending
+                chunk_size = self._socket.recv_into(
+                    memoryview(self._received)[self._received_end:])
+                self._statistics['syscalls'] += 1
+                self._statistics['bytes'] += chunk_size
+                if chunk_size == 0:
+                    raise Exception()
+                self._received_end += chunk_size
+        except:
+            self._loosedConnexion(self._socket)
+            return
+        start = self._received_start
+        self._received_start += size
+        return memoryview(self._received)[start:self._received_start]
+
     def _receiveSize(self):
         size = struct.unpack_from(SIZE_FORMAT,
-                            self.receiveFrom(self._socket, SIZE_SIZE))
+                            self._receive(SIZE_SIZE))
         return size[0]
 
     def _loosedConnexion(self, socket):
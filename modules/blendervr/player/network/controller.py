@@ -107,6 +107,11 @@ class Controller(base.Base):
                 command, argument = protocol.decomposeMessage(argument)
                 self.BlenderVR.getProcessor().receivedFromConsole(command,
                                                                     argument)
+        elif command == 'profile_synchronization':
+            if argument:
+                self.BlenderVR.startSynchronizationProfile()
+            else:
+                self.BlenderVR.stopSynchronizationProfile()
         elif command == 'log_file':
             if argument:
                 if not self._file_logging:
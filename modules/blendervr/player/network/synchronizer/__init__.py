@@ -37,20 +37,56 @@
 ##
 
 import socket
+import heapq
 from ...buffer import Buffer, data_size
 from ... import base
+from ... import exceptions
+from . import codec
+from ....tools import profiler
 import time
 
 class Base(base.Base):
 
-    NEW_OBJECT = b'c'
-    OBJECT     = b'o'
+    NEW_OBJECT = profiler.NEW_OBJECT
+    OBJECT     = profiler.OBJECT
     DEL_OBJECT = b'c'
+    TRANSFORMS = profiler.TRANSFORMS
+    CODEC      = profiler.CODEC
+    CLOCK      = profiler.CLOCK
 
     def __init__(self, parent):
         super(Base, self).__init__(parent)
         self._synchronizedObjectsToAdd = []
         self._synchronizedObjects = {}
+        self._codec = codec.getCodec({})
+        # 0 is reserved for the root of the scene synchronizer
+        self._nextID = 1
+        # Clock of the master, shared by all the nodes
+        self._frame = 0
+        self._simulationTime = 0.0
+
+    def allocateID(self):
+        """New identifier of a synchronized object inside the stream.
+
+        Identifiers are small sequential integers, so they are compact on the
+        wire, and they are never reused, so a deleted object cannot be
+        aliased by a new one."""
+        object_id = self._nextID
+        self._nextID += 1
+        return object_id
+
+    def getCodec(self):
+        """Codec of the poses inside the synchronization stream"""
+        return self._codec
+
+    def getFrameNumber(self):
+        """Number of the current frame, the same on all the nodes"""
+        return self._frame
+
+    def getSimulationTime(self):
+        """Seconds since the beginning of the synchronization, as measured
+        by the master at the beginning of the current frame"""
+        return self._simulationTime
 
     def addObjectToSynchronize(self, object, name):
         object._synchronize_object_name = name
@@ -82,19 +118,194 @@ class Base(base.Base):
 
 class Master(Base):
 
-    def __init__(self, parent):
+    def __init__(self, parent, configuration):
         super(Master, self).__init__(parent)
 
+        self._codec = codec.getCodec(configuration)
+        self._announceCodec = True
+        # Everything is sent again at next frame, for the nodes that missed
+        # the previous ones
+        self._snapshot = False
+        self._transform_epsilon = float(configuration.get('transform_epsilon',
+                                                          0.0))
+
+        # Rate classes: objects absent from _periods are polled every frame
+        self._periods = {}
+        self._priorities = {}
+        self._schedule = []
+        self._nextDue = {}
+        self._touched = set()
+        self._deferred = []
+        self._budget = int(configuration.get('byte_budget', 0))
+
+        # Command and identifier written before the changes of each object
+        self._headers = {}
+
+        self._profile = None
+
         from .objects import master
         self._objects = master.Master(self)
 
     def start(self):
+        self._startTime = time.time()
         self._medium_buffer_size = self._connector.BUFFER_SIZE
+        self._buffer = Buffer()
         Base.start(self)
 
+    def sendSnapshot(self):
+        """Send again, at next frame, all that a node that missed the
+        previous frames needs: the codec, the synchronized objects and the
+        items of the scene, with their whole state"""
+        self._snapshot = True
+
+    def isSnapshotPending(self):
+        return self._snapshot
+
+    def getTransformEpsilon(self):
+        """Smallest change of a transform coordinate sent to the slaves"""
+        return self._transform_epsilon
+
+    def setSynchronizationRate(self, object_id, period=1, priority=0):
+        """Poll the synchronized object every period frames, or only after
+        touchSynchronizedObject() when period is 0. When the byte budget of
+        the frame is reached, the objects of highest priority are sent and
+        the other ones are deferred to the next frames"""
+        period = int(period)
+        if period < 0:
+            raise exceptions.Synchronizer('Invalid synchronization period ('
+                                          + str(period) + ')')
+        if period == 1:
+            self._periods.pop(object_id, None)
+        else:
+            self._periods[object_id] = period
+        if priority:
+            self._priorities[object_id] = priority
+        else:
+            self._priorities.pop(object_id, None)
+        if object_id in self._synchronizedObjects:
+            self._startRate(object_id)
+
+    def resendObject(self, object_id):
+        """Send the whole state of this object at next frame, for a slave
+        that lost some of its changes"""
+        object = self._synchronizedObjects.get(object_id)
+        if object is None:
+            return
+        if hasattr(object, 'resynchronize'):
+            object.resynchronize()
+        self.touchSynchronizedObject(object_id)
+
+    def getSynchronizationPeriod(self, object_id):
+        return self._periods.get(object_id, 1)
+
+    def touchSynchronizedObject(self, object_id):
+        self._touched.add(object_id)
+
+    def setSynchronizationBudget(self, size):
+        """Bytes of synchronization per frame, or 0 for no limit"""
+        self._budget = int(size)
+        self._objects.updateTransformsPolling()
+
+    def getSynchronizationBudget(self):
+        return self._budget
+
+    def addSynchronizedObject(self, object_id, object):
+        Base.addSynchronizedObject(self, object_id, object)
+        self._startRate(object_id)
+
+    def removeSynchronizedObject(self, object_id, keep_rate=False):
+        """Stop synchronizing the object. A deactivated object keeps its
+        rate class, that applies again when it is activated"""
+        self._headers.pop(object_id, None)
+        # Its entries inside the schedule are dropped when they are due
+        self._nextDue.pop(object_id, None)
+        self._touched.discard(object_id)
+        if object_id in self._deferred:
+            self._deferred.remove(object_id)
+        if not keep_rate:
+            self._periods.pop(object_id, None)
+            self._priorities.pop(object_id, None)
+        return Base.removeSynchronizedObject(self, object_id)
+
+    def startProfile(self):
+        """Profile the synchronization sent from now on (see
+        blendervr.tools.profiler)"""
+        self._profile = profiler.Profile()
+
+    def stopProfile(self):
+        """Stop profiling and return the profile, if any"""
+        profile = self._profile
+        self._profile = None
+        return profile
+
+    def getProfile(self):
+        return self._profile
+
+    def _startRate(self, object_id):
+        period = self._periods.get(object_id, 1)
+        if period == 0:
+            # Sent once, then on change only
+            self._touched.add(object_id)
+        elif period > 1:
+            due = self._frame + 1
+            self._nextDue[object_id] = due
+            heapq.heappush(self._schedule, (due, object_id))
+
+    def _getDueObjects(self):
+        """Identifiers of the objects to poll this frame, deferred ones and
+        most important ones first"""
+        if self._periods:
+            due = [objects_id for objects_id in self._synchronizedObjects
+                   if objects_id not in self._periods]
+        else:
+            due = list(self._synchronizedObjects)
+        while self._schedule and self._schedule[0][0] <= self._frame:
+            frame, objects_id = heapq.heappop(self._schedule)
+            if self._nextDue.get(objects_id) != frame:
+                continue
+            period = self._periods.get(objects_id, 1)
+            if period > 1 and objects_id in self._synchronizedObjects:
+                self._nextDue[objects_id] = frame + period
+                heapq.heappush(self._schedule, (frame + period, objects_id))
+                due.append(objects_id)
+            else:
+                del(self._nextDue[objects_id])
+        if self._deferred or self._touched:
+            # An object deferred or touched, and due anyway, is polled once
+            polled = set()
+            unique = []
+            for objects_id in self._deferred + due + list(self._touched):
+                if objects_id not in polled:
+                    polled.add(objects_id)
+                    unique.append(objects_id)
+            due = unique
+            self._deferred = []
+            self._touched = set()
+        if self._priorities:
+            due.sort(key=lambda objects_id:
+                                -self._priorities.get(objects_id, 0))
+        return due
+
+    def _getFrameSize(self):
+        return self._frameSize + len(self._buffer) \
+                                + self._objects.getPolledTransformsSize()
+
+    def _getSentSize(self):
+        return self._frameSize + len(self._buffer)
+
+    def _profileCommand(self, command, sent, start, content=0):
+        """Profile what has been added to the frame since sent, minus the
+        content already profiled"""
+        if self._profile is not None:
+            self._profile.addCommand(command,
+                                     self._getSentSize() - sent - content,
+                                     time.time() - start)
+
     def _sendBuffer(self):
+        self._frameSize += len(self._buffer)
         self._connector.send(self._connector.CMD_SYNCHRO, self._buffer)
-        self._buffer = Buffer()
+        # The connector has written the frame: keep the storage for the next
+        self._buffer.reset()
 
     def _addToBuffer(self, command, itemID, buffer):
         if not buffer:
@@ -102,43 +313,192 @@ class Master(Base):
         if len(self._buffer) > self._medium_buffer_size:
             self._sendBuffer()
         self._buffer.command(command)
-        if itemID:
+        if itemID is not None:
             self._buffer.itemID(itemID)
         self._buffer.subBuffer(buffer)
 
+    def _writeObject(self, objects_id, object):
+        """Let the object write its changes directly inside the frame, then
+        put them inside a sub-buffer when there are some. Objects that only
+        give their own buffer, as the ones of the processors, are copied"""
+        if not hasattr(object, 'writeSynchronizerBuffer'):
+            self._addToBuffer(self.OBJECT, objects_id,
+                              object.getSynchronizerBuffer())
+            return
+        start = len(self._buffer)
+        object.writeSynchronizerBuffer(self._buffer)
+        if len(self._buffer) == start:
+            # Most objects do not change: nothing to wrap
+            return
+        header = self._headers.get(objects_id)
+        if header is None:
+            header = Buffer()
+            header.command(self.OBJECT)
+            header.itemID(objects_id)
+            header = self._headers[objects_id] = bytes(header.getData())
+        self._buffer.wrapSubBuffer(start, header)
+        if len(self._buffer) > self._medium_buffer_size:
+            self._sendBuffer()
+
+    def _addObjectToBuffer(self, objects_id, object):
+        """Write the object as _writeObject(), and profile it"""
+        sent = self._getSentSize()
+        start = time.time()
+        self._writeObject(objects_id, object)
+        duration = time.time() - start
+        name = getattr(object, '_synchronize_object_name', None)
+        category = profiler.getObjectCategory(name or '', name is not None)
+        self._profile.addObject(category, name or str(object),
+                                object.__class__.__module__.split('.')[-1],
+                                self._getSentSize() - sent, duration)
+
     def sendSynchronization(self):
+        self._frameSize = 0
+        sent = self._getSentSize()
+        start = time.time()
 
-        self._buffer = Buffer()
-        # Create new objects affectations ...
-        newObjects = Buffer()
-        while len(self._synchronizedObjectsToAdd) > 0:
-            object = self._synchronizedObjectsToAdd.pop()
-            objects_id = id(object)
-            newObjects.itemID(objects_id)
-            newObjects.string(object._synchronize_object_name)
-            self.addSynchronizedObject(objects_id, object)
-        self._addToBuffer(self.NEW_OBJECT, None, newObjects)
+        # The clock comes first, so the slaves know it while processing the
+        # rest of the frame
+        self._frame += 1
+        self._simulationTime = time.time() - self._startTime
+        self._buffer.command(self.CLOCK)
+        self._buffer.unsigned_long(self._frame)
+        self._buffer.double(self._simulationTime)
+        self._profileCommand('CLOCK', sent, start)
+
+        # Nothing reaches the slaves until they are all connected
+        snapshot = self._snapshot and self._connector.isReady()
+        if snapshot:
+            self._snapshot = False
+            self._announceCodec = True
+            for object in self._synchronizedObjects.values():
+                if hasattr(object, 'resynchronize'):
+                    object.resynchronize()
+            self._touched.update(self._synchronizedObjects)
+
+        # Negotiate the codec with the slaves before any pose
+        if self._announceCodec:
+            sent = self._getSentSize()
+            start = time.time()
+            self._buffer.command(self.CODEC)
+            position = self._buffer.openSubBuffer()
+            self._codec.announce(self._buffer)
+            self._buffer.closeSubBuffer(position)
+            self._announceCodec = False
+            self._profileCommand('CODEC', sent, start)
 
+        # Create new objects affectations, directly inside the frame ...
+        if len(self._synchronizedObjectsToAdd) > 0 or snapshot:
+            sent = self._getSentSize()
+            start = time.time()
+            self._buffer.command(self.NEW_OBJECT)
+            position = self._buffer.openSubBuffer()
+            if snapshot:
+                # The slaves that already know them ignore them
+                for objects_id in sorted(self._synchronizedObjects):
+                    object = self._synchronizedObjects[objects_id]
+                    if hasattr(object, '_synchronize_object_name'):
+                        self._buffer.itemID(objects_id)
+                        self._buffer.string(object._synchronize_object_name)
+            while len(self._synchronizedObjectsToAdd) > 0:
+                object = self._synchronizedObjectsToAdd.pop()
+                objects_id = self.allocateID()
+                object._synchronize_object_id = objects_id
+                self._buffer.itemID(objects_id)
+                self._buffer.string(object._synchronize_object_name)
+                self.addSynchronizedObject(objects_id, object)
+            self._buffer.closeSubBuffer(position)
+            self._profileCommand('NEW_OBJECT', sent, start)
+
+        # The items created and deleted are profiled by the scene
+        # synchronizer
+        sent = self._getSentSize()
+        start = time.time()
         try:
-            self._addToBuffer(self.OBJECT, id(self._objects),
-                              self._objects.checkItems())
+            items = self._objects.checkItems()
+            self._addToBuffer(self.OBJECT,
+                              self._objects._synchronize_object_id, items)
+            self._profileCommand('scene graph', sent, start, len(items))
         except:
             self.logger.log_traceback(False)
 
-        # Then update objects attributs
-        for objects_id, object in self._synchronizedObjects.items():
-            self._addToBuffer(self.OBJECT, objects_id, object.getSynchronizerBuffer())
+        # Then update the attributes of the objects due in this frame, up to
+        # the byte budget
+        if self._profile is None:
+            writeObject = self._writeObject
+        else:
+            writeObject = self._addObjectToBuffer
+        synchronizedObjects = self._synchronizedObjects
+        for objects_id in self._getDueObjects():
+            object = synchronizedObjects.get(objects_id)
+            if object is None:
+                continue
+            if self._budget and self._getFrameSize() >= self._budget:
+                self._deferred.append(objects_id)
+                continue
+            writeObject(objects_id, object)
+
+        # Object transforms gathered while updating objects
+        sent = self._getSentSize()
+        start = time.time()
+        if len(self._buffer) > self._medium_buffer_size:
+            self._sendBuffer()
+        position = self._buffer.openSubBuffer(self.TRANSFORMS)
+        self._objects.writeTransforms(self._buffer)
+        # The transforms themselves are profiled by object
+        size = self._buffer.closeSubBuffer(position, self.TRANSFORMS)
+        self._profileCommand('TRANSFORMS', sent, start, size)
         self._sendBuffer()
+        if self._profile is not None:
+            self._profile.endFrame()
 
 
 class Slave(Base):
 
     def __init__(self, parent):
         super(Slave, self).__init__(parent)
+        self._synchronizedObjects = []
+        # Objects waiting for their identifier from the master, by name
+        self._synchronizedObjectsToAdd = {}
 
         from .objects import slave
         self._objects = slave.Slave(self)
 
+    def addObjectToSynchronize(self, object, name):
+        object._synchronize_object_name = name
+        self._synchronizedObjectsToAdd.setdefault(name, []).append(object)
+
+    # Master identifiers are dense: slaves store synchronized objects inside
+    # a flat list indexed by these identifiers
+    def addSynchronizedObject(self, object_id, object):
+        missing = object_id + 1 - len(self._synchronizedObjects)
+        if missing > 0:
+            self._synchronizedObjects.extend([None] * missing)
+        self._synchronizedObjects[object_id] = object
+
+    def removeSynchronizedObject(self, object_id):
+        if object_id < len(self._synchronizedObjects):
+            result = self._synchronizedObjects[object_id]
+            self._synchronizedObjects[object_id] = None
+            return result
+        return None
+
+    def getObjectByID(self, object_id):
+        if object_id < len(self._synchronizedObjects):
+            return self._synchronizedObjects[object_id]
+        return None
+
+    def requestResend(self, object):
+        """Ask the master for the whole state of this synchronized object,
+        with the next barrier"""
+        if not hasattr(self, '_connector'):
+            # Replaying a recording: there is no master to ask
+            return
+        for object_id, synchronized in enumerate(self._synchronizedObjects):
+            if synchronized is object:
+                self._connector.requestResend(object_id)
+                return
+
     def process(self, buffer):
 
         self._objects.checkItems()
@@ -146,19 +506,30 @@ class Slave(Base):
         while not buffer.isEmpty():
             command = buffer.command()
 
-            if command == self.NEW_OBJECT:
+            if command == self.CLOCK:
+                self._frame = buffer.unsigned_long()
+                self._simulationTime = buffer.double()
+
+            elif command == self.CODEC:
+                self._codec = codec.readAnnounce(buffer.subBuffer())
+
+            elif command == self.NEW_OBJECT:
                 new_objects_buffer = buffer.subBuffer()
                 while not new_objects_buffer.isEmpty():
                     objects_id   = new_objects_buffer.itemID()
                     objects_name = new_objects_buffer.string()
-                    for i in range(len(self._synchronizedObjectsToAdd)):
-                        if self._synchronizedObjectsToAdd[i]._synchronize_object_name == objects_name:
-                            object = self._synchronizedObjectsToAdd.pop(i)
-                            self.addSynchronizedObject(objects_id, object)
-                            break
+                    waiting = self._synchronizedObjectsToAdd.get(objects_name)
+                    if waiting:
+                        self.addSynchronizedObject(objects_id, waiting.pop(0))
+                        if not waiting:
+                            del(self._synchronizedObjectsToAdd[objects_name])
 
             elif command == self.OBJECT:
                 objects_id   = buffer.itemID()
                 objectBuffer = buffer.subBuffer()
-                if objects_id in self._synchronizedObjects:
-                    self._synchronizedObjects[objects_id].processSynchronizerBuffer(objectBuffer)
+                object = self.getObjectByID(objects_id)
+                if object is not None:
+                    object.processSynchronizerBuffer(objectBuffer)
+
+            elif command == self.TRANSFORMS:
+                self._objects.processTransformsBuffer(buffer.subBuffer())
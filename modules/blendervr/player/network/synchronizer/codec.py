@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+# file: blendervr/player/network/synchronizer/codec.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+"""Codecs of the poses inside the synchronization stream.
+
+The master chooses the codec from the configuration file and announces it
+to the slaves at the beginning of the session. As every slave decodes the
+same integers with the same arithmetic, all slaves get bit-exact poses.
+The quantized codec only applies to rigid transforms (rotation and
+translation): scales are always sent as floats, and matrices or
+orientations with a scale, a shear or a reflection are sent raw.
+
+The writing methods return the values the slaves decode: the master draws
+them too, so the screens of all the nodes match.
+"""
+
+import math
+import array
+import struct
+import mathutils
+from ... import exceptions
+from ....tools import profiler
+
+RAW = profiler.CODEC_RAW
+QUANTIZED = profiler.CODEC_QUANTIZED
+
+DEFAULT_POSITION_PRECISION = 0.0001
+DEFAULT_ORIENTATION_BITS = 20
+MAX_ORIENTATION_BITS = 20
+SHORT_LIMIT = 32767
+
+# Bounds of the three smallest components of a unit quaternion
+SMALLEST_THREE_BOUND = 1.0 / math.sqrt(2.0)
+
+# Largest deviation from an orthonormal basis of a rigid transform
+RIGID_TOLERANCE = 1e-5
+
+# Encodings of a matrix_4x4 by the quantized codec
+MATRIX_QUANTIZED = 0
+MATRIX_RAW = 1
+
+# Flag of the packed orientations sent as 9 floats: a packed quaternion
+# uses at most 2 + 3 * MAX_ORIENTATION_BITS bits
+ORIENTATION_RAW = 1 << 63
+
+
+def is_rotation(m):
+    """Whether the upper 3x3 part of a matrix, given by rows, is only a
+    rotation"""
+    for i in range(3):
+        for j in range(i, 3):
+            dot = m[i][0] * m[j][0] + m[i][1] * m[j][1] + m[i][2] * m[j][2]
+            if abs(dot - (1.0 if i == j else 0.0)) > RIGID_TOLERANCE:
+                return False
+    # Not a reflection
+    determinant = m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1]) \
+                - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0]) \
+                + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0])
+    return determinant > 0.0
+
+
+def is_rigid(m):
+    """Whether a 4x4 matrix, given by rows, is only a rotation and a
+    translation"""
+    if (m[3][0], m[3][1], m[3][2], m[3][3]) != (0.0, 0.0, 0.0, 1.0):
+        return False
+    return is_rotation(m)
+
+
+def as_floats(values):
+    """Values rounded as the slaves read them from floats"""
+    return array.array('f', values).tolist()
+
+
+def matrix_to_quaternion(m):
+    """Unit quaternion (w, x, y, z) of a 3x3 rotation matrix given by rows"""
+    trace = m[0][0] + m[1][1] + m[2][2]
+    if trace > 0.0:
+        s = 0.5 / math.sqrt(trace + 1.0)
+        q = (0.25 / s,
+             (m[2][1] - m[1][2]) * s,
+             (m[0][2] - m[2][0]) * s,
+             (m[1][0] - m[0][1]) * s)
+    elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+        s = 2.0 * math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2])
+        q = ((m[2][1] - m[1][2]) / s,
+             0.25 * s,
+             (m[0][1] + m[1][0]) / s,
+             (m[0][2] + m[2][0]) / s)
+    elif m[1][1] > m[2][2]:
+        s = 2.0 * math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2])
+        q = ((m[0][2] - m[2][0]) / s,
+             (m[0][1] + m[1][0]) / s,
+             0.25 * s,
+             (m[1][2] + m[2][1]) / s)
+    else:
+        s = 2.0 * math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1])
+        q = ((m[1][0] - m[0][1]) / s,
+             (m[0][2] + m[2][0]) / s,
+             (m[1][2] + m[2][1]) / s,
+             0.25 * s)
+    norm = math.sqrt(q[0] * q[0] + q[1] * q[1] + q[2] * q[2] + q[3] * q[3])
+    return tuple(component / norm for component in q)
+
+
+def quaternion_to_matrix(q):
+    """Rows of the 3x3 rotation matrix of a unit quaternion (w, x, y, z)"""
+    w, x, y, z = q
+    return ((1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - z * w),
+             2.0 * (x * z + y * w)),
+            (2.0 * (x * y + z * w), 1.0 - 2.0 * (x * x + z * z),
+             2.0 * (y * z - x * w)),
+            (2.0 * (x * z - y * w), 2.0 * (y * z + x * w),
+             1.0 - 2.0 * (x * x + y * y)))
+
+
+def pack_quaternion(q, bits):
+    """Smallest-three encoding of a unit quaternion inside an integer.
+
+    The two upper bits hold the index of the largest component, that is
+    dropped. The three others are quantized on bits each."""
+    largest = 0
+    for index in range(1, 4):
+        if abs(q[index]) > abs(q[largest]):
+            largest = index
+    sign = -1.0 if q[largest] < 0.0 else 1.0
+    steps = (1 << bits) - 1
+    packed = largest
+    for index in range(4):
+        if index == largest:
+            continue
+        value = sign * q[index]
+        value = min(max(value, -SMALLEST_THREE_BOUND), SMALLEST_THREE_BOUND)
+        value = int(round((value + SMALLEST_THREE_BOUND)
+                          / (2.0 * SMALLEST_THREE_BOUND) * steps))
+        packed = (packed << bits) | value
+    return packed
+
+
+def unpack_quaternion(packed, bits):
+    steps = (1 << bits) - 1
+    mask = steps
+    components = []
+    for shift in (2 * bits, bits, 0):
+        value = (packed >> shift) & mask
+        components.append(value * (2.0 * SMALLEST_THREE_BOUND) / steps
+                          - SMALLEST_THREE_BOUND)
+    largest = packed >> (3 * bits)
+    missing = math.sqrt(max(0.0, 1.0 - components[0] * components[0]
+                                     - components[1] * components[1]
+                                     - components[2] * components[2]))
+    components.insert(largest, missing)
+    return tuple(components)
+
+
+class Raw:
+    """Full precision floats: the historical stream format"""
+
+    def __init__(self, configuration):
+        pass
+
+    def getName(self):
+        return RAW
+
+    def announce(self, buff):
+        buff.string(self.getName())
+
+    def positions(self, buff, data=None):
+        """Flat array of 3 coordinates per position. Writing returns data:
+        the master keeps its values"""
+        if data is None:
+            return buff.array('f')
+        buff.array('f', data)
+        return data
+
+    def orientations(self, buff, data=None):
+        """Flat array of the 9 coefficients (by rows) per orientation.
+        Writing returns data: the master keeps its values"""
+        if data is None:
+            return buff.array('f')
+        buff.array('f', data)
+        return data
+
+    def matrix_4x4(self, buff, data=None):
+        """Read a matrix, or write data and return the matrix the slaves
+        decode, that the master must use too"""
+        if data is None:
+            return buff.matrix_4x4()
+        buff.matrix_4x4(data)
+        return data
+
+
+class Quantized(Raw):
+    """Fixed-point positions and smallest-three quaternion orientations"""
+
+    def __init__(self, configuration):
+        Raw.__init__(self, configuration)
+        # Round the precision as it is announced to the slaves, so the master
+        # encodes with the very same value the slaves decode with
+        self._position_precision = struct.unpack('>f', struct.pack('>f',
+                    float(configuration.get('position_precision',
+                                            DEFAULT_POSITION_PRECISION))))[0]
+        self._orientation_bits = int(configuration.get(
+                    'orientation_bits', DEFAULT_ORIENTATION_BITS))
+        if not 0 < self._orientation_bits <= MAX_ORIENTATION_BITS:
+            raise exceptions.Synchronizer('Invalid orientation bits ('
+                                    + str(self._orientation_bits)
+                                    + '): must be between 1 and '
+                                    + str(MAX_ORIENTATION_BITS))
+
+    def getName(self):
+        return QUANTIZED
+
+    def announce(self, buff):
+        Raw.announce(self, buff)
+        buff.float(self._position_precision)
+        buff.integer(self._orientation_bits)
+
+    def positions(self, buff, data=None):
+        """Fixed-point coordinates, on 16 bits when the whole section fits
+        inside, on 32 bits otherwise"""
+        precision = self._position_precision
+        if data is None:
+            typecode = chr(buff.unsigned_char())
+            return [value * precision for value in buff.array(typecode)]
+        data = [int(round(value / precision)) for value in data]
+        if len(data) == 0 or (min(data) >= -SHORT_LIMIT
+                              and max(data) <= SHORT_LIMIT):
+            typecode = 'h'
+        else:
+            typecode = 'i'
+        buff.unsigned_char(ord(typecode))
+        buff.array(typecode, data)
+        return [value * precision for value in data]
+
+    def orientations(self, buff, data=None):
+        """Smallest-three quaternions. The orientations that are not
+        rotations have the ORIENTATION_RAW flag instead, and their
+        coefficients follow as floats"""
+        bits = self._orientation_bits
+        if data is None:
+            result = []
+            packed_orientations = buff.array('Q')
+            raw = buff.array('f')
+            raw_offset = 0
+            for packed in packed_orientations:
+                packed = int(packed)
+                if packed & ORIENTATION_RAW:
+                    result.extend(raw[raw_offset:raw_offset + 9])
+                    raw_offset += 9
+                    continue
+                for row in quaternion_to_matrix(unpack_quaternion(packed,
+                                                                  bits)):
+                    result.extend(row)
+            return result
+        packed_orientations = []
+        raw = []
+        result = []
+        for index in range(0, len(data), 9):
+            rows = (data[index:index + 3], data[index + 3:index + 6],
+                    data[index + 6:index + 9])
+            if not is_rotation(rows):
+                packed_orientations.append(ORIENTATION_RAW)
+                values = as_floats(data[index:index + 9])
+                raw.extend(values)
+                result.extend(values)
+                continue
+            packed = pack_quaternion(matrix_to_quaternion(rows), bits)
+            packed_orientations.append(packed)
+            for row in quaternion_to_matrix(unpack_quaternion(packed, bits)):
+                result.extend(row)
+        buff.array('Q', packed_orientations)
+        buff.array('f', raw)
+        return result
+
+    def _getMatrix(self, translation, packed):
+        precision = self._position_precision
+        rows = quaternion_to_matrix(unpack_quaternion(packed,
+                                                      self._orientation_bits))
+        return mathutils.Matrix(
+                    (rows[0] + (translation[0] * precision,),
+                     rows[1] + (translation[1] * precision,),
+                     rows[2] + (translation[2] * precision,),
+                     (0.0, 0.0, 0.0, 1.0)))
+
+    def matrix_4x4(self, buff, data=None):
+        """Rigid transforms are quantized, other matrices are sent raw"""
+        if data is None:
+            if buff.unsigned_char() == MATRIX_RAW:
+                return buff.matrix_4x4()
+            translation = [buff.integer() for index in range(3)]
+            return self._getMatrix(translation, buff.unsigned_long())
+        if not is_rigid(data):
+            buff.unsigned_char(MATRIX_RAW)
+            buff.matrix_4x4(data)
+            return data
+        translation = [int(round(data[index][3] / self._position_precision))
+                       for index in range(3)]
+        packed = pack_quaternion(matrix_to_quaternion(
+                                    (data[0][0:3], data[1][0:3],
+                                     data[2][0:3])), self._orientation_bits)
+        buff.unsigned_char(MATRIX_QUANTIZED)
+        for value in translation:
+            buff.integer(value)
+        buff.unsigned_long(packed)
+        return self._getMatrix(translation, packed)
+
+
+CODECS = {RAW: Raw,
+          QUANTIZED: Quantized}
+
+
+def getCodec(configuration):
+    name = configuration.get('codec', RAW)
+    if name not in CODECS:
+        raise exceptions.Synchronizer('Unknown synchronization codec: '
+                                      + str(name))
+    return CODECS[name](configuration)
+
+
+def readAnnounce(buff):
+    """Codec announced by the master at the beginning of the session"""
+    configuration = {'codec': buff.string()}
+    if configuration['codec'] == QUANTIZED:
+        configuration['position_precision'] = buff.float()
+        configuration['orientation_bits'] = buff.integer()
+    return getCodec(configuration)
@@ -39,14 +39,20 @@
 import bge
 import importlib
 from .... import base
+from .....tools import profiler
 
 class Synchronizer(base.Base):
-    CREATE_ITEM = b'c'
+    CREATE_ITEM = profiler.CREATE_ITEM
     UPDATE_ITEM = b'u'
     END_UPDATE_ITEM = b'e'
-    DELETE_ITEM = b'd'
+    DELETE_ITEM = profiler.DELETE_ITEM
     SET_ATTRIBUTE = b'a'
 
+    # Flags of the batched transforms section
+    TRANSFORM_POSITION = profiler.TRANSFORM_POSITION
+    TRANSFORM_ORIENTATION = profiler.TRANSFORM_ORIENTATION
+    TRANSFORM_SCALE = profiler.TRANSFORM_SCALE
+
     def __init__(self, parent):
         base.Base.__init__(self, parent)
         self._synchronizer = parent
@@ -98,10 +104,11 @@ class Synchronizer(base.Base):
                 self._items[item_id] = module.Slave(self, item)
         return self._items[item_id]
 
-    def removeSynchronizedItem(self, itemID):
-        if itemID in self._items:
-            del(self._items[itemID])
-        self._synchronizer.removeSynchronizedObject(itemID)
+    def removeSynchronizedItem(self, item):
+        item_id = id(item._item)
+        if item_id in self._items:
+            del(self._items[item_id])
+        self._synchronizer.removeSynchronizedObject(item.getItemID())
 
     def checkItems(self):
         self._root.checkItems()
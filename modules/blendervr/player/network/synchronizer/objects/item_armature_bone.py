@@ -37,29 +37,31 @@
 ##
 
 from . import item_base
-from ....buffer import Buffer
 
 
 class ArmatureBone:
+    __slots__ = ()
 
     def _getSubItems(self):
         return list(self._item.children)
 
 
 class Master(ArmatureBone, item_base.Master):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         ArmatureBone.__init__(self)
         item_base.Master.__init__(self, parent, item)
 
-    def getSynchronizerBuffer(self):
-        buff = Buffer()
+    def writeSynchronizerBuffer(self, buff):
         buff.vector_3(self._item.head)
         buff.vector_3(self._item.tail)
         buff.matrix_3x3(self._item.bone_mat)
-        return buff
 
 
 class Slave(ArmatureBone, item_base.Slave):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         ArmatureBone.__init__(self)
         item_base.Slave.__init__(self, parent, item)
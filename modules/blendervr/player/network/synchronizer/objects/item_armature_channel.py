@@ -37,46 +37,29 @@
 ##
 
 from . import item_base
-from ....buffer import Buffer
 
 
 class ArmatureChannel:
+    __slots__ = ()
+
     pass
 
 
 class Master(ArmatureChannel, item_base.Master):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         ArmatureChannel.__init__(self)
         item_base.Master.__init__(self, parent, item)
 
-    def getSynchronizerBuffer(self):
-        buff = Buffer()
-        buff.vector_3(self._item.location)
-        buff.vector_3(self._item.scale)
-        # Don't use joint_rotation as its computation is link to robotic
-        # application, thus, slaves don't care as it should be done on
-        # the master
-        rotation_mode = self._item.rotation_mode
-        buff.integer(rotation_mode)
-        if rotation_mode == 0:
-            buff.vector_4(self._item.rotation_quaternion)
-        else:
-            buff.vector_3(self._item.rotation_euler)
-        return buff
+    def isSynchronizable(self):
+        # The armature sends the pose of all its channels at once
+        return False
 
 
 class Slave(ArmatureChannel, item_base.Slave):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         ArmatureChannel.__init__(self)
         item_base.Slave.__init__(self, parent, item)
-
-    def processSynchronizerBuffer(self, buff):
-        self._item.location = buff.vector_3()
-        self._item.scale = buff.vector_3()
-        rotation_mode = buff.integer()
-        self._item.rotation_mode = rotation_mode
-        if rotation_mode == 0:
-            self._item.rotation_quaternion = buff.vector_4()
-        else:
-            self._item.rotation_euler = buff.vector_3()
-        self._parent_synchronizer._item.update()
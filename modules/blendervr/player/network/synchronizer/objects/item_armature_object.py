@@ -36,47 +36,111 @@
 ## knowledge of the CeCILL license and that you accept its terms.
 ##
 
+import array
 from . import item_object
-from ....buffer import Buffer
+
+# Rotation mode of the channels that use a quaternion. The modes are
+# signed: axis and angle is -1
+ROTATION_QUATERNION = 0
 
 
 class ArmatureObject:
+    __slots__ = ()
 
     OBJECT = b'o'
     FRAME = b'f'
+    POSE = b'p'
+
+    # Floats of a channel inside the pose: location, scale, then the
+    # quaternion, or the euler angles and a padding
+    CHANNEL_SIZE = 10
 
     def _getSubItems(self):
         return list(self._item.channels)
 
+    def _getSubItemsMarker(self):
+        return len(self._item.channels)
+
 
 class Master(ArmatureObject, item_object.Master):
+    __slots__ = ('_curentActionFrame', '_previousPose', '_localAnimation')
+
     def __init__(self, parent, item):
         ArmatureObject.__init__(self)
         item_object.Master.__init__(self, parent, item)
         self._curentActionFrame = None
+        self._previousPose = []
+        self._localAnimation = False
+
+    def setLocalAnimation(self, enable=True):
+        """Stop sending the action frame and the pose: each node evaluates
+        the animation itself from the frame clock"""
+        self._localAnimation = enable
+
+    def resynchronize(self):
+        item_object.Master.resynchronize(self)
+        self._curentActionFrame = None
+        self._previousPose = []
 
-    def getSynchronizerBuffer(self):
-        buff = Buffer()
+    def writeSynchronizerBuffer(self, buff):
+        position = buff.openSubBuffer(self.OBJECT)
+        item_object.Master.writeSynchronizerBuffer(self, buff)
+        buff.closeSubBuffer(position, self.OBJECT)
 
-        object_buffer = item_object.Master.getSynchronizerBuffer(self)
-        if len(object_buffer) > 0:
-            buff.command(self.OBJECT)
-            buff.subBuffer(object_buffer)
+        if self._localAnimation:
+            return
 
         if (self._curentActionFrame != self._item.getActionFrame()):
             self._curentActionFrame = self._item.getActionFrame()
             buff.command(self.FRAME)
             buff.float(self._curentActionFrame)
-        return buff
+
+        self._addPose(buff)
+
+    def _addPose(self, buff):
+        """Pack the channels whose pose changed since last frame"""
+        indexes = array.array('H')
+        modes = array.array('b')
+        values = array.array('f')
+        previous = self._previousPose
+        for index, channel in enumerate(self._item.channels):
+            # Don't use joint_rotation as its computation is link to robotic
+            # application, thus, slaves don't care as it should be done on
+            # the master
+            rotation_mode = channel.rotation_mode
+            pose = list(channel.location)
+            pose.extend(channel.scale)
+            if rotation_mode == ROTATION_QUATERNION:
+                pose.extend(channel.rotation_quaternion)
+            else:
+                pose.extend(channel.rotation_euler)
+                pose.append(0.0)
+            pose.append(rotation_mode)
+            if index < len(previous):
+                if previous[index] == pose:
+                    continue
+                previous[index] = pose
+            else:
+                previous.append(pose)
+            indexes.append(index)
+            modes.append(rotation_mode)
+            values.extend(pose[:self.CHANNEL_SIZE])
+        if len(indexes) > 0:
+            buff.command(self.POSE)
+            buff.array('H', indexes)
+            buff.array('b', modes)
+            buff.array('f', values)
 
 
 class Slave(ArmatureObject, item_object.Slave):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         ArmatureObject.__init__(self)
         item_object.Slave.__init__(self, parent, item)
 
     def processSynchronizerBuffer(self, buff):
-
+        update = False
         while len(buff) > 0:
             command = buff.command()
 
@@ -87,4 +151,27 @@ class Slave(ArmatureObject, item_object.Slave):
             if command == self.FRAME:
                 actionFrame = buff.float()
                 self._item.setActionFrame(actionFrame)
-                self._item.update()
+                update = True
+
+            if command == self.POSE:
+                self._setPose(buff.array('H'), buff.array('b'),
+                              buff.array('f'))
+                update = True
+
+        # The armature is updated once, whatever the number of channels
+        if update:
+            self._item.update()
+
+    def _setPose(self, indexes, modes, values):
+        channels = self._item.channels
+        for position, index in enumerate(indexes):
+            channel = channels[int(index)]
+            offset = position * self.CHANNEL_SIZE
+            channel.location = values[offset:offset + 3]
+            channel.scale = values[offset + 3:offset + 6]
+            rotation_mode = int(modes[position])
+            channel.rotation_mode = rotation_mode
+            if rotation_mode == ROTATION_QUATERNION:
+                channel.rotation_quaternion = values[offset + 6:offset + 10]
+            else:
+                channel.rotation_euler = values[offset + 6:offset + 9]
@@ -36,72 +36,119 @@
 ## knowledge of the CeCILL license and that you accept its terms.
 ##
 
-from .... import base
+import sys
 from ....buffer import Buffer
 import bge
-import copy
 
 
 class NotExistingItem(Exception):
     pass
 
 
-class Base(base.Base):
+# Shared by the items without sub-items, that are most of them: the lists
+# are only allocated with the first sub-item
+NO_ITEMS = ()
+
+
+class Base:
+    """Synchronizer of a blender item.
+
+    Scenes hold thousands of these, so they only have slots, the lists of
+    sub-items are allocated with the first one, and the logger and the main
+    module come from the parent rather than from each item. An item is torn
+    down by release() when it is removed, not by the garbage collector"""
+
+    __slots__ = ('_parent', '_item', '_name', '_items_bl', '_items_sy',
+                 '_items_dynamic', '_sub_items_marker',
+                 '_parent_synchronizer', '_synchronize_object_name')
+
+    # Sub-items can be added or removed while this item lives
+    DYNAMIC_SUB_ITEMS = False
+
     def __init__(self, parent, item):
-        base.Base.__init__(self, parent)
+        self._parent = parent
         self._item = item
-        self._itemID = id(item)
-        self._name = str(self._item)
+        # Spawned copies of an object share its name
+        self._name = sys.intern(str(self._item))
         self.default()
 
-        self._items_bl = []
-        self._items_sy = []
+        self._items_bl = NO_ITEMS
+        self._items_sy = NO_ITEMS
+        # The children that can change by themselves: the other ones are
+        # only checked when the marker of this item changes
+        self._items_dynamic = NO_ITEMS
+        self._sub_items_marker = None
 
-    def __del__(self):
-        try:
-            self._item.endObject()
-            if not self.BlenderVR.isMaster():
-                bge.logic.getCurrentScene().resume()
-        except:
-            pass
-        del(self._item)
+    def getParent(self):
+        return self._parent
+
+    @property
+    def logger(self):
+        return self._parent.logger
+
+    @property
+    def BlenderVR(self):
+        return self._parent.BlenderVR
+
+    def release(self):
+        """Drop the references of this item, once it has been removed"""
+        self._items_bl = self._items_sy = self._items_dynamic = NO_ITEMS
         self._item = None
 
     def checkItems(self):
         if hasattr(self._item, 'invalid') and self._item.invalid:
             self.remove()
-            existing = False
-        else:
-            str(self._item)
-            for item in list(set(self._getSubItems()) - set(self._items_bl)):
-                self.addChildren(item)
-            existing = True
-
-        remove_items = []
-        for item in self._items_sy:
+            raise NotExistingItem()
+
+        changed = self._checkSubItems()
+
+        removed = None
+        for item in (self._items_sy if changed else self._items_dynamic):
             try:
                 item.checkItems()
             except NotExistingItem:
-                remove_items.append(item)
-
-        for item in remove_items:
-            self._items_sy.remove(item)
-
-        if not existing:
-            raise NotExistingItem()
+                if removed is None:
+                    removed = set()
+                removed.add(item)
+
+        if removed is not None:
+            # Rebuilt once, rather than removing each item from the lists
+            self._items_sy = [item for item in self._items_sy
+                              if item not in removed]
+            self._items_dynamic = [item for item in self._items_dynamic
+                                   if item not in removed]
+            self._items_bl = [item._item for item in self._items_sy]
+
+    def _checkSubItems(self):
+        """Add the sub-items that appeared since the marker changed. Return
+        whether it changed"""
+        marker = self._getSubItemsMarker()
+        if (marker is not None) and (marker == self._sub_items_marker):
+            return False
+        self._sub_items_marker = marker
+        for item in list(set(self._getSubItems()) - set(self._items_bl)):
+            self.addChildren(item)
+        return True
 
     def addChildren(self, children):
+        if self._items_sy is NO_ITEMS:
+            self._items_bl = []
+            self._items_sy = []
         self._items_bl.append(children)
         children = self.getParent().getItem(children)
         children._parent_synchronizer = self
         self._items_sy.append(children)
+        if children.DYNAMIC_SUB_ITEMS:
+            if self._items_dynamic is NO_ITEMS:
+                self._items_dynamic = []
+            self._items_dynamic.append(children)
         return children
 
     def remove(self):
-        self.getParent().removeSynchronizedItem(self._itemID)
+        self.getParent().removeSynchronizedItem(self)
 
     def getItemID(self):
-        return self._itemID
+        return id(self._item)
 
     def __str__(self):
         return self._name
@@ -115,26 +162,60 @@ class Base(base.Base):
     def _getSubItems(self):
         return []
 
+    def _getSubItemsMarker(self):
+        """Cheap value that changes when sub-items are added or removed:
+        the sub-items are only compared when it changes. None compares them
+        every frame"""
+        return None
+
 
 class Master(Base):
+    __slots__ = ('_synchronizationID',)
+
     def __init__(self, parent, item):
         Base.__init__(self, parent, item)
-        self._created = False
-
-    def __del__(self):
-        Base.__del__(self)
-        self.activate(False)
+        self._synchronizationID = parent.allocateItemID()
 
     def addChildren(self, children):
         children = Base.addChildren(self, children)
         self.getParent().addItem(children, self)
 
     def remove(self):
+        """Remove the sub-items, then this item, from the slaves and from
+        the synchronizer"""
+        for item in self._items_sy:
+            item.remove()
         self.getParent().removeItem(self)
         Base.remove(self)
+        self.release()
+
+    def getItemID(self):
+        """Identifier of the item inside the synchronization stream"""
+        return self._synchronizationID
 
     def getSynchronizerBuffer(self):
-        return Buffer()
+        buff = Buffer()
+        self.writeSynchronizerBuffer(buff)
+        return buff
+
+    def writeSynchronizerBuffer(self, buff):
+        """Write the changes of the item at the end of buff: the
+        synchronizer gives its frame buffer, so they are not copied"""
+        pass
+
+    def resynchronize(self):
+        """Send the whole state of the item at its next poll, for the nodes
+        that missed the previous frames"""
+        pass
+
+    def setSynchronizationRate(self, period=1, priority=0):
+        """Poll this item every period frames, or only after touch() when
+        period is 0. Items of highest priority are sent first"""
+        self.getParent().setSynchronizationRate(self, period, priority)
+
+    def touch(self):
+        """Poll this item at next frame, whatever its period"""
+        self.getParent().touchItem(self)
 
     def activate(self, enable, recursive=False):
         self.getParent()._activateItem(self, enable)
@@ -145,15 +226,65 @@ class Master(Base):
 
 
 class Slave(Base):
+    __slots__ = ('_unbound_sub_items', '_bound_sub_items')
+
     def __init__(self, parent, item):
         Base.__init__(self, parent, item)
+        # Sub-items not bound yet to an item of the master, by name. Both
+        # are allocated with the first sub-item
+        self._unbound_sub_items = None
+        self._bound_sub_items = None
+
+    def release(self):
+        """End the blender object of this item, that the master removed"""
+        if hasattr(self._item, 'endObject'):
+            try:
+                self._item.endObject()
+                bge.logic.getCurrentScene().resume()
+            except SystemError:
+                # Already ended by the logic of the slave itself
+                pass
+        Base.release(self)
+        self._unbound_sub_items = self._bound_sub_items = None
+
+    def _allocateSubItems(self):
+        if self._unbound_sub_items is None:
+            self._unbound_sub_items = {}
+            self._bound_sub_items = set()
+
+    def _addBoundSubItem(self, item):
+        """Bind item, created for an item of the master, before it is
+        added as a sub-item"""
+        self._allocateSubItems()
+        self._bound_sub_items.add(item)
 
-    def getItemByName(self, name, sg_parent):
-        for subItem in self._getSubItems():
-            if str(subItem) == name:
-                return subItem
+    def addChildren(self, children):
+        self._allocateSubItems()
+        if children not in self._bound_sub_items:
+            self._unbound_sub_items.setdefault(str(children),
+                                               []).append(children)
+        return Base.addChildren(self, children)
+
+    def _bindSubItem(self, name):
+        if self._unbound_sub_items is None:
+            return None
+        candidates = self._unbound_sub_items.get(name)
+        while candidates:
+            item = candidates.pop()
+            if not getattr(item, 'invalid', False):
+                self._bound_sub_items.add(item)
+                return item
         return None
 
+    def getItemByName(self, name, sg_parent):
+        """Bind the sub-item of that name to an item of the master. Each
+        sub-item is bound once, so several items of the master with the same
+        name get distinct sub-items"""
+        item = self._bindSubItem(name)
+        if item is None and self._checkSubItems():
+            item = self._bindSubItem(name)
+        return item
+
     def processSynchronizerBuffer(self, buffer):
         return
 
@@ -163,4 +294,13 @@ class Slave(Base):
             self._items_bl.remove(children._item)
         if children in self._items_sy:
             self._items_sy.remove(children)
+        if children in self._items_dynamic:
+            self._items_dynamic.remove(children)
+        if self._bound_sub_items is not None:
+            self._bound_sub_items.discard(children._item)
+            candidates = self._unbound_sub_items.get(str(children))
+            if candidates and children._item in candidates:
+                candidates.remove(children._item)
+        # Compare the sub-items again at next check
+        self._sub_items_marker = None
 
@@ -42,16 +42,22 @@ from . import item_object
 
 
 class Camera:
+    __slots__ = ()
+
     pass
 
 
 class Master(Camera, item_object.Master):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         Camera.__init__(self)
         item_object.Master.__init__(self, parent, item)
 
 
 class Slave(Camera, item_object.Slave):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         Camera.__init__(self)
         item_object.Slave.__init__(self, parent, item)
@@ -40,17 +40,23 @@ from . import item_base
 
 
 class Default:
+    __slots__ = ()
+
     def isSynchronizable(self):
         return False
 
 
 class Master(Default, item_base.Master):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         Default.__init__(self)
         item_base.Master.__init__(self, parent, item)
 
 
 class Slave(Default, item_base.Slave):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         Default.__init__(self)
         item_base.Slave.__init__(self, parent, item)
@@ -36,40 +36,27 @@
 ## knowledge of the CeCILL license and that you accept its terms.
 ##
 
-#import copy
-import mathutils
 from . import item_object
+from .. import schema
 
 
 class Light:
-    COLOR = b'c'
+    __slots__ = ()
+
+    ATTRIBUTES_SCHEMA = schema.Schema([('color', 'vector_3')])
 
 
 class Master(Light, item_object.Master):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         Light.__init__(self)
         item_object.Master.__init__(self, parent, item)
-        self._previousColor = mathutils.Vector()
-
-    def getSynchronizerBuffer(self):
-        buff = item_object.Master.getSynchronizerBuffer(self)
-
-        if self._previousColor != self._item.color:
-            self_previousColor = self._item.color
-            buff.command(self.COLOR)
-            buff.vector_3(self_previousColor)
-
-        return buff
 
 
 class Slave(Light, item_object.Slave):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         Light.__init__(self)
         item_object.Slave.__init__(self, parent, item)
-
-    def _processCommand(self, command, buff):
-        item_object.Slave._processCommand(self, command, buff)
-
-        if command == self.COLOR:
-            self._item.color = buff.vector_3()
-
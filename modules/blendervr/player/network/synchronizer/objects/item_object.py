@@ -36,81 +36,177 @@
 ## knowledge of the CeCILL license and that you accept its terms.
 ##
 
-import copy
 import mathutils
 from . import item_base
+from .. import schema
 from ....buffer import Buffer
 
+# Changes of attributes that a slave has not synchronized yet, kept by item.
+# Beyond, the slave asks the master for the whole state of the item
+PENDING_ATTRIBUTES = 64
+
 
 class Object:
+    __slots__ = ()
 
-    POSITION = b'p'
-    ORIENTATION = b'o'
-    SCALE = b's'
     VISIBILITY = b'v'
+    SET_ATTRIBUTES = b'a'
+
+    # Attributes of the item synchronized through a schema.Schema
+    ATTRIBUTES_SCHEMA = None
+
+    # Game properties that set the synchronization rate of an object
+    PERIOD_PROPERTY = 'blendervr_sync_period'
+    PRIORITY_PROPERTY = 'blendervr_sync_priority'
+    # Game property listing the game properties to synchronize, as
+    # 'name:type name:type ...' (see schema.TYPES)
+    PROPERTIES_PROPERTY = 'blendervr_sync_properties'
 
     def default(self):
         pass
 
+    def _initAttributes(self):
+        self._attributes = ()
+        if self.ATTRIBUTES_SCHEMA is not None:
+            self.synchronizeAttributes(self.ATTRIBUTES_SCHEMA)
+        if self.PROPERTIES_PROPERTY in self._item:
+            self.synchronizeAttributes(schema.getPropertiesSchema(
+                                self._item[self.PROPERTIES_PROPERTY]))
+
+    def synchronizeAttributes(self, attributes_schema):
+        """Synchronize the attributes (or the game properties) of the
+        item given by the schema. Must be called in the same order on all
+        the nodes"""
+        self._attributes += (schema.Tracker(attributes_schema, self._item),)
+
 
 class Master(Object, item_base.Master):
+    __slots__ = ('_transform_row', '_transform_polled', '_previousVisibility',
+                 '_attributes')
+
     def __init__(self, parent, item):
         Object.__init__(self)
+        # Row of the transform inside the snapshot of the synchronizer
+        self._transform_row = None
+        # Whether the transform was polled in this frame, None when it is
+        # compared at every frame
+        self._transform_polled = None
         item_base.Master.__init__(self, parent, item)
-        self._previousPosition = mathutils.Vector()
-        self._previousOrientation = mathutils.Matrix()
-        self._previousScale = mathutils.Vector()
+        self._initAttributes()
         self._previousVisibility = True
-
-
-    def getSynchronizerBuffer(self):
-        buff = Buffer()
-
-        if self._previousPosition != self._item.worldPosition:
-            self._previousPosition = copy.copy(self._item.worldPosition)
-            buff.command(self.POSITION)
-            buff.vector_3(self._previousPosition)
-
-        if self._previousOrientation != self._item.worldOrientation:
-            self._previousOrientation = copy.copy(self._item.worldOrientation)
-            buff.command(self.ORIENTATION)
-            buff.matrix_3x3(self._previousOrientation)
-
-        if self._previousScale != self._item.worldScale:
-            self._previousScale = copy.copy(self._item.worldScale)
-            buff.command(self.SCALE)
-            buff.vector_3(self._previousScale)
+        if (self.PERIOD_PROPERTY in self._item) or \
+                                (self.PRIORITY_PROPERTY in self._item):
+            self.setSynchronizationRate(
+                            self._item.get(self.PERIOD_PROPERTY, 1),
+                            self._item.get(self.PRIORITY_PROPERTY, 0))
+
+    def activate(self, enable, recursive=False):
+        # Transforms are not sent inside the object buffer: the synchronizer
+        # finds the moving objects among all the tracked ones at once
+        self.getParent().trackTransform(self, enable)
+        item_base.Master.activate(self, enable, recursive)
+
+    def resynchronize(self):
+        self._previousVisibility = None
+        for tracker in self._attributes:
+            tracker.touch()
+        if self._transform_row is not None:
+            self.getParent().resendTransform(self)
+
+    def writeSynchronizerBuffer(self, buff):
+        if self._transform_polled is False:
+            self.getParent().pollTransform(self)
 
         if self._previousVisibility != self._item.visible:
             self._previousVisibility = self._item.visible
             buff.command(self.VISIBILITY)
             buff.boolean(self._previousVisibility)
 
-        return buff
+        for index, tracker in enumerate(self._attributes):
+            # A missing game property must not abort the frame
+            changes = tracker.getValidChanges(self.logger, self._name)
+            if changes is not None:
+                buff.command(self.SET_ATTRIBUTES)
+                buff.unsigned_char(index)
+                buff.raw(changes)
 
 
 class Slave(Object, item_base.Slave):
+    __slots__ = ('_attributes', '_pending_attributes', '_attributes_lost')
+
     def __init__(self, parent, item):
         Object.__init__(self)
+        self._pending_attributes = None
+        # Changes have been dropped: the whole state is needed
+        self._attributes_lost = False
         item_base.Slave.__init__(self, parent, item)
-
+        self._initAttributes()
+
+    def synchronizeAttributes(self, attributes_schema):
+        Object.synchronizeAttributes(self, attributes_schema)
+        pending = self._pending_attributes
+        if pending is not None:
+            self._pending_attributes = None
+            for buff in pending:
+                Slave.processSynchronizerBuffer(self, buff)
+        if self._attributes_lost:
+            self._attributes_lost = False
+            self.getParent().requestResend(self)
+
+    def _queueAttributes(self, index, buff):
+        """Keep the changes of attributes that this slave has not
+        synchronized yet, until synchronizeAttributes(). Their size is only
+        known by their schema: the rest of the buffer waits with them.
+
+        The changes are deltas: when too many wait, they are all dropped,
+        and the master is asked for the whole state of the item once they
+        can be read"""
+        if self._attributes_lost:
+            buff.raw(size=len(buff))
+            return
+        pending = self._pending_attributes
+        if pending is None:
+            pending = self._pending_attributes = []
+        if len(pending) == PENDING_ATTRIBUTES:
+            self.logger.warning('Attributes of', self._name, 'not '
+                                'synchronized by this node: their whole '
+                                'state will be asked to the master')
+            self._pending_attributes = None
+            self._attributes_lost = True
+            buff.raw(size=len(buff))
+            return
+        queued = Buffer()
+        queued.command(self.SET_ATTRIBUTES)
+        queued.unsigned_char(index)
+        queued.raw(buff.raw(size=len(buff)))
+        pending.append(queued)
+
+    def setTransform(self, position, orientation, scale):
+        if position is not None:
+            self._item.worldPosition = position
+
+        if orientation is not None:
+            self._item.worldOrientation = mathutils.Matrix(
+                                                    (orientation[0:3],
+                                                     orientation[3:6],
+                                                     orientation[6:9]))
+
+        if scale is not None:
+            self._item.worldScale = scale
 
     def _processCommand(self, command, buff):
-        if command == self.POSITION:
-            self._item.worldPosition = buff.vector_3()
-
-        if command == self.ORIENTATION:
-            self._item.worldOrientation = buff.matrix_3x3()
-
-        if command == self.SCALE:
-            self._item.worldScale = buff.vector_3()
-
         if command == self.VISIBILITY:
             self._item.setVisible(buff.boolean())
 
+        elif command == self.SET_ATTRIBUTES:
+            index = buff.unsigned_char()
+            if index < len(self._attributes):
+                self._attributes[index].processChanges(buff)
+            else:
+                self._queueAttributes(index, buff)
+
 
     def processSynchronizerBuffer(self, buff):
         while len(buff) > 0:
             command = buff.command()
             self._processCommand(command, buff)
-
@@ -42,6 +42,10 @@ from . import item_base
 
 
 class Root:
+    __slots__ = ()
+
+    DYNAMIC_SUB_ITEMS = True
+
     def default(self):
         return
 
@@ -51,15 +55,21 @@ class Root:
     def _getSubItems(self):
         return [self._item.getCurrentScene()]
 
+    def _getSubItemsMarker(self):
+        return self._item.getCurrentScene()
+
 
 class Master(Root, item_base.Master):
+    __slots__ = ()
+
     def __init__(self, parent, item):
         Root.__init__(self)
         item_base.Master.__init__(self, parent, item)
-        self._created = True
 
 
 class Slave(Root, item_base.Slave):
+    __slots__ = ()
+
     def __init__(self, parent, buffer):
         Root.__init__(self)
         item_base.Slave.__init__(self, parent, buffer)
@@ -39,33 +39,49 @@
 import copy
 import mathutils
 from . import item_base
-from ....buffer import Buffer
 
 
 class Scene:
+    __slots__ = ()
+
+    DYNAMIC_SUB_ITEMS = True
+
     def default(self):
         return
 
     def _getSubItems(self):
         return list(self._item.objects)
 
+    def _getSubItemsMarker(self):
+        # The BGE appends new objects at the end of the list: any addition
+        # changes the last object, and a removal alone changes the length.
+        # The last object is kept (not its id) so it cannot be recycled
+        objects = self._item.objects
+        if len(objects) == 0:
+            return (0, None)
+        return (len(objects), objects[-1])
+
 
 class Master(Scene, item_base.Master):
+    __slots__ = ('_previousCamera',)
+
     def __init__(self, parent, item):
         Scene.__init__(self)
         item_base.Master.__init__(self, parent, item)
         self._previousCamera = self._item.active_camera
-        self._created = False
 
-    def getSynchronizerBuffer(self):
-        buff = Buffer()
+    def resynchronize(self):
+        self._previousCamera = None
+
+    def writeSynchronizerBuffer(self, buff):
         if self._previousCamera != self._item.active_camera:
             self._previousCamera = self._item.active_camera
             buff.string(str(self._previousCamera))
-        return buff
 
 
 class Slave(Scene, item_base.Slave):
+    __slots__ = ()
+
     def __init__(self, parent, buff):
         Scene.__init__(self)
         item_base.Slave.__init__(self, parent, buff)
@@ -81,7 +97,15 @@ class Slave(Scene, item_base.Slave):
                     parent = name
             else:
                 parent = name
+            marker = self._getSubItemsMarker()
             item = self._item.addObject(name, parent)
+            self._addBoundSubItem(item)
+            if marker == self._sub_items_marker and \
+                        self._getSubItemsMarker() == (marker[0] + 1, item):
+                # Only this object was added: register it now rather than
+                # comparing all the objects at next check
+                self.addChildren(item)
+                self._sub_items_marker = (marker[0] + 1, item)
         return item
 
     def processSynchronizerBuffer(self, buff):
@@ -36,15 +36,73 @@
 ## knowledge of the CeCILL license and that you accept its terms.
 ##
 
+import array
+import itertools
+import operator
+import mathutils
 from ....buffer import Buffer
+from .....tools import profiler
 from . import Synchronizer
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Each tracked transform is a row of 15 doubles: the position, the
+# orientation by rows, then the scale
+POSITION_COLUMNS = (0, 3)
+ORIENTATION_COLUMNS = (3, 12)
+SCALE_COLUMNS = (12, 15)
+TRANSFORM_SIZE = 15
+# Identifier, flags and 15 floats on the wire
+TRANSFORM_MAXIMUM_SIZE = 4 + 1 + 4 * TRANSFORM_SIZE
+
+
+def _readTransform(blender_object):
+    """Transform of an object, as a tuple of floats"""
+    orientation = blender_object.worldOrientation
+    # Slices read the mathutils values at once, not item by item
+    return (blender_object.worldPosition[:] + orientation[0][:]
+            + orientation[1][:] + orientation[2][:]
+            + blender_object.worldScale[:])
+
+
+def _setTransform(blender_object, position, orientation):
+    if position is not None:
+        blender_object.worldPosition = position
+    if orientation is not None:
+        blender_object.worldOrientation = mathutils.Matrix(
+                                                    (orientation[0:3],
+                                                     orientation[3:6],
+                                                     orientation[6:9]))
+
 
 class Master(Synchronizer):
     def __init__(self, parent):
         self._items_update = Buffer()
+        # Snapshot of the last sent transforms of the tracked objects
+        self._transforms_items = []
+        self._transforms_objects = []
+        self._transforms_ids = array.array('I')
+        self._transforms_previous = array.array('d')
+        # Transforms read at last frame, when all of them were compared
+        self._transforms_read = None
+        # Objects whose transform is only sent when they are polled (see
+        # _isTransformPolled()), and the ones polled during this frame
+        self._transforms_masked = 0
+        self._transforms_polled = []
+        # Objects drawn at the transform decoded by the slaves during this
+        # frame: item, transform read, decoded position and orientation
+        self._transforms_decoded = []
+        self._transforms_epsilon = parent.getTransformEpsilon()
+        # All the items are created again at next check
+        self._snapshot = False
         Synchronizer.__init__(self, parent)
 
+    def allocateItemID(self):
+        return self._synchronizer.allocateID()
+
     def _activateItem(self, synchronizerItem, activate):
         if synchronizerItem.isSynchronizable():
             item_id = synchronizerItem.getItemID()
@@ -52,16 +110,297 @@ class Master(Synchronizer):
                 self._synchronizer.addSynchronizedObject(item_id,
                                                          synchronizerItem)
             else:
-                self._synchronizer.removeSynchronizedObject(item_id)
+                self._synchronizer.removeSynchronizedObject(item_id,
+                                                            keep_rate=True)
 
     def getSynchronizerBuffer(self):
         return None
 
-    def sendItemsUpdateToSlaves(self, buff):
+    def setSynchronizationRate(self, item, period, priority):
+        self._synchronizer.setSynchronizationRate(item.getItemID(), period,
+                                                  priority)
+        if getattr(item, '_transform_row', None) is not None:
+            self._maskTransform(item, self._isTransformPolled(item))
+
+    def touchItem(self, item):
+        self._synchronizer.touchSynchronizedObject(item.getItemID())
+
+    def sendItemsUpdateToSlaves(self, buff, command=None):
+        start = len(self._items_update)
         self._items_update += buff
+        self._profileItemsUpdate(command, start)
+
+    def _profileItemsUpdate(self, command, start):
+        """Profile what has been written in the items update since start"""
+        profile = self._synchronizer.getProfile()
+        if profile is not None and command is not None:
+            profile.addCommand(command, len(self._items_update) - start)
+
+    def _isTransformPolled(self, item):
+        """Whether the transform of the object is only sent when the object
+        itself is: it has a rate class, or the frames have a byte budget.
+        The other transforms are all compared at once, at the end of the
+        frame"""
+        return self._synchronizer.getSynchronizationBudget() > 0 or \
+            self._synchronizer.getSynchronizationPeriod(item.getItemID()) != 1
+
+    def _maskTransform(self, item, masked):
+        """item._transform_polled is None for the objects always compared,
+        False for the other ones, until they are polled during the frame"""
+        if masked == (item._transform_polled is not None):
+            return
+        if masked:
+            item._transform_polled = False
+            self._transforms_masked += 1
+        else:
+            item._transform_polled = None
+            self._transforms_masked -= 1
+
+    def updateTransformsPolling(self):
+        """The byte budget, or the rate classes, changed"""
+        for item in self._transforms_items:
+            self._maskTransform(item, self._isTransformPolled(item))
+
+    def trackTransform(self, item, enable):
+        """Start or stop the tracking of the transform of an object"""
+        row = item._transform_row
+        self._transforms_read = None
+        if enable:
+            if row is None:
+                item._transform_row = len(self._transforms_items)
+                self._transforms_items.append(item)
+                self._transforms_objects.append(item._item)
+                self._transforms_ids.append(item.getItemID())
+                # Not a number never matches: the whole transform is sent at
+                # first frame
+                self._transforms_previous.extend([float('nan')]
+                                                 * TRANSFORM_SIZE)
+                self._maskTransform(item, self._isTransformPolled(item))
+        elif row is not None:
+            self._maskTransform(item, False)
+            # The last row fills the hole, so the rows stay contiguous
+            last = self._transforms_items.pop()
+            last_object = self._transforms_objects.pop()
+            last_id = self._transforms_ids.pop()
+            if last is not item:
+                self._transforms_items[row] = last
+                self._transforms_objects[row] = last_object
+                self._transforms_ids[row] = last_id
+                last._transform_row = row
+                start = row * TRANSFORM_SIZE
+                self._transforms_previous[start:start + TRANSFORM_SIZE] = \
+                            self._transforms_previous[-TRANSFORM_SIZE:]
+            del(self._transforms_previous[-TRANSFORM_SIZE:])
+            item._transform_row = None
+
+    def resendTransform(self, item):
+        """Send the whole transform of this tracked object at its next
+        poll"""
+        self._transforms_read = None
+        start = item._transform_row * TRANSFORM_SIZE
+        self._transforms_previous[start:start + TRANSFORM_SIZE] = \
+                            array.array('d', [float('nan')] * TRANSFORM_SIZE)
+
+    def pollTransform(self, item):
+        """Compare the transform of this object, whose transform is masked,
+        at the end of the frame"""
+        item._transform_polled = True
+        self._transforms_polled.append(item)
+
+    def getPolledTransformsSize(self):
+        """Upper bound of the size of the transforms polled in this frame"""
+        return len(self._transforms_polled) * TRANSFORM_MAXIMUM_SIZE
+
+    def _getCurrentTransforms(self):
+        """Transforms of all the tracked objects, read in one pass, as one
+        tuple of floats per row. The BGE gives no way to know which objects
+        moved: they are all read, and only compared inside the snapshot
+        store"""
+        return list(map(_readTransform, self._transforms_objects))
+
+    def _getDueRows(self):
+        """Rows to compare in this frame, or None for all of them"""
+        if self._transforms_masked == 0:
+            return None
+        rows = [row for row, item in enumerate(self._transforms_items)
+                if item._transform_polled is not False]
+        for item in self._transforms_polled:
+            if item._transform_polled:
+                item._transform_polled = False
+        return rows
+
+    def _getChangedTransforms(self, rows, current):
+        """Rows, identifiers, flags, positions, orientations and scales of the
+        transforms of the given rows that moved further than epsilon since
+        they were sent. current holds the values of these rows only. The
+        snapshot is updated with the sent parts"""
+        epsilon = self._transforms_epsilon
+        previous = self._transforms_previous
+        columns = ((self.TRANSFORM_POSITION, POSITION_COLUMNS),
+                   (self.TRANSFORM_ORIENTATION, ORIENTATION_COLUMNS),
+                   (self.TRANSFORM_SCALE, SCALE_COLUMNS))
+        if numpy is not None:
+            rows = numpy.array(rows, 'intp')
+            current = numpy.frombuffer(current).reshape(-1, TRANSFORM_SIZE)
+            previous = numpy.frombuffer(previous).reshape(-1, TRANSFORM_SIZE)
+            # Written negated, so that not a number counts as a change
+            changed = ~(numpy.abs(current - previous[rows]) <= epsilon)
+            parts = []
+            flags = numpy.zeros(len(current), 'u1')
+            for flag, (start, end) in columns:
+                moved = changed[:, start:end].any(axis=1)
+                flags[moved] |= flag
+                parts.append(current[moved, start:end].ravel())
+                previous[rows[moved], start:end] = current[moved, start:end]
+            moved = rows[flags.nonzero()[0]]
+            ids = numpy.frombuffer(self._transforms_ids, 'u4')[moved]
+            return [moved, ids, flags[flags != 0]] + parts
+
+        moved = []
+        ids = array.array('I')
+        flags = array.array('B')
+        parts = [array.array('d'), array.array('d'), array.array('d')]
+        for index, row in enumerate(rows):
+            offset = row * TRANSFORM_SIZE
+            values_offset = index * TRANSFORM_SIZE
+            row_flags = 0
+            for part, (flag, (start, end)) in zip(parts, columns):
+                values = current[values_offset + start:values_offset + end]
+                start += offset
+                end += offset
+                if values == previous[start:end] or (epsilon > 0 and
+                        all(abs(value - last) <= epsilon for value, last
+                            in zip(values, previous[start:end]))):
+                    continue
+                row_flags |= flag
+                part.extend(values)
+                previous[start:end] = values
+            if row_flags:
+                moved.append(row)
+                ids.append(self._transforms_ids[row])
+                flags.append(row_flags)
+        return [moved, ids, flags] + parts
+
+    def _profileTransforms(self, profile, rows, flags, offsets):
+        """Profile the sent transforms by object, given the offsets of
+        their parts inside the buffer"""
+        sizes = [end - start for start, end in zip(offsets, offsets[1:])]
+        for row, size in zip(rows, profiler.splitTransforms(flags, sizes)):
+            item = self._transforms_items[row]
+            profile.addObject('TRANSFORMS', str(item),
+                              item.__class__.__module__.split('.')[-1], size)
+
+    def _drawDecodedTransforms(self, rows, flags, transforms, positions,
+                               orientations):
+        """Draw the sent objects at the transform the slaves decode, so the
+        screens of the master and of the slaves match"""
+        decoded = self._transforms_decoded
+        position_offset = 0
+        orientation_offset = 0
+        for row, row_flags in zip(rows, flags):
+            position = None
+            orientation = None
+            if row_flags & self.TRANSFORM_POSITION:
+                position = positions[position_offset:position_offset + 3]
+                position_offset += 3
+            if row_flags & self.TRANSFORM_ORIENTATION:
+                orientation = orientations[orientation_offset:
+                                           orientation_offset + 9]
+                orientation_offset += 9
+            if position is None and orientation is None:
+                continue
+            item = self._transforms_items[row]
+            _setTransform(item._item, position, orientation)
+            decoded.append((item, transforms[row], position, orientation))
+
+    def _keepDecodedTransforms(self, current):
+        """The objects drawn at their decoded transform at last frame, that
+        did not move since, keep it for good: as on the user, the decoded
+        transform stands as long as the source one does not change. So an
+        object moving slower than the codec precision moves anyway"""
+        previous = self._transforms_previous
+        for item, transform, position, orientation in self._transforms_decoded:
+            row = item._transform_row
+            if row is None or current[row] != transform:
+                continue
+            _setTransform(item._item, position, orientation)
+            current[row] = _readTransform(item._item)
+            # Unless the object must be sent again, what was sent is now read
+            offset = row * TRANSFORM_SIZE
+            for part, (start, end) in ((position, POSITION_COLUMNS),
+                                       (orientation, ORIENTATION_COLUMNS)):
+                if part is not None and previous[offset + start:
+                            offset + end] == array.array('d',
+                                                    transform[start:end]):
+                    previous[offset + start:offset + end] = \
+                                    array.array('d', current[row][start:end])
+        self._transforms_decoded = []
+
+    def restoreTransforms(self):
+        """Give back their own transform to the objects drawn at the
+        decoded one, once the frame is drawn: the game logic goes on from
+        it"""
+        for item, transform, position, orientation in self._transforms_decoded:
+            if item._transform_row is None:
+                continue
+            _setTransform(item._item,
+                          None if position is None else transform[0:3],
+                          None if orientation is None else transform[3:12])
+
+    def writeTransforms(self, buff):
+        """Write the changed transforms at the end of buff"""
+        rows = self._getDueRows()
+        self._transforms_polled = []
+        if len(self._transforms_items) == 0:
+            self._transforms_decoded = []
+            return
+        current = self._getCurrentTransforms()
+        if len(self._transforms_decoded) > 0:
+            self._keepDecodedTransforms(current)
+        transforms = current
+        if rows is not None:
+            # The rows not due keep changes that were not compared
+            self._transforms_read = None
+        else:
+            if self._transforms_read is None:
+                rows = range(len(current))
+            else:
+                # Rows read as at last frame were compared then: the parts
+                # that differ from the sent ones are under epsilon
+                rows = list(itertools.compress(itertools.count(),
+                            map(operator.ne, current, self._transforms_read)))
+            self._transforms_read = current
+            if len(rows) == 0:
+                return
+        if len(rows) < len(current):
+            current = [current[row] for row in rows]
+        moved, ids, flags, positions, orientations, scales = \
+                self._getChangedTransforms(rows, array.array('d',
+                                    itertools.chain.from_iterable(current)))
+        if len(ids) > 0:
+            codec = self._synchronizer.getCodec()
+            offsets = [len(buff)]
+            buff.array('I', ids)
+            buff.array('B', flags)
+            offsets.append(len(buff))
+            decoded_positions = codec.positions(buff, positions)
+            offsets.append(len(buff))
+            decoded_orientations = codec.orientations(buff, orientations)
+            offsets.append(len(buff))
+            buff.array('f', scales)
+            offsets.append(len(buff))
+            profile = self._synchronizer.getProfile()
+            if profile is not None:
+                self._profileTransforms(profile, moved, flags, offsets)
+            if decoded_positions is not positions or \
+                                    decoded_orientations is not orientations:
+                self._drawDecodedTransforms(moved, flags, transforms,
+                                            decoded_positions,
+                                            decoded_orientations)
 
     def addItem(self, children, parent):
-        buff = Buffer()
+        buff = self._items_update
+        start = len(buff)
         buff.command(self.CREATE_ITEM)
         buff.itemID(children.getItemID())
         buff.string(str(children))
@@ -72,16 +411,32 @@ class Master(Synchronizer):
             buff.itemID(sg_parent.getItemID())
         else:
             buff.itemID(0)
-        self.sendItemsUpdateToSlaves(buff)
+        self._profileItemsUpdate('CREATE_ITEM', start)
 
     def removeItem(self, item):
-        buff = Buffer()
+        if hasattr(item, '_transform_row'):
+            self.trackTransform(item, False)
+        buff = self._items_update
+        start = len(buff)
         buff.command(self.DELETE_ITEM)
         buff.itemID(item.getItemID())
-        self.sendItemsUpdateToSlaves(buff)
+        self._profileItemsUpdate('DELETE_ITEM', start)
+
+    def resynchronize(self):
+        """Create again all the items of the scene at next check, after the
+        items updates of this frame"""
+        self._snapshot = True
+
+    def _addSnapshot(self, item):
+        for children in item._items_sy:
+            self.addItem(children, item)
+            self._addSnapshot(children)
 
     def checkItems(self):
         Synchronizer.checkItems(self)
+        if self._snapshot:
+            self._snapshot = False
+            self._addSnapshot(self._root)
         buff = self._items_update
         self._items_update = Buffer()
         return buff
@@ -65,7 +65,7 @@ class Slave(Synchronizer):
                         del(self._items[local_item_id])
                     if hasattr(sync_item, '_parent_synchronizer'):
                         sync_item._parent_synchronizer.removeChildren(sync_item)
-                    del(sync_item)
+                    sync_item.release()
                 continue
 
             if command == self.CREATE_ITEM:
@@ -73,6 +73,10 @@ class Slave(Synchronizer):
                 children_name = buff.string()
                 parent_id = buff.itemID()
                 sg_parent = buff.itemID()
+                # Identifiers are never reused: an item already created comes
+                # from a snapshot of the master
+                if self.getObjectByMasterID(children_id) is not None:
+                    continue
                 parent_item = self.getObjectByMasterID(parent_id)
                 if not parent_item:
                     continue
@@ -86,5 +90,34 @@ class Slave(Synchronizer):
                                           + str(command) + ") !")
         return
 
+    def processTransformsBuffer(self, buff):
+        codec = self._synchronizer.getCodec()
+        ids = buff.array('I')
+        flags = buff.array('B')
+        positions = codec.positions(buff)
+        orientations = codec.orientations(buff)
+        scales = buff.array('f')
+
+        position_index = orientation_index = scale_index = 0
+        for index, flag in enumerate(flags):
+            position = orientation = scale = None
+            if flag & self.TRANSFORM_POSITION:
+                position = positions[position_index:position_index + 3]
+                position_index += 3
+            if flag & self.TRANSFORM_ORIENTATION:
+                orientation = orientations[orientation_index:
+                                           orientation_index + 9]
+                orientation_index += 9
+            if flag & self.TRANSFORM_SCALE:
+                scale = scales[scale_index:scale_index + 3]
+                scale_index += 3
+            item = self.getObjectByMasterID(int(ids[index]))
+            if item:
+                item.setTransform(position, orientation, scale)
+
     def getObjectByMasterID(self, master_id):
         return self._synchronizer.getObjectByID(master_id)
+
+    def requestResend(self, item):
+        """Ask the master for the whole state of this item"""
+        self._synchronizer.requestResend(item)
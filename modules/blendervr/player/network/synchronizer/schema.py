@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+# file: blendervr/player/network/synchronizer/schema.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+
+"""Declarative synchronization of typed attributes.
+
+A Schema lists the attributes of an object to synchronize, with their type.
+It compiles them once into a reader and an encoder generated for the
+schema: the master reads all the attributes of an object with one call, and
+detects that nothing changed by comparing two tuples.
+
+When something changed, the values are packed with a single struct, and
+only the attributes whose packed value changed are sent, after a bitmask of
+them.
+"""
+
+import struct
+import mathutils
+from ... import base
+from ... import exceptions
+from ...buffer import Buffer
+
+# Type of an attribute: struct codes and shape of its value
+TYPES = {'boolean': ('?', None),
+         'integer': ('i', None),
+         'float': ('f', None),
+         'double': ('d', None),
+         'vector_3': ('3f', 3),
+         'vector_4': ('4f', 4),
+         'matrix_3x3': ('9f', (3, 3)),
+         'matrix_4x4': ('16f', (4, 4)),
+         'string': (None, None)}
+
+STRING_SIZE = struct.Struct('>i')
+
+# Errors of the reader and of the encoder of a schema when an attribute is
+# missing or its value does not fit its type
+VALUE_ERRORS = (KeyError, AttributeError, TypeError, ValueError,
+                OverflowError, struct.error)
+
+# Schemas of the game properties declared inside the blender files
+_properties_schemas = {}
+
+
+def getPropertiesSchema(description):
+    """Schema of game properties described as 'name:type name:type ...'.
+    Schemas are compiled once per description"""
+    try:
+        return _properties_schemas[description]
+    except KeyError:
+        pass
+    fields = []
+    for field in description.split():
+        name, separator, type_name = field.rpartition(':')
+        if not separator:
+            raise exceptions.Synchronizer('Invalid synchronized game '
+                                          'property: ' + field)
+        fields.append((name, type_name))
+    _properties_schemas[description] = Schema(fields, True)
+    return _properties_schemas[description]
+
+
+class Field:
+    def __init__(self, index, name, type_name, offset):
+        self.index = index
+        self.name = name
+        self.type = type_name
+        self.codes, self.shape = TYPES[type_name]
+        self.struct = struct.Struct('>' + self.codes)
+        self.offset = offset
+        self.size = self.struct.size
+
+    def getValues(self, variable):
+        """Expressions of the packed values of the attribute, inside the
+        generated reader"""
+        if self.shape is None:
+            return [variable]
+        if isinstance(self.shape, int):
+            return [variable + '[' + str(index) + ']'
+                    for index in range(self.shape)]
+        return [variable + '[' + str(row) + '][' + str(column) + ']'
+                for row in range(self.shape[0])
+                for column in range(self.shape[1])]
+
+    def unpack(self, data):
+        values = self.struct.unpack(data)
+        if self.shape is None:
+            return values[0]
+        if isinstance(self.shape, int):
+            return mathutils.Vector(values)
+        columns = self.shape[1]
+        return mathutils.Matrix([values[row * columns:(row + 1) * columns]
+                                 for row in range(self.shape[0])])
+
+
+class Schema:
+    """Typed attributes of the objects to synchronize.
+
+    fields is a list of (name, type) with type among TYPES. The attributes
+    are read and written as object.name, or as object['name'] for game
+    properties."""
+
+    def __init__(self, fields, game_properties=False):
+        self._game_properties = game_properties
+        self._fields = []
+        self._strings = []
+        offset = 0
+        for index, (name, type_name) in enumerate(fields):
+            if type_name not in TYPES:
+                raise exceptions.Synchronizer('Invalid type of synchronized '
+                                    'attribute ' + name + ': ' + type_name)
+            if not game_properties and not name.isidentifier():
+                raise exceptions.Synchronizer('Invalid synchronized '
+                                              'attribute: ' + name)
+            if type_name == 'string':
+                self._strings.append((index, name))
+                continue
+            field = Field(index, name, type_name, offset)
+            self._fields.append(field)
+            offset += field.size
+        self._count = len(fields)
+        self._mask_size = (self._count + 7) // 8
+        self._packed = struct.Struct('>' + ''.join(field.codes
+                                                   for field in self._fields))
+        self._values_count = sum(len(field.getValues('v'))
+                                 for field in self._fields)
+        # Previous state that differs from any state: everything is sent
+        self.UNSENT = ((None,) * (self._values_count + len(self._strings)),
+                       b'')
+        self.read = self._generate(self._readerSource(), {}, 'read')
+        self.encode = self._generate(self._encoderSource(),
+                                     {'pack': self._packed.pack,
+                                      'size': STRING_SIZE.pack}, 'encode')
+
+    def _access(self, name):
+        if self._game_properties:
+            return 'target[' + repr(name) + ']'
+        return 'target.' + name
+
+    def _generate(self, lines, namespace, name):
+        exec(compile('\n'.join(lines), '<synchronization schema>', 'exec'),
+             namespace)
+        return namespace[name]
+
+    def _readerSource(self):
+        """Function giving the values of the attributes of a target, as a
+        flat tuple: the fixed size ones, then the strings"""
+        lines = ['def read(target):']
+        values = []
+        for field in self._fields:
+            variable = 'v' + str(field.index)
+            lines.append('    ' + variable + ' = ' + self._access(field.name))
+            values += field.getValues(variable)
+        values += [self._access(name) for index, name in self._strings]
+        lines.append('    return (' + ''.join(value + ', '
+                                              for value in values) + ')')
+        return lines
+
+    def _encoderSource(self):
+        """Function giving the changed attributes since the previous values,
+        after their mask, as bytes (None if nothing changed once packed),
+        and the packed values"""
+        lines = ['def encode(values, previous_values, previous):',
+                 '    packed = pack(' + ', '.join(
+                        'values[' + str(index) + ']'
+                        for index in range(self._values_count)) + ')',
+                 '    mask = 0',
+                 '    changes = []']
+        for field in self._fields:
+            data = '[' + str(field.offset) + ':' \
+                   + str(field.offset + field.size) + ']'
+            lines += ['    if packed' + data + ' != previous' + data + ':',
+                      '        mask |= ' + str(1 << field.index),
+                      '        changes.append(packed' + data + ')']
+        for position, (index, name) in enumerate(self._strings):
+            value = 'values[' + str(self._values_count + position) + ']'
+            lines += ['    if ' + value + ' != previous_' + value + ':',
+                      '        mask |= ' + str(1 << index),
+                      '        value = str(' + value + ').encode("UTF-8")',
+                      '        changes.append(size(len(value)) + value)']
+        lines += ['    if mask == 0:',
+                  '        return None, packed',
+                  '    return (mask.to_bytes(' + str(self._mask_size)
+                  + ', "little") + b"".join(changes), packed)']
+        return lines
+
+    def _setValue(self, target, name, value):
+        if self._game_properties:
+            target[name] = value
+        else:
+            setattr(target, name, value)
+
+    def decode(self, buff, target):
+        """Apply the changed attributes read inside buff to target"""
+        mask = bytes(buff.raw(size=self._mask_size))
+        for field in self._fields:
+            if mask[field.index >> 3] & (1 << (field.index & 7)):
+                self._setValue(target, field.name,
+                               field.unpack(buff.raw(size=field.size)))
+        for index, name in self._strings:
+            if mask[index >> 3] & (1 << (index & 7)):
+                self._setValue(target, name, buff.string())
+
+
+class Tracker:
+    """Synchronization state of the attributes of a target"""
+
+    def __init__(self, schema, target):
+        self._schema = schema
+        self._target = target
+        self._read = schema.read
+        self._values, self._packed = schema.UNSENT
+        # The last error of getChanges(), until the attributes are valid
+        # again
+        self.error = None
+
+    def getValidChanges(self, logger, name):
+        """Changed attributes, as getChanges(), or None while they are not
+        valid: the error is logged once, as a warning about name"""
+        try:
+            changes = self.getChanges()
+        except VALUE_ERRORS as error:
+            if self.error is None:
+                logger.warning('Attributes of', name, 'not synchronized:',
+                               repr(error))
+            self.error = error
+            return None
+        self.error = None
+        return changes
+
+    def getChanges(self):
+        """Changed attributes since the last call, as bytes, or None if
+        nothing changed. Raise one of VALUE_ERRORS if an attribute is
+        missing or does not fit its type"""
+        values = self._read(self._target)
+        if values == self._values:
+            return None
+        changes, self._packed = self._schema.encode(values, self._values,
+                                                    self._packed)
+        self._values = values
+        return changes
+
+    def touch(self):
+        """Send all the attributes again"""
+        self._values, self._packed = self._schema.UNSENT
+
+    def processChanges(self, buff):
+        self._schema.decode(buff, self._target)
+
+
+class Synchronized(base.Base):
+    """Object synchronizing the attributes of a target, given by a schema,
+    from the master to the slaves. It must be created with the same name
+    on all the nodes"""
+
+    def __init__(self, parent, name, schema, target):
+        super(Synchronized, self).__init__(parent)
+        self._tracker = Tracker(schema, target)
+        self.BlenderVR.addObjectToSynchronize(self, name)
+
+    def touch(self):
+        self._tracker.touch()
+
+    def resynchronize(self):
+        self._tracker.touch()
+
+    def getSynchronizerBuffer(self):
+        buff = Buffer()
+        self.writeSynchronizerBuffer(buff)
+        return buff
+
+    def writeSynchronizerBuffer(self, buff):
+        changes = self._tracker.getValidChanges(self.logger,
+                                                self._synchronize_object_name)
+        if changes is not None:
+            buff.raw(changes)
+
+    def processSynchronizerBuffer(self, buff):
+        while not buff.isEmpty():
+            self._tracker.processChanges(buff)
@@ -75,6 +75,14 @@ class Base(base.Base):
                 eye = 0
             self._buffers[information['buffer']] = {'user': user, 'eye': eye}
 
+        # Matrices of the buffers with the inputs they were computed from,
+        # by name (see _getCachedMatrices)
+        self._matrices_cache = {}
+        # Projections of all the buffers at once, set by the devices (see
+        # blendervr.tools.projection). None without numpy: each buffer is
+        # then computed on its own
+        self._batch = None
+
         stereo_mode = bgl.Buffer(bgl.GL_BYTE, 1)
         bgl.glGetBooleanv(bgl.GL_STEREO, stereo_mode)
         if ((not 'left' in self._buffers) or (not 'right' in self._buffers)) \
@@ -129,6 +137,8 @@ class Base(base.Base):
             scene = bge.logic.getCurrentScene()
             camera = scene.active_camera
 
+            self.BlenderVR.applyLatchedPoses(self._users)
+
             if hasattr(self, '_viewport'):
                 camera.useViewport = True
                 camera.setViewport(self._viewport[0], self._viewport[1],
@@ -141,17 +151,68 @@ class Base(base.Base):
             stereo_eye = bge.render.getStereoEye()
 
             if 'left' in self._buffers and stereo_eye == LEFT_EYE:
-                self._updateMatrixForBuffer('left', camera, depth)
+                self._updateBuffer('left', camera, depth)
 
             elif 'right' in self._buffers and stereo_eye == RIGHT_EYE:
-                self._updateMatrixForBuffer('right', camera, depth)
+                self._updateBuffer('right', camera, depth)
 
             elif 'mono' in self._buffers:
-                self._updateMatrixForBuffer('mono', camera, depth)
+                self._updateBuffer('mono', camera, depth)
 
         except:
             self.BlenderVR.stopDueToError()
 
+    def _updateBuffer(self, bufferName, camera, depth):
+        if self._batch is None:
+            self._updateMatrixForBuffer(bufferName, camera, depth)
+            return
+        projection_matrix, view, transform = \
+                        self.getBuffersMatrices(camera, depth)[bufferName]
+        self._setCameraTransform(transform)
+        self._setProjectionMatrix(projection_matrix)
+
+    def getBuffersMatrices(self, camera, depth):
+        """Projection matrix, model view matrix of the eye and camera
+        transform of each buffer, by name, computed for all the buffers in
+        one batch. Computed again only when the users or the camera moved,
+        so each eye of a frame reads the same batch. Requires numpy"""
+        names = self._getBatchBuffers()
+        key = [self.BlenderVR.scale, camera.near, camera.far,
+               camera.modelview_matrix, camera.worldPosition]
+        for user in self._users:
+            key += [user.getPosition(), user.getEyeSeparation(),
+                    user.getVehiclePosition()]
+        return self._getCachedMatrices('buffers', tuple(key),
+                                       self._computeBuffersMatrices, names,
+                                       camera, depth)
+
+    def _getBatchBuffers(self):
+        """Names of the buffers computed by the batch"""
+        return sorted(self._buffers)
+
+    def _computeBuffersMatrices(self, names, camera, depth):
+        projections, views = self._computeBatch(names, camera, depth)
+        result = {}
+        for name, projection_matrix, view in zip(names, projections, views):
+            view = mathutils.Matrix(view.tolist())
+            result[name] = (mathutils.Matrix(projection_matrix.tolist()),
+                            view, self._getCameraTransform(view.copy()))
+        return result
+
+    def _getBatchScreen(self, screen_informations):
+        """Frame and window of a screen, as blendervr.tools.projection
+        takes them"""
+        return ([list(row) for row in
+                 screen_informations['fromScreensOriginToLocalScreen']],
+                self.getWindowCoordinates(screen_informations))
+
+    def _getBatchEyes(self, names):
+        """Users of the buffers, and offsets of their eyes"""
+        users = [self._buffers[name]['user'] for name in names]
+        eyes = [self._buffers[name]['eye'] * user.getEyeSeparation() / 2.0
+                for name, user in zip(names, users)]
+        return users, eyes
+
     def getUsers(self):
         return self._users
 
@@ -226,10 +287,39 @@ class Base(base.Base):
 
         return result
 
-    def _setModelViewMatrix(self, matrix):
+    def getWindowCoordinates(self, screen_informations):
+        """Left, right, bottom and top of the screen, in its own reference
+        frame, from the result of computeScreenRegardingCorners()"""
+        wc = screen_informations['windowCoordinates']
+        return (wc['left'], wc['right'], wc['bottom'], wc['top'])
+
+    def _getCachedMatrices(self, name, key, compute, *arguments):
+        """Return compute(*arguments), computed again only when key, the
+        tuple of its inputs, differs from the one of the previous call with
+        that name. So a static viewer only pays the comparison of the inputs.
+        The result is shared between frames: it must not be modified"""
+        cached = self._matrices_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        result = compute(*arguments)
+        # Copied, as the matrices of the key can be modified in place
+        key = tuple([value.copy() if hasattr(value, 'copy') else value
+                     for value in key])
+        self._matrices_cache[name] = (key, result)
+        return result
+
+    def _getCameraTransform(self, matrix):
+        """Position and orientation of the camera for that model view
+        matrix, that is inverted in place"""
         matrix.invert()
-        self._camera.worldPosition = matrix.translation
-        self._camera.worldOrientation = matrix.to_quaternion()
+        return (matrix.translation, matrix.to_quaternion())
+
+    def _setCameraTransform(self, transform):
+        self._camera.worldPosition = transform[0]
+        self._camera.worldOrientation = transform[1]
+
+    def _setModelViewMatrix(self, matrix):
+        self._setCameraTransform(self._getCameraTransform(matrix))
 
     def _setProjectionMatrix(self, matrix):
         self._camera.projection_matrix = matrix
@@ -40,6 +40,7 @@ import mathutils
 import bge
 from .. import base
 from ... import exceptions
+from ....tools import projection
 
 """ @package hmd
 Manager of Head Mounted Display (HMD) screens with BlenderVR ...
@@ -57,13 +58,23 @@ class Device(base.Base):
         for bufferName in {'left', 'mono', 'right'}:
             if bufferName in configuration['hmd']:
                 if bufferName in self._buffers:
-                    self._screens_informations[bufferName] = \
-                            self.computeScreenRegardingCorners(
+                    informations = self.computeScreenRegardingCorners(
                                 configuration['hmd'][bufferName]['corners'])
+                    informations['fromLocalScreenToScreensOrigin'] = \
+                        informations['fromScreensOriginToLocalScreen'] \
+                        .inverted()
+                    self._screens_informations[bufferName] = informations
             else:
                 if bufferName in self._buffers:
                     del(self._buffers[bufferName])
 
+        if projection.numpy is not None:
+            screens = [self._getBatchScreen(self._screens_informations[name])
+                       for name in sorted(self._screens_informations)]
+            self._batch = projection.HMD(
+                        [to_local for to_local, window in screens],
+                        [window for to_local, window in screens])
+
         global warning_for_unsure_projection_displayed
         if not warning_for_unsure_projection_displayed:
             self.logger.warning("Beware: the projection matrix for HMD "
@@ -71,17 +82,60 @@ class Device(base.Base):
                                 "try it with caution.")
             warning_for_unsure_projection_displayed = True
 
+    def _getBatchBuffers(self):
+        # The buffers that have a screen, in the order of the batch
+        return sorted(self._screens_informations)
+
+    def _computeBatch(self, names, camera, depth):
+        users, eyes = self._getBatchEyes(names)
+        projections, viewpoints = self._batch.getProjections(eyes,
+                        camera.near, camera.far, self.BlenderVR.scale)
+        views = self._batch.getViewMatrices(viewpoints,
+                        [user.getPosition() for user in users],
+                        [user.getVehiclePosition() for user in users],
+                        camera.modelview_matrix)
+        return projections, views
+
     def _updateMatrixForBuffer(self, bufferName, camera, depth):
 
         scale = self.BlenderVR.scale
         user = self._buffers[bufferName]['user']
+        eye_separation = user.getEyeSeparation()
+
+        projection, viewPoint = self._getCachedMatrices(
+                        (bufferName, 'projection'),
+                        (eye_separation, scale, camera.near, camera.far),
+                        self._computeProjection, bufferName, eye_separation,
+                        camera, scale)
+
+        position = user.getPosition()
+        vehicle = user.getVehiclePosition()
+        modelview = camera.modelview_matrix
+        transform = self._getCachedMatrices((bufferName, 'modelview'),
+                        (viewPoint, position, vehicle, modelview),
+                        self._computeCameraTransform, bufferName, viewPoint,
+                        position, vehicle, modelview)
+
+        self._setCameraTransform(transform)
+        self._setProjectionMatrix(projection)
+
+    def _computeCameraTransform(self, bufferName, viewPoint, position,
+                                vehicle, modelview):
+        screen_position = self._screens_informations[bufferName][
+                                'fromScreensOriginToLocalScreen'] \
+            * position * vehicle
+
+        return self._getCameraTransform((mathutils.Matrix.Translation(
+                        viewPoint) * screen_position) * modelview)
+
+    def _computeProjection(self, bufferName, eye_separation, camera, scale):
 
         screen_configuration = self._screens_informations[bufferName]
 
         viewPointPositionInScreenReferenceFrame = \
-            screen_configuration['fromScreensOriginToLocalScreen'].inverted() \
+            screen_configuration['fromLocalScreenToScreensOrigin'] \
             * mathutils.Vector((-self._buffers[bufferName]['eye'] *
-                            user.getEyeSeparation() / 2.0, 0.0, 0.0, 1.0))
+                            eye_separation / 2.0, 0.0, 0.0, 1.0))
 
         viewPointPositionInScreenReferenceFrame.resize_3d()
 
@@ -131,9 +185,4 @@ class Device(base.Base):
         projection_matrix[3][2] = - 1.0
         projection_matrix[3][3] = 0.0
 
-        screen_position = \
-            screen_configuration['fromScreensOriginToLocalScreen'] \
-            * user.getPosition() * user.getVehiclePosition()
-
-        self._setModelViewMatrix((mathutils.Matrix.Translation(viewPointPositionInScreenReferenceFrame) * screen_position) * camera.modelview_matrix)
-        self._setProjectionMatrix(projection_matrix)
+        return (projection_matrix, viewPointPositionInScreenReferenceFrame)
@@ -39,6 +39,7 @@ import mathutils
 import bge
 from . import base
 from .. import exceptions
+from ...tools import projection
 
 from mathutils import Matrix, Vector
 
@@ -54,12 +55,53 @@ class Device(base.Base):
 
         self._screen_informations = self.computeScreenRegardingCorners(
                             configuration['planovision']['corners'])
+        self._window = self.getWindowCoordinates(self._screen_informations)
+        if projection.numpy is not None:
+            self._batch = projection.Planovision(
+                        *self._getBatchScreen(self._screen_informations))
+
+    def _computeBatch(self, names, camera, depth):
+        users, eyes = self._getBatchEyes(names)
+        projections, shiftings = self._batch.getProjections(
+                        [user.getPosition() for user in users], eyes,
+                        camera.near, camera.far)
+        views = self._batch.getViewMatrices(shiftings, camera.worldPosition,
+                        [user.getVehiclePosition() for user in users],
+                        self.BlenderVR.scale)
+        return projections, views
 
     def _updateMatrixForBuffer(self, bufferName, camera, depth):
 
         user = self._buffers[bufferName]['user']
         vehicle_scale = self.BlenderVR.scale
 
+        projection, shifting = self._getCachedMatrices(
+                        (bufferName, 'projection'),
+                        (user.getPosition(), user.getEyeSeparation(),
+                         camera.near, camera.far),
+                        self._computeProjection, bufferName, user, camera)
+
+        world_position = camera.worldPosition
+        vehicle = user.getVehiclePosition()
+        transform = self._getCachedMatrices((bufferName, 'modelview'),
+                        (shifting, world_position, vehicle, vehicle_scale),
+                        self._computeCameraTransform, shifting,
+                        world_position, vehicle, vehicle_scale)
+
+        self._setCameraTransform(transform)
+        self._setProjectionMatrix(projection)
+
+    def _computeCameraTransform(self, shifting, world_position, vehicle,
+                                vehicle_scale):
+        world_translation = Matrix.Translation(world_position)
+        modelview_matrix = world_translation * Matrix.Translation(shifting * vehicle_scale)
+        modelview_matrix = vehicle * modelview_matrix
+        modelview_matrix.invert()
+
+        return self._getCameraTransform(modelview_matrix)
+
+    def _computeProjection(self, bufferName, user, camera):
+
         # Then, we transfer from the Camera referenceFrame (ie. : vehicle one)
         # to local screen reference frame
         localScreenInCameraReferenceFrame = \
@@ -101,14 +143,11 @@ class Device(base.Base):
         else:
             depthPlaneRatio = nearVal
 
-        left = (self._screen_informations['windowCoordinates']['left']
-                    - horizontalShifting) * depthPlaneRatio
-        right = (self._screen_informations['windowCoordinates']['right']
-                    - horizontalShifting) * depthPlaneRatio
-        bottom = (self._screen_informations['windowCoordinates']['bottom']
-                    - verticalShifting) * depthPlaneRatio
-        top = (self._screen_informations['windowCoordinates']['top']
-                    - verticalShifting) * depthPlaneRatio
+        window_left, window_right, window_bottom, window_top = self._window
+        left = (window_left - horizontalShifting) * depthPlaneRatio
+        right = (window_right - horizontalShifting) * depthPlaneRatio
+        bottom = (window_bottom - verticalShifting) * depthPlaneRatio
+        top = (window_top - verticalShifting) * depthPlaneRatio
 
         projection_matrix = mathutils.Matrix()
         projection_matrix[0][0] = 2 * nearVal / (right - left)
@@ -123,10 +162,5 @@ class Device(base.Base):
         projection_matrix[3][2] = - 1.0
         projection_matrix[3][3] = 0.0
 
-        world_translation = Matrix.Translation(camera.worldPosition)
-        modelview_matrix = world_translation * Matrix.Translation(Vector((horizontalShifting, verticalShifting, depthShifting)) * vehicle_scale)
-        modelview_matrix = user.getVehiclePosition() * modelview_matrix
-        modelview_matrix.invert()
-
-        self._setModelViewMatrix(modelview_matrix)
-        self._setProjectionMatrix(projection_matrix)
+        return (projection_matrix,
+                Vector((horizontalShifting, verticalShifting, depthShifting)))
@@ -40,6 +40,7 @@ import mathutils
 import bge
 from . import base
 from .. import exceptions
+from ...tools import projection
 
 """ @package wall
 Manager of wall screens (such as CAVE(TM) systems) with BlenderVR ...
@@ -53,12 +54,47 @@ class Device(base.Base):
 
         self._screen_informations = self.computeScreenRegardingCorners(
                             configuration['wall']['corners'])
+        self._window = self.getWindowCoordinates(self._screen_informations)
+        if projection.numpy is not None:
+            self._batch = projection.Wall(
+                        *self._getBatchScreen(self._screen_informations))
+
+    def _computeBatch(self, names, camera, depth):
+        users, eyes = self._getBatchEyes(names)
+        projections = self._batch.getProjections(
+                        [user.getPosition() for user in users], eyes,
+                        camera.near, camera.far, self.BlenderVR.scale, depth)
+        views = self._batch.getViewMatrices(
+                        [user.getVehiclePosition() for user in users],
+                        camera.modelview_matrix)
+        return projections, views
 
     def _updateMatrixForBuffer(self, bufferName, camera, depth):
 
         user = self._buffers[bufferName]['user']
         scale = self.BlenderVR.scale
 
+        projection = self._getCachedMatrices((bufferName, 'projection'),
+                        (user.getPosition(), user.getEyeSeparation(), scale,
+                         camera.near, camera.far),
+                        self._computeProjection, bufferName, user, camera,
+                        depth, scale)
+
+        vehicle = user.getVehiclePosition()
+        modelview = camera.modelview_matrix
+        transform = self._getCachedMatrices((bufferName, 'modelview'),
+                        (vehicle, modelview),
+                        self._computeCameraTransform, vehicle, modelview)
+
+        self._setCameraTransform(transform)
+        self._setProjectionMatrix(projection)
+
+    def _computeCameraTransform(self, vehicle, modelview):
+        return self._getCameraTransform(vehicle * modelview)
+
+    def _computeProjection(self, bufferName, user, camera, depth, scale):
+        # blendervr.tools.projection.Wall computes the same, headless
+
         # Then, we transfer from the Camera referenceFrame (ie. : vehicle one)
         # to local screen reference frame
         localScreenInCameraReferenceFrame = \
@@ -95,14 +131,11 @@ class Device(base.Base):
         else:
             depthPlaneRatio = nearVal
 
-        left = (self._screen_informations['windowCoordinates']['left']
-                    - horizontalShifting) * depthPlaneRatio
-        right = (self._screen_informations['windowCoordinates']['right']
-                    - horizontalShifting) * depthPlaneRatio
-        bottom = (self._screen_informations['windowCoordinates']['bottom']
-                    - verticalShifting) * depthPlaneRatio
-        top = (self._screen_informations['windowCoordinates']['top']
-                    - verticalShifting) * depthPlaneRatio
+        window_left, window_right, window_bottom, window_top = self._window
+        left = (window_left - horizontalShifting) * depthPlaneRatio
+        right = (window_right - horizontalShifting) * depthPlaneRatio
+        bottom = (window_bottom - verticalShifting) * depthPlaneRatio
+        top = (window_top - verticalShifting) * depthPlaneRatio
 
         # And scale to the scene ...
         scaleToApplyToTheScene = mathutils.Matrix.Translation(
@@ -124,6 +157,5 @@ class Device(base.Base):
         projection_matrix[3][2] = - 1.0
         projection_matrix[3][3] = 0.0
 
-        self._setModelViewMatrix(user.getVehiclePosition() * camera.modelview_matrix)
-        self._setProjectionMatrix(projection_matrix * \
-                from_vehicule_to_eye_by_screen * scaleToApplyToTheScene)
+        return projection_matrix * from_vehicule_to_eye_by_screen \
+                    * scaleToApplyToTheScene
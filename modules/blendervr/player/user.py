@@ -36,6 +36,7 @@
 ## knowledge of the CeCILL license and that you accept its terms.
 ##
 
+import time
 import mathutils
 from .base import Base
 from .buffer import Buffer
@@ -56,12 +57,27 @@ class User(Base):
                             (config['behavior']['default_position']))
 
         self._position = self._default_position
+        self._position_time = time.time()
         self._vehicle_position = mathutils.Matrix()
 
         self._previous = {'user_position': 0,
                           'vehicle_position': 0}
+        # Last positions sent through a lossy codec and the matrices the
+        # slaves decoded, that the master draws too, as (sent, decoded)
+        self._synchronized = {'user_position': None,
+                              'vehicle_position': None}
 
         self._parent = None
+        # Users whose vehicle is relative to this one
+        self._children = []
+        # The vehicle is relative to a blender object (maybe through other
+        # users), that can move at any frame
+        self._follows_scene = False
+        # Vehicle position (see getVehiclePosition()) and worldTransform,
+        # as (frame, matrix), until this vehicle or one of its parents is
+        # set again, or the frame ends when it follows the scene
+        self._vehicle_cache = None
+        self._world_cache = None
 
         self.BlenderVR.addObjectToSynchronize(self,
                                     'userSynchronization-' + self._name)
@@ -94,7 +110,7 @@ class User(Base):
 
         Returns: 4x4 mathutils.Matrix (rotation and location).
         """
-        return self._position
+        return self._getSynchronized('user_position', self._position)
 
     def getVehiclePosition(self, internal=False):
         """
@@ -110,15 +126,32 @@ class User(Base):
 
         Args: (Optional) internal:
 
-        Returns: 4x4 mathutils.Matrix (rotation and location).
+        Returns: 4x4 mathutils.Matrix (rotation and location). It is
+        computed once per frame at most and shared: do not modify it.
         """
-        if isinstance(self._parent, User) and not internal:
-            return self._vehicle_position * self._parent.getVehiclePosition()
-        if isinstance(self._parent, bge.types.KX_GameObject) and not internal:
-            return (self._vehicle_position *
+        if internal:
+            return self._vehicle_position
+        if self._parent is None:
+            return self._getSynchronized('vehicle_position',
+                                         self._vehicle_position)
+        frame = self.BlenderVR.getFrameNumber() if self._follows_scene \
+                                                else None
+        cache = self._vehicle_cache
+        if cache is not None and cache[0] == frame:
+            return cache[1]
+        if isinstance(self._parent, User):
+            position = (self._vehicle_position *
+                        self._parent.getVehiclePosition())
+        elif isinstance(self._parent, bge.types.KX_GameObject):
+            position = (self._vehicle_position *
                     self._parent.worldTransform.inverted() *
                     bge.logic.getCurrentScene().active_camera.worldTransform)
-        return self._vehicle_position
+        else:
+            return self._getSynchronized('vehicle_position',
+                                         self._vehicle_position)
+        position = self._getSynchronized('vehicle_position', position)
+        self._vehicle_cache = (frame, position)
+        return position
 
     def getEyeSeparation(self):
         """
@@ -130,15 +163,30 @@ class User(Base):
         """
         return self._eye_separation
 
-    def setPosition(self, position):
+    def setPosition(self, position, timestamp=None):
         """
         set User position in the virtual environment.
 
-        Args: 4x4 mathutils.Matrix (rotation and location).
+        Args: 4x4 mathutils.Matrix (rotation and location), (Optional)
+        timestamp: time.time() of the tracker sample of the position,
+        default now.
 
         Returns: None
         """
         self._position = position
+        self._position_time = time.time() if timestamp is None \
+                                          else timestamp
+
+    def getPositionTime(self):
+        """
+        get the time of the tracker sample of the user position (see
+        setPosition()).
+
+        Args: None
+
+        Returns: Float (seconds, as time.time())
+        """
+        return self._position_time
 
     def setVehiclePosition(self, position):
         """
@@ -149,6 +197,7 @@ class User(Base):
         Returns: None
         """
         self._vehicle_position = position
+        self._invalidateVehicle()
 
     def resetVehiclePosition(self):
         """
@@ -159,36 +208,84 @@ class User(Base):
         Returns: None
         """
         self._vehicle_position = mathutils.Matrix()
+        self._invalidateVehicle()
 
     def setParent(self, parent):
         if parent is not self:  # Avoid loop ...
+            if isinstance(self._parent, User):
+                self._parent._children.remove(self)
             self._parent = parent
+            if isinstance(parent, User):
+                parent._children.append(self)
+            self._invalidateVehicle()
+
+    def _invalidateVehicle(self):
+        """Compute again the vehicle of this user and of the ones relative
+        to it"""
+        self._vehicle_cache = None
+        self._world_cache = None
+        if isinstance(self._parent, User):
+            self._follows_scene = self._parent._follows_scene
+        else:
+            self._follows_scene = isinstance(self._parent,
+                                             bge.types.KX_GameObject)
+        for child in self._children:
+            child._invalidateVehicle()
+
+    def resynchronize(self):
+        """Send both positions again at next frame"""
+        self._previous = {'user_position': 0,
+                          'vehicle_position': 0}
 
     # Both methods are use for the synchronization mechanism ...
     def getSynchronizerBuffer(self):
         buff = Buffer()
-
-        if (self._previous['user_position'] != self.getPosition()):
-            self._previous['user_position'] = self.getPosition()
-            buff.command(self.SYNCHRONIZER_COMMAND_USER_POSITION)
-            buff.matrix_4x4(self.getPosition())
-
-        if (self._previous['vehicle_position'] != self.getVehiclePosition()):
-            self._previous['vehicle_position'] = self.getVehiclePosition()
-            buff.command(self.SYNCHRONIZER_COMMAND_VEHICLE_POSITION)
-            buff.matrix_4x4(self.getVehiclePosition())
-
+        self.writeSynchronizerBuffer(buff)
         return buff
 
+    def _getSynchronized(self, name, position):
+        """position, or the matrix decoded by the slaves when it is the
+        last one sent, so that all the screens draw the same pose"""
+        synchronized = self._synchronized[name]
+        if synchronized is not None and synchronized[0] == position:
+            return synchronized[1]
+        return position
+
+    def _sendPosition(self, buff, name, command, position):
+        """Send position if it changed, and return whether the master
+        must draw the decoded one instead"""
+        if self._previous[name] == position:
+            return False
+        buff.command(command)
+        codec = self.BlenderVR.getSynchronizationCodec()
+        decoded = codec.matrix_4x4(buff, position)
+        self._previous[name] = decoded
+        if decoded is position:
+            self._synchronized[name] = None
+            return False
+        self._synchronized[name] = (position, decoded)
+        return True
+
+    def writeSynchronizerBuffer(self, buff):
+        self._sendPosition(buff, 'user_position',
+                           self.SYNCHRONIZER_COMMAND_USER_POSITION,
+                           self.getPosition())
+        if self._sendPosition(buff, 'vehicle_position',
+                              self.SYNCHRONIZER_COMMAND_VEHICLE_POSITION,
+                              self.getVehiclePosition()):
+            # Compute again the users relative to the decoded vehicle
+            self._invalidateVehicle()
+
     def processSynchronizerBuffer(self, buff):
+        codec = self.BlenderVR.getSynchronizationCodec()
         while not buff.isEmpty():
             command = buff.command()
 
             if (command == self.SYNCHRONIZER_COMMAND_USER_POSITION):
-                self.setPosition(buff.matrix_4x4())
+                self.setPosition(codec.matrix_4x4(buff))
 
             elif (command == self.SYNCHRONIZER_COMMAND_VEHICLE_POSITION):
-                self.setVehiclePosition(buff.matrix_4x4())
+                self.setVehiclePosition(codec.matrix_4x4(buff))
 
     @property
     def localTransform(self):
@@ -196,9 +293,16 @@ class User(Base):
 
     @property
     def worldTransform(self):
+        # Relative to the camera, so it can change at any frame
+        frame = self.BlenderVR.getFrameNumber()
+        cache = self._world_cache
+        if cache is not None and cache[0] == frame:
+            return cache[1]
         try:
-            return (self._vehicle_position *
+            transform = (self._vehicle_position *
                     self._parent.worldTransform.inverted() *
                     bge.logic.getCurrentScene().active_camera.worldTransform)
         except:
             return self._vehicle_position
+        self._world_cache = (frame, transform)
+        return transform
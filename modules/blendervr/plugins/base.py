@@ -61,6 +61,8 @@ if is_virtual_environment():
             """setup the plugin if it runs in master only"""
             if not master_only or self.BlenderVR.isMaster():
                 self.run = self._main.run
+                if hasattr(self._main, 'latch'):
+                    self.latch = self._main.latch
                 self._main.start()
 
         def setConfiguration(self, configuration):
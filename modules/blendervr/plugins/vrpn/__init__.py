@@ -53,6 +53,10 @@ if base.is_virtual_environment():
                 raise exceptions.PluginError()
             self.setupMain(True)
 
+        def quit(self):
+            if hasattr(self, '_main'):
+                self._main.quit()
+
 elif base.is_console():
     class Base(base.Base):
         def __init__(self, parent):
@@ -102,3 +102,16 @@ class VRPN(base.Base):
     def run(self):
         for device in self._devices:
             device.run()
+
+    def quit(self):
+        for device in self._devices:
+            if hasattr(device, 'quit'):
+                device.quit()
+
+    def latch(self):
+        """Read the last reports of the trackers, at the end of the frame
+        (see BlenderVR.setLateLatch())"""
+        from . import tracker
+        for device in self._devices:
+            if isinstance(device, tracker.Tracker):
+                device.run()
@@ -39,6 +39,14 @@
 import vrpn
 import mathutils
 from ....player import device, exceptions
+from ....tools import prediction
+
+
+def _getTimestamp(sample_time):
+    """Time of a VRPN report in seconds, as time.time()"""
+    if hasattr(sample_time, 'timestamp'):
+        return sample_time.timestamp()
+    return float(sample_time)
 
 
 class _Sensor(device.Sender):
@@ -61,6 +69,15 @@ class _Sensor(device.Sender):
                 result = operation * result
             setattr(self, '_' + when + '_transformation', result)
 
+        self._prediction_time = configuration.get('prediction_time', 0.0)
+        self._predictor = None
+        if configuration.get('prediction', 'none') != 'none':
+            self._predictor = prediction.getPredictor(
+                configuration['prediction'], configuration['prediction_alpha'])
+        self._log = None
+        if configuration.get('log'):
+            self._log = prediction.Log(configuration['log'])
+
     def getID(self):
         return self._id
 
@@ -70,9 +87,28 @@ class _Sensor(device.Sender):
         if self.getTracker()._scale is not None:
             for i in range(0, 3):
                 matrix[3][i] *= self.getTracker()._scale
-        info['matrix'] = self._post_transformation * matrix
+        matrix = self._post_transformation * matrix
+        if self._predictor is not None or self._log is not None:
+            position = tuple(matrix.to_translation())
+            orientation = tuple(matrix.to_quaternion())
+            if self._log is not None:
+                self._log.add(info['timestamp'], position, orientation)
+            if self._predictor is not None:
+                self._predictor.update(info['timestamp'], position,
+                                       orientation)
+                position, orientation = self._predictor.predict(
+                                                    self._prediction_time)
+                matrix = mathutils.Matrix.Translation(position) \
+                    * mathutils.Quaternion(orientation).to_matrix().to_4x4()
+                info['prediction_time'] = self._prediction_time
+        info['matrix'] = matrix
         self.process(info)
 
+    def quit(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
     def __str__(self):
         return self.getTracker().__str__() + '[' + str(self._id) + ']'
 
@@ -129,9 +165,14 @@ class Tracker(device.Receiver):
         sensor = info['sensor']
         if sensor in self._sensors:
             new_information = {'matrix': self._getMatrix(info),
-                               'time': info['time']}
+                               'time': info['time'],
+                               'timestamp': _getTimestamp(info['time'])}
             self._sensors[sensor].run(new_information)
 
+    def quit(self):
+        for sensor in self._sensors.values():
+            sensor.quit()
+
     def _workspace_handler(self, data, info):
         self._workspace['min'] = info['minimum corner box']
         self._workspace['max'] = info['maximum corner box']
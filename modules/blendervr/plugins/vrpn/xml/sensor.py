@@ -34,12 +34,15 @@
 ## 
 
 from . import vrpn_base
+from ....tools import prediction
+
 
 class XML(vrpn_base.Sender):
 
     def __init__(self, parent, name, attrs):
         super(XML, self).__init__(parent, name, attrs)
-        self._attribute_list += ['id']
+        self._attribute_list += ['id', 'prediction', 'prediction_time',
+                                 'prediction_alpha', 'log']
         self._class_list     += ['transformation']
         self._transformation  = None
 
@@ -51,6 +54,23 @@ class XML(vrpn_base.Sender):
         except ValueError:
             self.raise_error('VRPN sensor ID must be an integer !')
 
+        self._prediction = attrs.get('prediction', 'none')
+        if self._prediction not in prediction.PREDICTORS:
+            self.raise_error('VRPN sensor prediction must be one of '
+                             + ', '.join(sorted(prediction.PREDICTORS)) + ' !')
+        self._prediction_time = 0.0
+        if self._prediction != 'none':
+            if 'prediction_time' not in attrs:
+                self.raise_error('VRPN sensor prediction requires a '
+                                 'prediction_time !')
+            self._prediction_time = self._getNumber(attrs['prediction_time'])
+        self._prediction_alpha = self._getNumber(
+                                        attrs.get('prediction_alpha', '0.5'))
+        if not 0.0 < self._prediction_alpha < 1.0:
+            self.raise_error('VRPN sensor prediction_alpha must be between '
+                             '0 and 1 !')
+        self._log = attrs.get('log')
+
     def _getChildren(self, name, attrs):
         if name == 'transformation':
             from . import transformation
@@ -72,6 +72,18 @@ if is_virtual_environment():
             """
             self.BlenderVR.addObjectToSynchronize(self, name)
 
+        def synchronizeAttributes(self, name, fields, target=None):
+            """
+            Synchronize the attributes of target (the processor by default)
+            from the master to the slaves. fields is a list of (attribute,
+            type), see blendervr.player.network.synchronizer.schema
+            """
+            from ..player.network.synchronizer import schema
+            if target is None:
+                target = self
+            return schema.Synchronized(self, name, schema.Schema(fields),
+                                       target)
+
         def start(self):
             return
 
@@ -82,6 +94,14 @@ if is_virtual_environment():
             for interactor in self._interactors:
                 interactor.run()
 
+        def clock(self, frame, time):
+            """
+            Called on every node with the frame number and the simulation time
+            of the master: deterministic animations evaluated here need no
+            synchronization
+            """
+            return
+
         def user_position(self, info):
             """
             Update the users' position and orientation as well as the operators
@@ -91,7 +111,7 @@ if is_virtual_environment():
             """
 
             for user in info['users']:
-                user.setPosition(info['matrix'])
+                user.setPosition(info['matrix'], info.get('timestamp'))
             for interactor in self._interactors:
                 interactor.user_position(info)
 
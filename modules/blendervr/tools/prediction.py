@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# file: blendervr/tools/prediction.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+"""
+Prediction of tracker poses, to compensate the tracking latency
+
+A predictor is fed with the samples of a tracker sensor: time in seconds,
+position (x, y, z) and orientation quaternion (w, x, y, z). It extrapolates
+the pose of the sensor some time after the last sample. It does not need
+Blender, so the predictors can be tuned offline by replaying tracker logs
+(see main()). A log has one sample per line: 'time x y z w qx qy qz', as
+written by VRPN sensors that have a 'log' attribute.
+"""
+
+import math
+
+
+def _multiply(a, b):
+    return (a[0] * b[0] - a[1] * b[1] - a[2] * b[2] - a[3] * b[3],
+            a[0] * b[1] + a[1] * b[0] + a[2] * b[3] - a[3] * b[2],
+            a[0] * b[2] - a[1] * b[3] + a[2] * b[0] + a[3] * b[1],
+            a[0] * b[3] + a[1] * b[2] - a[2] * b[1] + a[3] * b[0])
+
+
+def _conjugate(q):
+    return (q[0], -q[1], -q[2], -q[3])
+
+
+def _power(q, exponent):
+    """Rotation of q, along the shortest path, scaled by exponent"""
+    if q[0] < 0.0:
+        q = (-q[0], -q[1], -q[2], -q[3])
+    sine = math.sqrt(q[1] * q[1] + q[2] * q[2] + q[3] * q[3])
+    if sine < 1e-12:
+        return (1.0, 0.0, 0.0, 0.0)
+    half_angle = math.atan2(sine, q[0]) * exponent
+    factor = math.sin(half_angle) / sine
+    return (math.cos(half_angle),
+            q[1] * factor, q[2] * factor, q[3] * factor)
+
+
+def _slerp(a, b, factor):
+    """Spherical interpolation from a (factor 0) to b (factor 1); factors
+    greater than 1 extrapolate"""
+    return _multiply(_power(_multiply(b, _conjugate(a)), factor), a)
+
+
+def _mix(a, b, factor):
+    return tuple(x + (y - x) * factor for x, y in zip(a, b))
+
+
+def getAngle(a, b):
+    """Angle, in radians, between two orientations"""
+    dot = abs(sum(x * y for x, y in zip(a, b)))
+    return 2.0 * math.acos(min(dot, 1.0))
+
+
+class Predictor:
+    """No prediction: the pose of the last sample"""
+
+    def __init__(self):
+        self._time = None
+        self._position = None
+        self._orientation = None
+
+    def update(self, time, position, orientation):
+        self._time = time
+        self._position = tuple(position)
+        self._orientation = tuple(orientation)
+
+    def predict(self, horizon):
+        """Pose (position, orientation) horizon seconds after the last
+        sample"""
+        return self._position, self._orientation
+
+
+class ConstantVelocity(Predictor):
+    """Linear and angular velocities of the last two samples"""
+
+    def __init__(self):
+        super(ConstantVelocity, self).__init__()
+        self._velocity = (0.0, 0.0, 0.0)
+        self._rotation = (1.0, 0.0, 0.0, 0.0)
+        self._period = None
+
+    def update(self, time, position, orientation):
+        position = tuple(position)
+        orientation = tuple(orientation)
+        if self._time is not None and time > self._time:
+            self._period = time - self._time
+            self._velocity = tuple((x - y) / self._period
+                                   for x, y in zip(position, self._position))
+            self._rotation = _multiply(orientation,
+                                       _conjugate(self._orientation))
+        super(ConstantVelocity, self).update(time, position, orientation)
+
+    def predict(self, horizon):
+        if self._period is None:
+            return self._position, self._orientation
+        position = tuple(x + v * horizon
+                         for x, v in zip(self._position, self._velocity))
+        orientation = _multiply(_power(self._rotation,
+                                       horizon / self._period),
+                                self._orientation)
+        return position, orientation
+
+
+class DoubleExponential(Predictor):
+    """Double exponential smoothing (LaViola, 2003): alpha near 1 follows
+    the samples, alpha near 0 smooths them more but lags behind"""
+
+    def __init__(self, alpha=0.5):
+        super(DoubleExponential, self).__init__()
+        if not 0.0 < alpha < 1.0:
+            raise ValueError('alpha must be between 0 and 1, excluded')
+        self._alpha = alpha
+        self._smoothed = None
+        self._period = None
+
+    def update(self, time, position, orientation):
+        position = tuple(position)
+        orientation = tuple(orientation)
+        alpha = self._alpha
+        if self._smoothed is None:
+            self._smoothed = [position, position, orientation, orientation]
+        else:
+            if time > self._time:
+                period = time - self._time
+                if self._period is None:
+                    self._period = period
+                else:
+                    self._period += (period - self._period) * alpha
+            first, second, first_q, second_q = self._smoothed
+            first = _mix(first, position, alpha)
+            second = _mix(second, first, alpha)
+            first_q = _slerp(first_q, orientation, alpha)
+            second_q = _slerp(second_q, first_q, alpha)
+            self._smoothed = [first, second, first_q, second_q]
+        super(DoubleExponential, self).update(time, position, orientation)
+
+    def predict(self, horizon):
+        if self._period is None:
+            return self._position, self._orientation
+        first, second, first_q, second_q = self._smoothed
+        # extrapolation factor, in samples ahead
+        factor = 2.0 + self._alpha * (horizon / self._period) \
+                                                    / (1.0 - self._alpha)
+        return _mix(second, first, factor), _slerp(second_q, first_q, factor)
+
+
+PREDICTORS = {'none': Predictor,
+              'constant_velocity': ConstantVelocity,
+              'double_exponential': DoubleExponential}
+
+
+def getPredictor(name, alpha=None):
+    """Predictor from its name in PREDICTORS"""
+    if name == 'double_exponential' and alpha is not None:
+        return DoubleExponential(alpha)
+    return PREDICTORS[name]()
+
+
+class Log:
+    """Writer of tracker logs"""
+
+    def __init__(self, path):
+        self._file = open(path, 'w')
+
+    def add(self, time, position, orientation):
+        self._file.write('{0!r} {1} {2}\n'.format(time,
+                                ' '.join(repr(x) for x in position),
+                                ' '.join(repr(x) for x in orientation)))
+
+    def close(self):
+        self._file.close()
+
+
+def readLog(path):
+    """Samples (time, position, orientation) of a tracker log"""
+    samples = []
+    with open(path) as log:
+        for line in log:
+            values = line.split()
+            if len(values) != 8 or line.startswith('#'):
+                continue
+            values = [float(value) for value in values]
+            samples.append((values[0], tuple(values[1:4]),
+                            tuple(values[4:8])))
+    return samples
+
+
+def evaluate(samples, predictor, horizon):
+    """Replay samples into predictor and compare each prediction to the
+    pose interpolated horizon seconds after the sample. Returns the root
+    mean square errors of position and of orientation (in radians) and the
+    number of predictions"""
+    position_error = 0.0
+    orientation_error = 0.0
+    count = 0
+    following = 0
+    for time, position, orientation in samples:
+        predictor.update(time, position, orientation)
+        target = time + horizon
+        while following < len(samples) and samples[following][0] < target:
+            following += 1
+        if following == len(samples):
+            break
+        if following == 0:
+            continue
+        before, after = samples[following - 1], samples[following]
+        if after[0] > before[0]:
+            factor = (target - before[0]) / (after[0] - before[0])
+        else:
+            factor = 1.0
+        actual_position = _mix(before[1], after[1], factor)
+        actual_orientation = _slerp(before[2], after[2], factor)
+        predicted_position, predicted_orientation = predictor.predict(horizon)
+        position_error += sum((x - y) ** 2 for x, y in
+                              zip(predicted_position, actual_position))
+        orientation_error += getAngle(predicted_orientation,
+                                      actual_orientation) ** 2
+        count += 1
+    if count == 0:
+        return 0.0, 0.0, 0
+    return (math.sqrt(position_error / count),
+            math.sqrt(orientation_error / count), count)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Accuracy of tracker pose predictions on a tracker log')
+    parser.add_argument('log')
+    parser.add_argument('--horizon', type=float, nargs='+', default=[0.02],
+                        help='prediction times, in seconds')
+    parser.add_argument('--alpha', type=float, nargs='+',
+                        default=[0.3, 0.5, 0.7],
+                        help='smoothing factors of double_exponential')
+    arguments = parser.parse_args()
+
+    samples = readLog(arguments.log)
+    print('{0}: {1} samples'.format(arguments.log, len(samples)))
+    predictors = [('none', None), ('constant_velocity', None)]
+    predictors += [('double_exponential', alpha) for alpha in arguments.alpha]
+    for horizon in arguments.horizon:
+        print('horizon {0:.3f}s       position RMS   orientation RMS'
+              .format(horizon))
+        for name, alpha in predictors:
+            position, orientation, count = evaluate(
+                        samples, getPredictor(name, alpha), horizon)
+            label = name if alpha is None else \
+                                    '{0} {1:g}'.format(name, alpha)
+            print('  {0:<22} {1:12.6f} {2:14.4f} deg'.format(
+                label, position, math.degrees(orientation)))
+
+
+if __name__ == '__main__':
+    main()
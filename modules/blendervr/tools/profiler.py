@@ -1,2 +1,358 @@
 # -*- coding: utf-8 -*-
 # file: blendervr/tools/profiler.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+"""
+Profiling of the synchronization stream
+
+A Profile accumulates, frame after frame, the bytes sent to the slaves by
+command type, by item class and by object, with the time spent encoding
+them. The master fills it live (BlenderVR.startSynchronizationProfile() or
+the Synchronization profile option of the console). profileRecording()
+fills it from a recording of the stream (see blendervr.tools.recording):
+encoding time and item classes are then unknown.
+"""
+
+import struct
+from . import recording
+
+# Names given to addObjectToSynchronize by the users and the scene
+# synchronizer (blendervr.player.user, ...objects)
+USERS_PREFIX = 'userSynchronization-'
+SCENE_SYNCHRONIZER = 'Blender objects synchronization system'
+
+# Commands of the synchronizers. blendervr.player.network takes them from
+# here: the player cannot be imported outside of Blender, where the
+# recordings are profiled
+CLOCK = b'k'
+CODEC = b'q'
+NEW_OBJECT = b'c'
+OBJECT = b'o'
+TRANSFORMS = b't'
+CREATE_ITEM = b'c'
+DELETE_ITEM = b'd'
+MESSAGE_PAUSE = b'p'
+
+# Codecs of the transforms, and flags of the parts of each transform
+CODEC_RAW = 'raw'
+CODEC_QUANTIZED = 'quantized'
+TRANSFORM_POSITION = 1
+TRANSFORM_ORIENTATION = 2
+TRANSFORM_SCALE = 4
+
+SIZE = struct.Struct('>i')
+CLOCK_SIZE = struct.calcsize('>Qd')
+
+
+def getObjectCategory(name, named):
+    """Command category of the OBJECT buffer of a synchronized object, given
+    its name and whether it has been added by addObjectToSynchronize"""
+    if not named:
+        return 'OBJECT'
+    if name.startswith(USERS_PREFIX):
+        return 'user positions'
+    return 'named objects'
+
+
+def splitTransforms(flags, sizes):
+    """Bytes of each transform of a TRANSFORMS command, given the flags of
+    its rows and the bytes of its identifiers and flags, positions,
+    orientations and scales. Each part is split evenly between the rows
+    that carry it"""
+    shares = []
+    for flag, size in zip((0, TRANSFORM_POSITION, TRANSFORM_ORIENTATION,
+                           TRANSFORM_SCALE), sizes):
+        if flag == 0:
+            count = len(flags)
+        else:
+            count = sum(1 for row_flags in flags if row_flags & flag)
+        shares.append((flag, size / count if count else 0.0))
+    return [sum(share for flag, share in shares
+                if flag == 0 or row_flags & flag) for row_flags in flags]
+
+
+def getMessageCategory(payload):
+    """Command category of a message from the master to the slaves"""
+    if bytes(payload[:1]) == MESSAGE_PAUSE:
+        return 'pause'
+    return 'processor messages'
+
+
+class Profile:
+    """Bytes and encoding time of the synchronization"""
+
+    def __init__(self):
+        self._frames = 0
+        # Name -> [bytes, count, seconds]
+        self._commands = {}
+        self._classes = {}
+        self._objects = {}
+
+    def _add(self, table, name, size, duration):
+        try:
+            entry = table[name]
+        except KeyError:
+            entry = table[name] = [0, 0, 0.0]
+        entry[0] += size
+        entry[1] += 1
+        entry[2] += duration
+
+    def endFrame(self):
+        self._frames += 1
+
+    def getFramesNumber(self):
+        return self._frames
+
+    def addCommand(self, command, size, duration=0.0):
+        self._add(self._commands, command, size, duration)
+
+    def addObject(self, category, name, class_name, size, duration=0.0):
+        self._add(self._commands, category, size, duration)
+        if class_name is not None:
+            self._add(self._classes, class_name, size, duration)
+        self._add(self._objects, name, size, duration)
+
+    def getCommands(self):
+        return self._commands
+
+    def getClasses(self):
+        return self._classes
+
+    def getObjects(self):
+        return self._objects
+
+    def getTopObjects(self, top=10, by_time=False):
+        """The top objects by bytes, or by encoding time"""
+        column = 2 if by_time else 0
+        return sorted(self._objects.items(),
+                      key=lambda entry: -entry[1][column])[:top]
+
+    def _formatTable(self, title, entries):
+        frames = max(self._frames, 1)
+        lines = ['{0:<40} {1:>10} {2:>9} {3:>10}'.format(
+                            title, 'B/frame', 'count', 'us/frame')]
+        for name, (size, count, duration) in entries:
+            lines.append('{0:<40} {1:>10.1f} {2:>9} {3:>10.1f}'.format(
+                                    str(name)[:40], size / frames, count,
+                                    duration * 1e6 / frames))
+        return lines
+
+    def getReport(self, top=10):
+        """Report of the profile, as text"""
+        total = sum(entry[0] for entry in self._commands.values())
+        lines = ['Synchronization profile: {0} frames, {1:.1f} B/frame'.format(
+                            self._frames, total / max(self._frames, 1))]
+        by_size = lambda entry: -entry[1][0]
+        lines += self._formatTable('Command',
+                            sorted(self._commands.items(), key=by_size))
+        if len(self._classes) > 0:
+            lines += self._formatTable('Item class',
+                            sorted(self._classes.items(), key=by_size))
+        lines += self._formatTable('Top objects by bytes',
+                            self.getTopObjects(top))
+        if any(entry[2] for entry in self._objects.values()):
+            lines += self._formatTable('Top objects by encoding time',
+                            self.getTopObjects(top, True))
+        return '\n'.join(lines)
+
+
+def _itemID(data, offset):
+    """Varint identifier (see blendervr.player.buffer) and the next
+    offset"""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _subBuffer(data, offset):
+    """Size prefixed sub-buffer and the next offset"""
+    size = SIZE.unpack_from(data, offset)[0]
+    offset += SIZE.size
+    return data[offset:offset + size], offset + size
+
+
+def _array(data, offset, typecode):
+    """Items of an array (see blendervr.player.buffer) and the next
+    offset"""
+    count = SIZE.unpack_from(data, offset)[0]
+    offset += SIZE.size
+    values = struct.unpack_from('>' + str(count) + typecode, data, offset)
+    return values, offset + count * struct.calcsize(typecode)
+
+
+class _StreamProfiler:
+    """Decode the synchronizer commands of a recording, remembering the
+    names of the objects and items"""
+
+    def __init__(self, profile):
+        self._profile = profile
+        self._objects = {}
+        self._items = {}
+        self._codec = CODEC_RAW
+
+    def synchronization(self, data):
+        offset = 0
+        while offset < len(data):
+            start = offset
+            command = bytes(data[offset:offset + 1])
+            offset += 1
+            if command == CLOCK:
+                offset += CLOCK_SIZE
+                self._profile.addCommand('CLOCK', offset - start)
+            elif command == CODEC:
+                content, offset = _subBuffer(data, offset)
+                self._codec = str(_subBuffer(content, 0)[0], 'UTF-8')
+                self._profile.addCommand('CODEC', offset - start)
+            elif command == TRANSFORMS:
+                content, offset = _subBuffer(data, offset)
+                self._transforms(content)
+                self._profile.addCommand('TRANSFORMS',
+                                         offset - start - len(content))
+            elif command == NEW_OBJECT:
+                content, offset = _subBuffer(data, offset)
+                self._newObjects(content)
+                self._profile.addCommand('NEW_OBJECT', offset - start)
+            elif command == OBJECT:
+                object_id, offset = _itemID(data, offset)
+                content, offset = _subBuffer(data, offset)
+                self._object(object_id, content, offset - start)
+            else:
+                raise ValueError('Unknown synchronization command: ' +
+                                 repr(command))
+
+    def _newObjects(self, data):
+        offset = 0
+        while offset < len(data):
+            object_id, offset = _itemID(data, offset)
+            name, offset = _subBuffer(data, offset)
+            self._objects[object_id] = str(name, 'UTF-8')
+
+    def _object(self, object_id, data, size):
+        if object_id in self._objects:
+            name = self._objects[object_id]
+            if name == SCENE_SYNCHRONIZER:
+                size -= self._sceneGraph(data)
+                self._profile.addCommand('scene graph', size)
+                return
+            category = getObjectCategory(name, True)
+        else:
+            name = self._items.get(object_id, '#' + str(object_id))
+            category = getObjectCategory(name, False)
+        self._profile.addObject(category, name, None, size)
+
+    def _transforms(self, data):
+        """Profile the transforms by object, as the master does"""
+        ids, offset = _array(data, 0, 'I')
+        flags, offset = _array(data, offset, 'B')
+        sizes = [offset]
+        start = offset
+        if self._codec == CODEC_QUANTIZED:
+            offset = _array(data, offset + 1, chr(data[offset]))[1]
+        else:
+            offset = _array(data, offset, 'f')[1]
+        sizes.append(offset - start)
+        start = offset
+        if self._codec == CODEC_QUANTIZED:
+            # Packed orientations, then the ones sent raw
+            offset = _array(data, offset, 'Q')[1]
+        offset = _array(data, offset, 'f')[1]
+        sizes.append(offset - start)
+        sizes.append(len(data) - offset)
+        for item_id, size in zip(ids, splitTransforms(flags, sizes)):
+            name = self._items.get(item_id, '#' + str(item_id))
+            self._profile.addObject('TRANSFORMS', name, None, size)
+
+    def _sceneGraph(self, data):
+        """Profile the items created and deleted, return their size"""
+        offset = 0
+        while offset < len(data):
+            start = offset
+            command = bytes(data[offset:offset + 1])
+            offset += 1
+            if command == CREATE_ITEM:
+                item_id, offset = _itemID(data, offset)
+                name, offset = _subBuffer(data, offset)
+                offset = _itemID(data, _itemID(data, offset)[1])[1]
+                self._items[item_id] = str(name, 'UTF-8')
+                self._profile.addCommand('CREATE_ITEM', offset - start)
+            elif command == DELETE_ITEM:
+                item_id, offset = _itemID(data, offset)
+                self._profile.addCommand('DELETE_ITEM', offset - start)
+            else:
+                raise ValueError('Unknown scene graph command: ' +
+                                 repr(command))
+        return offset
+
+
+def profileRecording(stream, profile=None):
+    """Profile the frames of a recording"""
+    if profile is None:
+        profile = Profile()
+    profiler = _StreamProfiler(profile)
+    for frame in stream:
+        for command, payload in recording.iterateFrame(frame):
+            if command == recording.CMD_SYNCHRO:
+                profiler.synchronization(payload)
+            elif command == recording.CMD_LATCH:
+                profile.addCommand('LATE_LATCH', len(payload))
+            else:
+                profile.addCommand(getMessageCategory(payload),
+                                   len(payload))
+        profile.endFrame()
+    return profile
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Profile of a synchronization stream recording')
+    parser.add_argument('recording')
+    parser.add_argument('--top', type=int, default=10)
+    arguments = parser.parse_args()
+
+    stream = recording.Recording(arguments.recording)
+    print(profileRecording(stream).getReport(arguments.top))
+    stream.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+# file: blendervr/tools/projection.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+"""
+Off-axis projections of the screens, for many viewpoints at once
+
+Same computations as the devices of blendervr.player.screen (wall,
+planovision and hmd), on numpy arrays rather than on mathutils matrices,
+for any number of eyes, users and frames in one pass. The devices use them
+to compute all their buffers at once. They do not need Blender, so the
+projections of a configuration can be computed, benchmarked and checked
+headless (see main()). Matrices are indexed [row][column], as mathutils
+ones. It requires numpy.
+"""
+
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Corners of the screen, as options of main() and inside the configuration
+CORNERS = (('top-left', 'topLeftCorner'),
+           ('top-right', 'topRightCorner'),
+           ('bottom-right', 'bottomRightCorner'))
+
+
+def _checkNumpy():
+    if numpy is None:
+        raise ImportError('blendervr.tools.projection requires numpy')
+
+
+def _matrices(matrices):
+    """(N, 4, 4) array of 4x4 matrices, or of a single one"""
+    return numpy.array(matrices, float).reshape(-1, 4, 4)
+
+
+def _translations(vectors):
+    """(N, 4, 4) array of the translations of N vectors"""
+    translations = numpy.repeat(numpy.identity(4)[None], len(vectors), 0)
+    translations[:, :3, 3] = vectors
+    return translations
+
+
+def getFrustums(shiftings, windows, near, far):
+    """(N, 4, 4) off-axis frustums of N viewpoints shifted from the center
+    of their screen, given the window coordinates (left, right, bottom,
+    top) of that screen, or of each one"""
+    shiftings = numpy.asarray(shiftings, float).reshape(-1, 3)
+    windows = numpy.broadcast_to(numpy.asarray(windows, float),
+                                 (len(shiftings), 4))
+    depths = shiftings[:, 2]
+    ratios = numpy.full(len(shiftings), float(near))
+    shifted = numpy.abs(depths) >= 0.0001
+    ratios[shifted] = near / depths[shifted]
+    left, right, bottom, top = \
+        ((windows - shiftings[:, (0, 0, 1, 1)]) * ratios[:, None]).T
+
+    frustums = numpy.zeros((len(shiftings), 4, 4))
+    frustums[:, 0, 0] = 2 * near / (right - left)
+    frustums[:, 0, 2] = (right + left) / (right - left)
+    frustums[:, 1, 1] = 2 * near / (top - bottom)
+    frustums[:, 1, 2] = (top + bottom) / (top - bottom)
+    frustums[:, 2, 2] = - (far + near) / (far - near)
+    frustums[:, 2, 3] = - 2 * far * near / (far - near)
+    frustums[:, 3, 2] = - 1.0
+    return frustums
+
+
+def getScreenFrame(corners):
+    """Matrix from the origin of the screens to the frame of the screen
+    (centered on it, X to the right, Y up) and window coordinates (left,
+    right, bottom, top) of the screen in that frame, from the
+    'topLeftCorner', 'topRightCorner' and 'bottomRightCorner' of the
+    configuration"""
+    _checkNumpy()
+    top_left = numpy.asarray(corners['topLeftCorner'], float)
+    top_right = numpy.asarray(corners['topRightCorner'], float)
+    bottom_right = numpy.asarray(corners['bottomRightCorner'], float)
+
+    x_vector = top_right - top_left
+    y_vector = top_right - bottom_right
+    z_vector = numpy.cross(x_vector, y_vector)
+    for vector in (x_vector, y_vector, z_vector):
+        if numpy.linalg.norm(vector) < top_right[0] / 100000:
+            raise ValueError('degenerated screen corners')
+    center = (top_left - y_vector + top_right) / 2.0
+
+    rotation = numpy.identity(4)
+    rotation[:3, 0] = x_vector / numpy.linalg.norm(x_vector)
+    rotation[:3, 1] = y_vector / numpy.linalg.norm(y_vector)
+    rotation[:3, 2] = z_vector / numpy.linalg.norm(z_vector)
+    translation = numpy.identity(4)
+    translation[:3, 3] = -center
+    to_local = numpy.linalg.inv(rotation).dot(translation)
+
+    local_top_left = to_local.dot(numpy.append(top_left, 1.0))
+    local_top_right = to_local.dot(numpy.append(top_right, 1.0))
+    local_bottom_right = to_local.dot(numpy.append(bottom_right, 1.0))
+    window = (local_top_left[0], local_top_right[0],
+              local_bottom_right[1], local_top_right[1])
+    return to_local, window
+
+
+class Wall:
+    """Projections of a wall screen, given by the matrix from the origin of
+    the screens to its own frame and its window coordinates (see
+    getScreenFrame())"""
+
+    def __init__(self, to_local, window):
+        _checkNumpy()
+        self._to_local = numpy.array(to_local, float)
+        self._window = numpy.array(window, float)
+
+    def getProjections(self, positions, eyes, near, far, scale=1.0,
+                       depth=None):
+        """Projection matrices, as a (N, 4, 4) array, of N viewpoints.
+
+        positions are the N positions of the users in the vehicle (4x4
+        matrices) and eyes the N offsets of the eyes along the X axis of
+        their user (eye * eye separation / 2). near and far are the ones of
+        the camera, depth defaults to their middle"""
+        positions = _matrices(positions)
+        eyes = numpy.asarray(eyes, float).reshape(-1)
+        if depth is None:
+            depth = (near + far) / 2.0
+        near *= scale
+        far *= scale
+        to_local = self._to_local
+
+        # Eyes in the frame of the screen
+        viewpoints = positions[:, :, 0] * eyes[:, None] + positions[:, :, 3]
+        viewpoints = viewpoints.dot(to_local.T)[:, :3]
+
+        # From the vehicle to the eye, by the screen
+        to_eyes = numpy.repeat(to_local[None], len(viewpoints), 0)
+        to_eyes[:, :3, :] -= viewpoints[:, :, None] * to_local[3]
+
+        frustums = getFrustums(viewpoints, self._window, near, far)
+
+        # And scale to the scene, around the depth
+        scene_scale = numpy.diag((scale, scale, scale, 1.0))
+        scene_scale[2, 3] = (scale - 1.0) * depth
+
+        return numpy.matmul(numpy.matmul(frustums, to_eyes), scene_scale)
+
+    def getViewMatrices(self, vehicles, modelview):
+        """Model view matrices, as a (N, 4, 4) array, of the eyes of N
+        users, given their vehicle and the model view matrix of the
+        camera"""
+        return numpy.matmul(_matrices(vehicles), _matrices(modelview))
+
+
+class Planovision(Wall):
+    """Projections of a planovision table: the eyes always look at the
+    middle of the table"""
+
+    def getProjections(self, positions, eyes, near, far):
+        """Projection matrices, as a (N, 4, 4) array, of N viewpoints, and
+        their (N, 3) shiftings from the middle of the table. positions and
+        eyes are the ones of Wall.getProjections()"""
+        positions = _matrices(positions)
+        eyes = numpy.asarray(eyes, float).reshape(-1)
+        heads = positions[:, :3, 3]
+        shiftings = heads.copy()
+        shiftings[:, 2] = 0.0
+        perpendiculars = numpy.cross(shiftings, (0.0, 0.0, 1.0))
+        norms = numpy.linalg.norm(perpendiculars, axis=1)
+        normalized = norms > 0.0
+        perpendiculars[normalized] /= norms[normalized, None]
+        shiftings -= perpendiculars * eyes[:, None]
+        shiftings[:, 2] = heads[:, 2]
+        return getFrustums(shiftings, self._window, near, far), shiftings
+
+    def getViewMatrices(self, shiftings, world_position, vehicles,
+                        vehicle_scale):
+        """Model view matrices, as a (N, 4, 4) array, of the N shifted
+        eyes, given the position of the camera, the vehicles of the users
+        and the scale of the vehicle"""
+        shiftings = numpy.asarray(shiftings, float).reshape(-1, 3)
+        translations = _translations(numpy.asarray(world_position, float)
+                                     + shiftings * vehicle_scale)
+        return numpy.linalg.inv(numpy.matmul(_matrices(vehicles),
+                                             translations))
+
+
+class HMD:
+    """Projections of the screens of a head mounted display, one screen per
+    buffer, given by the matrices from the origin of the screens to their
+    own frame and their window coordinates (see getScreenFrame())"""
+
+    def __init__(self, to_local, windows):
+        _checkNumpy()
+        self._to_local = _matrices(to_local)
+        self._from_local = numpy.linalg.inv(self._to_local)
+        self._windows = numpy.array(windows, float).reshape(-1, 4)
+
+    def getProjections(self, eyes, near, far, scale=1.0):
+        """Projection matrices, as a (N, 4, 4) array, of the N screens, and
+        the (N, 3) viewpoints they are seen from. eyes are the offsets of
+        the eyes of each screen (see Wall.getProjections())"""
+        eyes = numpy.asarray(eyes, float).reshape(-1)
+        points = numpy.zeros((len(eyes), 4))
+        points[:, 0] = -eyes
+        points[:, 3] = 1.0
+        viewpoints = numpy.matmul(self._from_local,
+                                  points[:, :, None])[:, :3, 0]
+        return getFrustums(-viewpoints, self._windows, near * scale,
+                           far * scale), viewpoints
+
+    def getViewMatrices(self, viewpoints, positions, vehicles, modelview):
+        """Model view matrices, as a (N, 4, 4) array, of the N screens, given
+        their viewpoints, the positions and vehicles of their users and the
+        model view matrix of the camera"""
+        screens = numpy.matmul(numpy.matmul(self._to_local,
+                                            _matrices(positions)),
+                               _matrices(vehicles))
+        return numpy.matmul(numpy.matmul(_translations(viewpoints), screens),
+                            _matrices(modelview))
+
+
+def _vector(text):
+    return tuple(float(value) for value in text.split(','))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Off-axis projections of a wall screen of BlenderVR. '
+        'Negative coordinates are given as --user=-1,0,0')
+    for corner, name in CORNERS:
+        parser.add_argument('--' + corner, type=_vector, required=True,
+                            metavar='X,Y,Z')
+    parser.add_argument('--user', type=_vector, default=(0.0, 0.0, 0.0),
+                        metavar='X,Y,Z', help='position of the user')
+    parser.add_argument('--eye-separation', type=float, default=0.06)
+    parser.add_argument('--near', type=float, default=0.1)
+    parser.add_argument('--far', type=float, default=100.0)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--viewpoints', type=int, default=0,
+                        help='time the projections of that many viewpoints')
+    arguments = parser.parse_args()
+
+    to_local, window = getScreenFrame(dict(
+                (name, getattr(arguments, corner.replace('-', '_')))
+                for corner, name in CORNERS))
+    wall = Wall(to_local, window)
+    position = numpy.identity(4)
+    position[:3, 3] = arguments.user
+    offset = arguments.eye_separation / 2.0
+    projections = wall.getProjections([position, position],
+                                      [-offset, offset], arguments.near,
+                                      arguments.far, arguments.scale)
+    for eye, projection in zip(('left', 'right'), projections):
+        print(eye + ' eye:')
+        for row in projection:
+            print('  ' + ' '.join('{0:12.6f}'.format(value)
+                                  for value in row))
+
+    if arguments.viewpoints > 0:
+        positions = numpy.repeat(position[None], arguments.viewpoints, 0)
+        positions[:, :3, 3] += numpy.random.uniform(-0.5, 0.5,
+                                                    (arguments.viewpoints, 3))
+        eyes = numpy.resize((-offset, offset), arguments.viewpoints)
+        start = time.time()
+        wall.getProjections(positions, eyes, arguments.near, arguments.far,
+                            arguments.scale)
+        duration = time.time() - start
+        print('{0} viewpoints in {1:.3f} ms'.format(arguments.viewpoints,
+                                                    duration * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+# file: blendervr/tools/recording.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+"""
+Recording of the synchronization stream
+
+The master appends each frame it sends to the slaves, as is, to a recording
+file. The recording can then be read back through a memory mapping, to
+replay it to a synchronizer, or to network slaves, without Blender nor
+master.
+
+The file starts with MAGIC, followed by the frames, then by the index of
+their offsets and the trailer (offset of the index, number of frames,
+MAGIC). A recording without trailer (the master did not quit properly) is
+indexed again while opening it.
+"""
+
+import os
+import mmap
+import time
+import struct
+import socket
+
+MAGIC = b'BVRSYNC1'
+OFFSET = struct.Struct('>Q')
+TRAILER = struct.Struct('>QI')
+
+# Framing of the frames. blendervr.player.network.connector takes it from
+# here: the player cannot be imported outside of Blender, where the
+# recordings are replayed
+CMD_FINISHED = b'f'
+CMD_MSG = b'm'
+CMD_SYNCHRO = b's'
+CMD_LATCH = b'p'
+COMMAND_SIZE = 1
+SIZE = struct.Struct('>i')
+
+# Handshake of the slaves with the master
+ID_SIZE = 1024
+EVERYBODY_HERE = b'r'
+BARRIER = b'b'
+RESEND = b'z'
+RESEND_ID = struct.Struct('>I')
+
+
+class Recorder:
+    """Append the frames of the master to a recording file"""
+
+    def __init__(self, path):
+        self._path = path
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._offsets = []
+
+    def getPath(self):
+        return self._path
+
+    def getFramesNumber(self):
+        return len(self._offsets)
+
+    def addFrame(self, frame):
+        if len(frame) == 0:
+            # Nothing has been sent to the slaves
+            return
+        self._offsets.append(self._file.tell())
+        self._file.write(frame)
+
+    def close(self):
+        if self._file is None:
+            return
+        index = self._file.tell()
+        for offset in self._offsets:
+            self._file.write(OFFSET.pack(offset))
+        self._file.write(OFFSET.pack(index))
+        self._file.write(TRAILER.pack(index, len(self._offsets)))
+        self._file.write(MAGIC)
+        self._file.close()
+        self._file = None
+
+
+class Recording:
+    """Recording file mapped in memory: each frame is a view on the
+    mapping"""
+
+    def __init__(self, path):
+        self._path = path
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        if self._data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError('Not a synchronization recording: ' + path)
+        if not self._readIndex():
+            self._scanIndex()
+
+    def _readIndex(self):
+        trailer = len(self._data) - TRAILER.size - len(MAGIC)
+        if trailer < len(MAGIC) or self._data[-len(MAGIC):] != MAGIC:
+            return False
+        index, count = TRAILER.unpack_from(self._data, trailer)
+        if index + (count + 1) * OFFSET.size != trailer:
+            return False
+        self._offsets = [OFFSET.unpack_from(self._data,
+                                            index + position * OFFSET.size)[0]
+                         for position in range(count + 1)]
+        return True
+
+    def _scanIndex(self):
+        """Find the frames of a recording that has not been closed. The last
+        frame is dropped if it is incomplete"""
+        self._offsets = [len(MAGIC)]
+        while True:
+            end = _frameEnd(self._data, self._offsets[-1])
+            if end is None:
+                break
+            self._offsets.append(end)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.getFrame(index)
+
+    def getPath(self):
+        return self._path
+
+    def getFrame(self, index):
+        """View, without any copy, on the frame number index"""
+        return memoryview(self._data)[self._offsets[index]:
+                                      self._offsets[index + 1]]
+
+    def getFrameSize(self, index):
+        return self._offsets[index + 1] - self._offsets[index]
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._file.close()
+
+
+def _frameEnd(data, offset):
+    """Offset just after the frame starting at offset, or None if it is
+    incomplete"""
+    try:
+        while True:
+            command = data[offset:offset + COMMAND_SIZE]
+            offset += COMMAND_SIZE
+            if command == CMD_FINISHED:
+                return offset
+            if command not in (CMD_MSG, CMD_SYNCHRO, CMD_LATCH):
+                return None
+            while True:
+                size = SIZE.unpack_from(data, offset)[0]
+                offset += SIZE.size + size
+                if size == 0:
+                    break
+    except struct.error:
+        return None
+
+
+def iterateFrame(frame):
+    """Give the (command, payload) of each buffer inside the frame: command
+    is CMD_SYNCHRO, CMD_MSG or CMD_LATCH"""
+    offset = 0
+    while True:
+        command = bytes(frame[offset:offset + COMMAND_SIZE])
+        offset += COMMAND_SIZE
+        if command not in (CMD_MSG, CMD_SYNCHRO, CMD_LATCH):
+            return
+        while True:
+            size = SIZE.unpack_from(frame, offset)[0]
+            offset += SIZE.size
+            if size == 0:
+                break
+            yield (command, frame[offset:offset + size])
+            offset += size
+
+
+def replay(recording, synchronizer, messages=None, first=0, last=None,
+           latches=None):
+    """Feed the frames of the recording to synchronizer.process. The
+    messages of the master (pause, processor commands ...) are given to
+    messages and its latched poses to latches, if any. Requires the player
+    modules (Blender or the bge of a test harness)"""
+    from ..player.buffer import Buffer
+    if last is None:
+        last = len(recording)
+    for index in range(first, last):
+        for command, payload in iterateFrame(recording.getFrame(index)):
+            if command == CMD_SYNCHRO:
+                synchronizer.process(Buffer(payload))
+            elif command == CMD_LATCH:
+                if latches is not None:
+                    latches(Buffer(payload))
+            elif messages is not None:
+                messages(Buffer(payload))
+
+
+class Replayer:
+    """Play the part of the master for network slaves: send them the frames
+    of a recording, with the barrier of the master after each frame"""
+
+    def __init__(self, recording, port, slaves):
+        self._recording = recording
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(('', port))
+        self._server.listen(slaves)
+        self._slaves = []
+        while len(self._slaves) < slaves:
+            client, address = self._server.accept()
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._receive(client, ID_SIZE)
+            self._slaves.append(client)
+        for client in self._slaves:
+            client.sendall(EVERYBODY_HERE)
+
+    def _receive(self, client, size):
+        data = b''
+        while len(data) < size:
+            chunk = client.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('Lost connexion to a slave')
+            data += chunk
+        return data
+
+    def _barrier(self, client):
+        """Wait for the barrier token of the slave. A recording cannot
+        send objects again: their requests are ignored"""
+        while True:
+            token = self._receive(client, COMMAND_SIZE)
+            if token == BARRIER:
+                return
+            if token != RESEND:
+                raise ConnectionError('Protocol error: no barrier')
+            self._receive(client, RESEND_ID.size)
+
+    def run(self, rate=None, first=0, last=None):
+        """Send the frames, at rate frames per second or as fast as the
+        slaves process them. Return the time spent"""
+        if last is None:
+            last = len(self._recording)
+        start = time.time()
+        for index in range(first, last):
+            frame = self._recording.getFrame(index)
+            for client in self._slaves:
+                client.sendall(frame)
+            for client in self._slaves:
+                self._barrier(client)
+            for client in self._slaves:
+                client.sendall(BARRIER)
+            if rate:
+                delay = start + (index - first + 1) / rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+        return time.time() - start
+
+    def close(self):
+        for client in self._slaves + [self._server]:
+            try:
+                client.close()
+            except socket.error:
+                pass
+        self._slaves = []
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Synchronization stream recordings of BlenderVR')
+    parser.add_argument('recording')
+    parser.add_argument('--serve', metavar='PORT', type=int,
+                        help='replay the recording to network slaves')
+    parser.add_argument('--slaves', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=None,
+                        help='frames per second (default: no pacing)')
+    arguments = parser.parse_args()
+
+    recording = Recording(arguments.recording)
+    sizes = [recording.getFrameSize(index) for index in range(len(recording))]
+    print('{0}: {1} frames, {2} bytes, {3:.0f} bytes per frame'.format(
+        recording.getPath(), len(sizes), os.path.getsize(recording.getPath()),
+        sum(sizes) / max(len(sizes), 1)))
+    if arguments.serve is not None:
+        replayer = Replayer(recording, arguments.serve, arguments.slaves)
+        duration = replayer.run(arguments.rate)
+        replayer.close()
+        print('Replayed in {0:.3f}s'.format(duration))
+    recording.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# file: tests/doubles/bge/types.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+import mathutils
+
+
+class KX_GameObject:
+    def __init__(self, name, scene=None):
+        self.name = name
+        self.worldPosition = mathutils.Vector((0.0, 0.0, 0.0))
+        self.worldOrientation = mathutils.Matrix.Identity(3)
+        self.worldScale = mathutils.Vector((1.0, 1.0, 1.0))
+        self.visible = True
+        self.invalid = False
+        self.parent = None
+        self._properties = {}
+        self._scene = scene
+
+    def __str__(self):
+        return self.name
+
+    # The transform is copied into mathutils values, as the BGE does
+    @property
+    def worldPosition(self):
+        return self._worldPosition
+
+    @worldPosition.setter
+    def worldPosition(self, position):
+        self._worldPosition = mathutils.Vector(position)
+
+    @property
+    def worldOrientation(self):
+        return self._worldOrientation
+
+    @worldOrientation.setter
+    def worldOrientation(self, orientation):
+        if hasattr(orientation, 'to_matrix'):
+            # A quaternion or euler angles
+            orientation = orientation.to_matrix()
+        self._worldOrientation = mathutils.Matrix(orientation)
+
+    @property
+    def worldScale(self):
+        return self._worldScale
+
+    @worldScale.setter
+    def worldScale(self, scale):
+        self._worldScale = mathutils.Vector(scale)
+
+    def __contains__(self, key):
+        return key in self._properties
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __setitem__(self, key, value):
+        self._properties[key] = value
+
+    def get(self, key, default=None):
+        return self._properties.get(key, default)
+
+    def getPropertyNames(self):
+        return list(self._properties)
+
+    def setVisible(self, visible, recursive=False):
+        self.visible = visible
+
+    def endObject(self):
+        if self.invalid:
+            raise SystemError('Blender Game Object has been freed')
+        self.invalid = True
+        if self._scene is not None and self in self._scene.objects:
+            self._scene.objects.remove(self)
+
+
+class KX_Camera(KX_GameObject):
+    def __init__(self, name, scene=None):
+        KX_GameObject.__init__(self, name, scene)
+        self.near = 0.1
+        self.far = 100.0
+        self.worldTransform = mathutils.Matrix.Identity(4)
+        self.modelview_matrix = mathutils.Matrix.Identity(4)
+        self.projection_matrix = mathutils.Matrix.Identity(4)
+
+
+class KX_Scene:
+    def __init__(self, count=0, name='Scene'):
+        self.name = name
+        self.objects = []
+        self.active_camera = KX_Camera('Camera')
+        for index in range(count):
+            self.addObject('object{0}'.format(index))
+
+    def __str__(self):
+        return self.name
+
+    def addObject(self, name, reference=None, time=0):
+        """Unlike Blender, the object is created from its name only"""
+        item = KX_GameObject(str(name), self)
+        self.objects.append(item)
+        return item
+
+    def suspend(self):
+        pass
+
+    def resume(self):
+        pass
+
+
+class BL_ArmatureChannel:
+    def __init__(self, name):
+        self.name = name
+        self.location = mathutils.Vector((0.0, 0.0, 0.0))
+        self.scale = mathutils.Vector((1.0, 1.0, 1.0))
+        self.rotation_quaternion = mathutils.Vector((1.0, 0.0, 0.0, 0.0))
+        self.rotation_euler = mathutils.Vector((0.0, 0.0, 0.0))
+        # Quaternion, then the six euler orders. Axis and angle is -1
+        self.rotation_mode = 0
+
+    def __str__(self):
+        return self.name
+
+
+class BL_ArmatureObject(KX_GameObject):
+    def __init__(self, name, channels=(), scene=None):
+        KX_GameObject.__init__(self, name, scene)
+        self.channels = [BL_ArmatureChannel(channel) for channel in channels]
+        self._action_frame = 0.0
+        self.updates = 0
+
+    def getActionFrame(self, layer=0):
+        return self._action_frame
+
+    def setActionFrame(self, frame, layer=0):
+        self._action_frame = frame
+
+    def update(self):
+        self.updates += 1
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# file: tests/doubles/mathutils.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+"""
+mathutils of Blender 2.7x, as the player uses it
+
+Since Blender 2.80 (and in the mathutils package of PyPI), '*' is the
+element-wise product and '@' the matrix one. The player is written for the
+game engine of Blender 2.7x, where '*' is the matrix product: this module
+loads the installed mathutils and, if needed, gives back its '*'.
+"""
+
+import os
+import sys
+import operator
+import importlib.machinery
+import importlib.util
+
+_DOUBLES = os.path.dirname(os.path.abspath(__file__))
+
+_spec = importlib.machinery.PathFinder.find_spec('mathutils',
+            [path for path in sys.path
+             if os.path.abspath(path or os.curdir) != _DOUBLES])
+if _spec is None:
+    raise ImportError('No module named mathutils')
+# The extension registers itself as mathutils while it loads
+_double = sys.modules[__name__]
+_mathutils = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_mathutils)
+sys.modules[__name__] = _double
+
+_TYPES = (_mathutils.Matrix, _mathutils.Vector, _mathutils.Quaternion)
+_WRAPPERS = {}
+
+
+def _wrap(value):
+    wrapper = _WRAPPERS.get(type(value))
+    return value if wrapper is None else wrapper(value)
+
+
+def _wrapMethod(method):
+    def wrapped(*args, **kwargs):
+        return _wrap(method(*args, **kwargs))
+    return wrapped
+
+
+def _blender27(base):
+    """Subclass of base where '*' is the product of Blender 2.7x and the
+    methods give such objects back"""
+    def multiply(first, second):
+        if isinstance(first, _TYPES) and isinstance(second, _TYPES):
+            return _wrap(operator.matmul(first, second))
+        return _wrap(base.__mul__(first, second))
+
+    def reflectedMultiply(second, first):
+        if isinstance(first, _TYPES):
+            return _wrap(operator.matmul(first, second))
+        return _wrap(base.__rmul__(second, first))
+
+    namespace = {'__mul__': multiply, '__rmul__': reflectedMultiply,
+                 '__imul__': multiply}
+    for name in ('__add__', '__sub__', '__neg__', '__truediv__',
+                 '__matmul__', '__rmatmul__'):
+        if hasattr(base, name):
+            namespace[name] = _wrapMethod(getattr(base, name))
+    for name, attribute in vars(base).items():
+        kind = type(attribute).__name__
+        if name.startswith('__'):
+            continue
+        if kind == 'method_descriptor':
+            namespace[name] = _wrapMethod(attribute)
+        elif kind == 'classmethod_descriptor':
+            namespace[name] = staticmethod(
+                                    _wrapMethod(getattr(base, name)))
+    wrapper = type(base.__name__, (base,), namespace)
+    _WRAPPERS[base] = wrapper
+    return wrapper
+
+
+if hasattr(_mathutils.Matrix, '__matmul__'):
+    globals().update((name, value) for name, value in vars(_mathutils).items()
+                     if not name.startswith('__'))
+    Matrix = _blender27(_mathutils.Matrix)
+    Vector = _blender27(_mathutils.Vector)
+    Quaternion = _blender27(_mathutils.Quaternion)
+else:
+    sys.modules[__name__] = _mathutils
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# file: tests/test_buffer.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+import pytest
+
+mathutils = pytest.importorskip('mathutils')
+numpy = pytest.importorskip('numpy')
+
+from blendervr.player import buffer
+
+
+def _roundTrip(typecode, data):
+    writer = buffer.Buffer()
+    writer.array(typecode, data)
+    writer.integer(42)
+    reader = buffer.Buffer(bytes(writer.getData()))
+    values = reader.array(typecode)
+    return values, reader.integer()
+
+
+def test_array_flattens_multi_dimensional_arrays():
+    data = numpy.arange(6, dtype='f8').reshape(2, 3)
+    values, following = _roundTrip('f', data)
+    assert list(values) == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    assert following == 42
+
+
+def test_array_flattens_in_row_major_order():
+    data = numpy.arange(12, dtype='u4').reshape(3, 4).T
+    values, following = _roundTrip('I', data)
+    assert list(values) == list(data.ravel())
+    assert following == 42
+
+
+def test_array_round_trip_of_sequences():
+    values, following = _roundTrip('H', [1, 2, 65535])
+    assert list(values) == [1, 2, 65535]
+    assert following == 42
+
+
+def test_wrapped_sub_buffer_matches_an_opened_one():
+    opened = buffer.Buffer()
+    opened.integer(7)
+    position = opened.openSubBuffer(b'o')
+    opened.string('content')
+    opened.closeSubBuffer(position, b'o')
+
+    wrapped = buffer.Buffer()
+    wrapped.integer(7)
+    start = len(wrapped)
+    wrapped.string('content')
+    assert wrapped.wrapSubBuffer(start, b'o') == len('content') + 4
+    assert bytes(wrapped.getData()) == bytes(opened.getData())
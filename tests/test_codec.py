@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# file: tests/test_codec.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+import math
+import random
+
+import pytest
+
+mathutils = pytest.importorskip('mathutils')
+
+from blendervr.player.buffer import Buffer
+from blendervr.player.network.synchronizer import codec
+
+# Float32 rounding of the coefficients of mathutils matrices
+FLOAT_ERROR = 1e-6
+
+
+def _randomPose(generator, extent=10.0):
+    """Rows of a random rigid transform, and its quaternion and position"""
+    quaternion = [generator.gauss(0.0, 1.0) for index in range(4)]
+    norm = math.sqrt(sum(value * value for value in quaternion))
+    quaternion = tuple(value / norm for value in quaternion)
+    position = tuple(generator.uniform(-extent, extent) for index in range(3))
+    rows = codec.quaternion_to_matrix(quaternion)
+    matrix = mathutils.Matrix((rows[0] + (position[0],),
+                               rows[1] + (position[1],),
+                               rows[2] + (position[2],),
+                               (0.0, 0.0, 0.0, 1.0)))
+    return matrix
+
+
+def _angle(a, b):
+    """Angle, in radians, between the rotations of two matrices"""
+    qa = codec.matrix_to_quaternion([row[0:3] for row in a[0:3]])
+    qb = codec.matrix_to_quaternion([row[0:3] for row in b[0:3]])
+    dot = abs(sum(x * y for x, y in zip(qa, qb)))
+    return 2.0 * math.acos(min(dot, 1.0))
+
+
+def _roundTrip(master, matrix, slave=None):
+    """Matrix kept by the master and matrix decoded by a slave"""
+    buff = Buffer()
+    written = master.matrix_4x4(buff, matrix)
+    reader = Buffer(bytes(buff.getData()))
+    decoded = (slave or master).matrix_4x4(reader)
+    assert reader.isEmpty()
+    return written, decoded
+
+
+@pytest.mark.parametrize('precision, bits', [(0.0001, 20), (0.001, 16),
+                                             (0.01, 12)])
+def test_quantized_matrix_error_bounds(precision, bits):
+    quantized = codec.Quantized({'position_precision': precision,
+                                 'orientation_bits': bits})
+    # Each of the three smallest components is within half a step: the
+    # rotation is within a few steps
+    step = 2.0 * codec.SMALLEST_THREE_BOUND / ((1 << bits) - 1)
+    angle_bound = 4.0 * math.sqrt(3.0) * step + FLOAT_ERROR
+    generator = random.Random(4)
+    for index in range(2000):
+        matrix = _randomPose(generator)
+        written, decoded = _roundTrip(quantized, matrix)
+        for row in range(3):
+            assert abs(decoded[row][3] - matrix[row][3]) <= \
+                        precision / 2.0 + 10.0 * FLOAT_ERROR
+        assert _angle(decoded, matrix) <= angle_bound
+
+
+def test_quantized_master_keeps_the_decoded_matrix():
+    configuration = {'codec': codec.QUANTIZED, 'orientation_bits': 14}
+    master = codec.getCodec(configuration)
+    announce = Buffer()
+    master.announce(announce)
+    slave = codec.readAnnounce(Buffer(bytes(announce.getData())))
+    generator = random.Random(7)
+    for index in range(200):
+        written, decoded = _roundTrip(master, _randomPose(generator), slave)
+        # Bit-exact: the master draws the pose that all the slaves decode
+        assert written == decoded
+
+
+def test_quantized_sends_scaled_matrices_raw():
+    quantized = codec.Quantized({})
+    matrix = _randomPose(random.Random(1))
+    for row in range(3):
+        for column in range(3):
+            matrix[row][column] *= 2.5
+    assert not codec.is_rigid(matrix)
+    written, decoded = _roundTrip(quantized, matrix)
+    assert written is matrix
+    assert decoded == matrix
+
+
+def test_rigid_detection():
+    generator = random.Random(2)
+    assert codec.is_rigid(_randomPose(generator))
+    reflection = _randomPose(generator)
+    for column in range(3):
+        reflection[0][column] = -reflection[0][column]
+    assert not codec.is_rigid(reflection)
+    projective = _randomPose(generator)
+    projective[3][2] = 0.5
+    assert not codec.is_rigid(projective)
+
+
+def test_raw_codec_keeps_the_matrix():
+    matrix = _randomPose(random.Random(3))
+    written, decoded = _roundTrip(codec.Raw({}), matrix)
+    assert written is matrix
+    assert decoded == matrix
+
+
+def _orientations(pose):
+    """Coefficients of the orientation of a pose, by rows"""
+    return [value for row in pose[0:3] for value in row[0:3]]
+
+
+def test_quantized_sends_non_rigid_orientations_raw():
+    quantized = codec.Quantized({'orientation_bits': 14})
+    generator = random.Random(5)
+    mirrored = _randomPose(generator)
+    for column in range(3):
+        mirrored[1][column] = -mirrored[1][column]
+    sheared = _randomPose(generator)
+    sheared[0][1] += 0.25
+    rigid = _randomPose(generator)
+    data = []
+    for pose in (rigid, mirrored, sheared, rigid):
+        data.extend(_orientations(pose))
+    buff = Buffer()
+    written = quantized.orientations(buff, data)
+    reader = Buffer(bytes(buff.getData()))
+    decoded = quantized.orientations(reader)
+    assert reader.isEmpty()
+    # Bit-exact, and the raw orientations keep their float precision
+    assert written == [float(value) for value in decoded]
+    assert written[9:27] == codec.as_floats(data[9:27])
+    assert written[0:9] == written[27:36]
+    assert max(abs(a - b) for a, b in zip(written[0:9], data[0:9])) < 1e-3
+
+
+def test_quantized_positions_return_the_decoded_values():
+    quantized = codec.Quantized({'position_precision': 0.01})
+    buff = Buffer()
+    written = quantized.positions(buff, [1.234, -5.678, 100.0])
+    decoded = quantized.positions(Buffer(bytes(buff.getData())))
+    assert written == [float(value) for value in decoded]
+    assert written == pytest.approx([1.23, -5.68, 100.0])
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+# file: tests/test_connector.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+import os
+import stat
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip('mathutils')
+
+from blendervr.player.buffer import Buffer
+from blendervr.player.network import connector
+
+MULTICAST_GROUP = '239.255.42.99'
+
+
+class _Logger:
+    def info(self, *args):
+        pass
+
+    debug = warning = error = info
+
+    def log_traceback(self, error):
+        pass
+
+
+class _BlenderVR:
+    """Just what the connectors need from the player"""
+
+    def __init__(self, name):
+        self._logger = _Logger()
+        self._name = name
+        self.messages = []
+        self.quitted = None
+
+    def getScreenName(self):
+        return self._name
+
+    def quit(self, reason):
+        self.quitted = reason
+
+    _quitByNetwork = quit
+
+    def _messageFromMaster(self, buff):
+        self.messages.append(bytes(buff.raw(size=len(buff))))
+
+
+class _LossyMulticast:
+    """Multicast socket of the master that drops some fragments"""
+
+    def __init__(self, multicast, dropped):
+        self._multicast = multicast
+        self._dropped = dropped
+        self.sent = 0
+
+    def sendto(self, datagram, address):
+        index = connector.FRAGMENT_HEADER.unpack_from(datagram)[1]
+        self.sent += 1
+        if index not in self._dropped:
+            self._multicast.sendto(datagram, address)
+
+
+def _freePort():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(('', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def _connect(port, slaves_number, local=False):
+    names = ['slave' + str(index) for index in range(slaves_number)]
+    master_config = {'port': port, 'nodes': ['master'] + names}
+    if local:
+        master_config['local_nodes'] = names
+    master = connector.Master(_BlenderVR('master'), master_config)
+    slaves = [connector.Slave(_BlenderVR(name),
+                              {'port': port, 'master': '127.0.0.1',
+                               'local': local})
+              for name in names]
+    threads = [threading.Thread(target=slave.wait_for_everybody)
+               for slave in slaves]
+    for thread in threads:
+        thread.start()
+    while not master.isReady():
+        master.wait_for_everybody()
+    for thread in threads:
+        thread.join()
+    return master, slaves
+
+
+def _sendToSlave(master, buff):
+    master.send(master.CMD_MSG, buff)
+
+
+def _frame(master, slaves, message):
+    """Send message to the slaves and return the messages they received"""
+    buff = Buffer()
+    buff.raw(message)
+    # Without the synchronizer of the player to profile the message
+    _sendToSlave(master, buff)
+    master.endFrame()
+
+    def slaveFrame(slave):
+        slave.run()
+        slave.barrier()
+
+    threads = [threading.Thread(target=slaveFrame, args=(slave,))
+               for slave in slaves]
+    for thread in threads:
+        thread.start()
+    master.barrier()
+    for thread in threads:
+        thread.join()
+    return [slave.BlenderVR.messages.pop() for slave in slaves]
+
+
+@pytest.fixture
+def network():
+    try:
+        master, slaves = _connect(MULTICAST_GROUP + ':' + str(_freePort()),
+                                  2)
+    except OSError as error:
+        pytest.skip('No loopback multicast: ' + str(error))
+    yield master, slaves
+    for slave in slaves:
+        slave.quit('end of test')
+        slave._multicast.close()
+    master.quit('end of test')
+    master._multicast.close()
+
+
+def test_multicast_frame_without_loss(network):
+    master, slaves = network
+    message = bytes(range(256)) * 20
+    assert _frame(master, slaves, message) == [message] * len(slaves)
+    assert len(master._fragments) > 1
+
+
+def test_slaves_repair_lost_fragments(network):
+    master, slaves = network
+    message = bytes(range(256)) * 40
+    lossy = _LossyMulticast(master._multicast, dropped=set([0, 3, 7]))
+    master._multicast = lossy
+    repairs = []
+    repairFrame = master._repairFrame
+
+    def _repairFrame(client):
+        repairs.append(master._clients[client]['name'])
+        repairFrame(client)
+    master._repairFrame = _repairFrame
+    try:
+        for frame in range(3):
+            message = message[1:] + message[:1]
+            received = _frame(master, slaves, message)
+            assert received == [message] * len(slaves)
+    finally:
+        master._multicast = lossy._multicast
+    assert lossy.sent == 3 * len(master._fragments)
+    assert len(master._fragments) > 7
+    assert sorted(repairs) == sorted(3 * ['slave0', 'slave1'])
+    for node in [master] + slaves:
+        assert node.BlenderVR.quitted is None
+
+
+def test_local_slaves_read_the_private_shared_file():
+    master, slaves = _connect(_freePort(), 2, local=True)
+    path = master._shared_path
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert [slave._shared_path for slave in slaves] == [path, path]
+        for size in (1024, 2 * connector.SHARED_INITIAL_SIZE):
+            message = bytes(range(256)) * (size // 256)
+            assert _frame(master, slaves, message) == [message] * len(slaves)
+    finally:
+        for slave in slaves:
+            slave.quit('end of test')
+        master.quit('end of test')
+    assert not os.path.exists(path)
+
+
+def test_growing_the_shared_file_releases_the_previous_mappings():
+    master, slaves = _connect(_freePort(), 1, local=True)
+    try:
+        message = bytes(range(256)) * 4
+        assert _frame(master, slaves, message) == [message]
+        mappings = [master._shared, slaves[0]._shared]
+        message = bytes(range(256)) * (connector.SHARED_INITIAL_SIZE // 128)
+        assert _frame(master, slaves, message) == [message]
+        assert len(master._shared) >= len(message)
+        assert [mapping.closed for mapping in mappings] == [True, True]
+        assert _frame(master, slaves, message[::-1]) == [message[::-1]]
+    finally:
+        for slave in slaves:
+            slave.quit('end of test')
+        master.quit('end of test')
+
+
+class _Synchronizer:
+    """Objects the slaves asked the master to send again"""
+
+    def __init__(self):
+        self.resent = []
+
+    def resendObject(self, object_id):
+        self.resent.append(object_id)
+
+
+def test_slaves_ask_for_objects_with_their_barrier():
+    master, slaves = _connect(_freePort(), 2)
+    master._synchronizer = _Synchronizer()
+    try:
+        slaves[0].requestResend(5)
+        slaves[1].requestResend(7)
+        slaves[1].requestResend(1 << 20)
+        message = bytes(range(256))
+        assert _frame(master, slaves, message) == [message] * len(slaves)
+        assert sorted(master._synchronizer.resent) == [5, 7, 1 << 20]
+        # Asked once
+        assert _frame(master, slaves, message) == [message] * len(slaves)
+        assert len(master._synchronizer.resent) == 3
+        for node in [master] + slaves:
+            assert node.BlenderVR.quitted is None
+    finally:
+        for slave in slaves:
+            slave.quit('end of test')
+        master.quit('end of test')
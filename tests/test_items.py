@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# file: tests/test_items.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+import importlib
+import pkgutil
+
+import pytest
+
+pytest.importorskip('mathutils')
+import bge
+
+from blendervr.player.buffer import Buffer
+from blendervr.player.network import synchronizer
+from blendervr.player.network.synchronizer import schema
+from blendervr.player.network.synchronizer import objects
+from blendervr.player.network.synchronizer.objects import item_object
+
+PROPERTIES = 'speed:float label:string'
+
+
+class _Logger:
+    def __init__(self):
+        self.warnings = []
+
+    def debug(self, *args):
+        pass
+
+    info = error = debug
+
+    def warning(self, *args):
+        self.warnings.append(args)
+
+
+class _BlenderVR:
+    """Just what the synchronizer needs from the player"""
+
+    def __init__(self, master):
+        self._logger = _Logger()
+        self._master = master
+
+    def isMaster(self):
+        return self._master
+
+
+def _item(master, name='Cube'):
+    network = synchronizer.Master(_BlenderVR(True), {}) if master \
+                                    else synchronizer.Slave(_BlenderVR(False))
+    return network.getSceneSynchronizer().getItem(
+                                            bge.types.KX_GameObject(name))
+
+
+def _attributesChanges(values):
+    """What the master sends when the properties of an object change"""
+    target = bge.types.KX_GameObject('Cube')
+    tracker = schema.Tracker(schema.getPropertiesSchema(PROPERTIES), target)
+    buff = Buffer()
+    for speed, label in values:
+        target['speed'] = speed
+        target['label'] = label
+        buff.command(item_object.Object.SET_ATTRIBUTES)
+        buff.unsigned_char(0)
+        buff.raw(tracker.getChanges())
+    return Buffer(bytes(buff.getData()))
+
+
+def test_unknown_attributes_wait_for_their_schema():
+    slave = _item(False)
+    slave.processSynchronizerBuffer(_attributesChanges([(1.5, 'first'),
+                                                        (2.5, 'first')]))
+    assert 'speed' not in slave._item
+    slave.synchronizeAttributes(schema.getPropertiesSchema(PROPERTIES))
+    assert slave._item['speed'] == 2.5
+    assert slave._item['label'] == 'first'
+    assert slave._pending_attributes is None
+
+
+class _Connector:
+    def __init__(self):
+        self.resend = []
+
+    def requestResend(self, object_id):
+        self.resend.append(object_id)
+
+
+def test_lost_attributes_are_sent_again_by_the_master():
+    master = _item(True)
+    master._item[item_object.Object.PROPERTIES_PROPERTY] = PROPERTIES
+    master.synchronizeAttributes(schema.getPropertiesSchema(PROPERTIES))
+    slave = _item(False)
+    network = slave.getParent()._synchronizer
+    network._connector = _Connector()
+    network.addSynchronizedObject(7, slave)
+
+    def frame():
+        buff = Buffer()
+        master.writeSynchronizerBuffer(buff)
+        slave.processSynchronizerBuffer(Buffer(bytes(buff.getData())))
+
+    # The label is only sent with the first changes, that are dropped
+    master._item['label'] = 'first'
+    for index in range(item_object.PENDING_ATTRIBUTES + 10):
+        master._item['speed'] = float(index)
+        frame()
+    assert slave._pending_attributes is None
+    assert len(slave.logger.warnings) == 1
+    slave.synchronizeAttributes(schema.getPropertiesSchema(PROPERTIES))
+    assert network._connector.resend == [7]
+    assert 'label' not in slave._item
+
+    master.resynchronize()
+    frame()
+    assert slave._item['speed'] == master._item['speed']
+    assert slave._item['label'] == 'first'
+
+
+@pytest.mark.parametrize('properties', [{'label': 'missing speed'},
+                                        {'speed': 1.0, 'label': 'big',
+                                         'count': 1 << 40}])
+def test_invalid_attributes_do_not_abort_the_frame(properties):
+    master = _item(True)
+    master.synchronizeAttributes(schema.getPropertiesSchema(
+                                            PROPERTIES + ' count:integer'))
+    for name, value in properties.items():
+        master._item[name] = value
+    for frame in range(3):
+        buff = Buffer()
+        master.writeSynchronizerBuffer(buff)
+        assert bytes(buff.getData()) == b''
+    assert len(master.logger.warnings) == 1
+    for name, value in (('speed', 2.0), ('label', 'valid'), ('count', 3)):
+        master._item[name] = value
+    buff = Buffer()
+    master.writeSynchronizerBuffer(buff)
+    assert len(buff) > 0
+
+
+def _itemModules():
+    for module in pkgutil.iter_modules(objects.__path__):
+        if module.name.startswith('item_') and module.name != 'item_base':
+            yield importlib.import_module(objects.__name__ + '.'
+                                          + module.name)
+
+
+@pytest.mark.parametrize('module', list(_itemModules()),
+                         ids=lambda module: module.__name__.split('.')[-1])
+def test_item_classes_have_slots(module):
+    for item_class in (module.Master, module.Slave):
+        for base_class in item_class.__mro__[:-1]:
+            assert '__slots__' in vars(base_class), base_class
+
+
+@pytest.mark.parametrize('master', [True, False])
+def test_items_have_no_dict(master):
+    item = _item(master)
+    assert isinstance(item, item_object.Object)
+    root = item.getParent().getItem(bge.logic)
+    scene = item.getParent().getItem(bge.types.KX_Scene())
+    for item in (item, root, scene):
+        assert not hasattr(item, '__dict__'), item
+
+
+def test_slave_creates_the_first_object_of_an_empty_scene():
+    network = synchronizer.Slave(_BlenderVR(False))
+    scene = network.getSceneSynchronizer().getItem(bge.types.KX_Scene())
+    item = scene.getItemByName('Cube', 0)
+    assert str(item) == 'Cube'
+    assert item in scene._bound_sub_items
+    # Bound to the master, so not given to another item of that name
+    assert scene.getItemByName('Cube', 0) is not item
+
+
+def _armature(master):
+    network = synchronizer.Master(_BlenderVR(True), {}) if master \
+                                    else synchronizer.Slave(_BlenderVR(False))
+    return network.getSceneSynchronizer().getItem(
+                bge.types.BL_ArmatureObject('Armature', ('Arm', 'Hand')))
+
+
+def test_armature_pose_keeps_axis_angle_channels():
+    master = _armature(True)
+    arm, hand = master._item.channels
+    arm.rotation_mode = -1
+    arm.rotation_euler = [0.5, 0.25, 0.125]
+    hand.rotation_quaternion = [0.0, 1.0, 0.0, 0.0]
+    buff = Buffer()
+    master._addPose(buff)
+
+    slave = _armature(False)
+    slave.processSynchronizerBuffer(Buffer(bytes(buff.getData())))
+    arm, hand = slave._item.channels
+    assert arm.rotation_mode == -1
+    assert list(arm.rotation_euler) == [0.5, 0.25, 0.125]
+    assert hand.rotation_mode == 0
+    assert list(hand.rotation_quaternion) == [0.0, 1.0, 0.0, 0.0]
+    assert slave._item.updates == 1
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# file: tests/test_projection.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from blendervr.tools import projection
+
+CORNERS = {'topLeftCorner': (-1.2, 1.0, -1.5),
+           'topRightCorner': (1.0, 1.1, -1.4),
+           'bottomRightCorner': (1.0, -0.9, -1.3)}
+
+
+class _User:
+    def __init__(self, position):
+        self._position = position
+
+    def getPosition(self):
+        return self._position
+
+    def getEyeSeparation(self):
+        return 0.065
+
+
+class _Camera:
+    near = 0.1
+    far = 250.0
+
+
+class _Wall:
+    """What wall.Device._computeProjection() reads from the device"""
+
+
+def _mathutilsProjection(position, eye, scale, depth):
+    mathutils = pytest.importorskip('mathutils')
+    from blendervr.player.screen import base
+    from blendervr.player.screen import wall
+
+    device = _Wall()
+    device._screen_informations = \
+                    base.Base.computeScreenRegardingCorners(device, CORNERS)
+    device._window = base.Base.getWindowCoordinates(
+                                        device, device._screen_informations)
+    device._buffers = {'eye': {'eye': eye}}
+    matrix = mathutils.Matrix([list(row) for row in position])
+    return wall.Device._computeProjection(device, 'eye', _User(matrix),
+                                          _Camera(), depth, scale)
+
+
+@pytest.mark.parametrize('eye', [-1.0, 1.0])
+@pytest.mark.parametrize('scale', [1.0, 2.5])
+def test_projection_matches_the_wall_screen(eye, scale):
+    rotation = numpy.array([[0.0, -1.0, 0.0], [1.0, 0.0, 0.0],
+                            [0.0, 0.0, 1.0]])
+    positions = []
+    for index, location in enumerate([(0.0, 0.0, 0.0), (0.3, -0.2, 0.4),
+                                      (-0.5, 0.1, 1.2)]):
+        position = numpy.identity(4)
+        if index == 2:
+            position[:3, :3] = rotation
+        position[:3, 3] = location
+        positions.append(position)
+    depth = 12.0
+
+    to_local, window = projection.getScreenFrame(CORNERS)
+    projections = projection.Wall(to_local, window).getProjections(
+                        positions, [eye * 0.065 / 2.0] * len(positions),
+                        _Camera.near, _Camera.far, scale, depth)
+    for position, batched in zip(positions, projections):
+        expected = _mathutilsProjection(position, eye, scale, depth)
+        assert numpy.allclose(batched, [list(row) for row in expected],
+                              atol=1e-6)
+
+
+def test_projection_requires_numpy(monkeypatch):
+    monkeypatch.setattr(projection, 'numpy', None)
+    with pytest.raises(ImportError) as error:
+        projection.getScreenFrame(CORNERS)
+    assert 'numpy' in str(error.value)
+    with pytest.raises(ImportError):
+        projection.Wall(numpy.identity(4), (-1.0, 1.0, -1.0, 1.0))
+
+
+class _Logger:
+    def info(self, *args):
+        pass
+
+    debug = warning = error = info
+
+    def log_traceback(self, error):
+        raise
+
+
+class _VehicleUser(_User):
+    def __init__(self, position, vehicle, eye_separation):
+        _User.__init__(self, position)
+        self._vehicle = vehicle
+        self._eye_separation = eye_separation
+
+    def getVehiclePosition(self):
+        return self._vehicle
+
+    def getEyeSeparation(self):
+        return self._eye_separation
+
+
+class _BlenderVR:
+    """Just what the screens need from the player"""
+
+    def __init__(self, users):
+        self._logger = _Logger()
+        self._users = users
+        self.scale = 1.5
+
+    def getUserByName(self, name):
+        return self._users[name]
+
+
+def _pose(mathutils, location, angle):
+    return mathutils.Matrix.Translation(location) \
+                                * mathutils.Matrix.Rotation(angle, 4, 'Z')
+
+
+DEVICES = {
+    'wall': {'corners': CORNERS},
+    'planovision': {'corners': {'topLeftCorner': (-1.0, 1.0, 0.0),
+                                'topRightCorner': (1.0, 1.0, 0.0),
+                                'bottomRightCorner': (1.0, -1.0, 0.0)}},
+    'hmd': {'left': {'corners': {'topLeftCorner': (-0.1, 0.05, -0.1),
+                                 'topRightCorner': (0.02, 0.05, -0.1),
+                                 'bottomRightCorner': (0.02, -0.05, -0.1)}},
+            'right': {'corners': {'topLeftCorner': (-0.02, 0.05, -0.1),
+                                  'topRightCorner': (0.1, 0.05, -0.1),
+                                  'bottomRightCorner': (0.1, -0.05, -0.1)}}},
+}
+
+
+@pytest.mark.parametrize('device_type', sorted(DEVICES))
+def test_screen_batch_matches_each_buffer(device_type):
+    mathutils = pytest.importorskip('mathutils')
+    import bge
+    from blendervr.player import screen
+
+    users = {'first': _VehicleUser(_pose(mathutils, (0.3, -0.2, 0.4), 0.3),
+                                   _pose(mathutils, (1.0, 0.0, 0.5), 0.2),
+                                   0.065),
+             'second': _VehicleUser(_pose(mathutils, (-0.5, 0.1, 1.2), -1.0),
+                                    _pose(mathutils, (0.0, 2.0, 0.0), 0.0),
+                                    0.07)}
+    configuration = {'device_type': device_type, device_type:
+                     DEVICES[device_type], 'viewport': None,
+                     'keep_focus': False, 'graphic_buffer': [
+                         {'buffer': 'left', 'user': 'first', 'eye': 'left'},
+                         {'buffer': 'right', 'user': 'second',
+                          'eye': 'right'},
+                         {'buffer': 'middle', 'user': 'first',
+                          'eye': 'middle'}]}
+    device = screen.getScreen(_BlenderVR(users), configuration)
+    assert device._batch is not None
+    camera = bge.types.KX_Camera('Camera')
+    camera.near = _Camera.near
+    camera.far = _Camera.far
+    camera.worldPosition = (0.5, -1.0, 2.0)
+    camera.modelview_matrix = _pose(mathutils, (0.0, 1.0, -3.0), 0.7)
+    depth = (camera.near + camera.far) / 2.0
+    device._camera = camera
+
+    batch = device.getBuffersMatrices(camera, depth)
+    if device_type == 'hmd':
+        # Only the buffers that have a screen
+        assert sorted(batch) == ['left', 'right']
+    else:
+        assert sorted(batch) == ['left', 'middle', 'right']
+    for name, (projection_matrix, view, transform) in batch.items():
+        camera.worldPosition = (0.5, -1.0, 2.0)
+        device._updateMatrixForBuffer(name, camera, depth)
+        assert numpy.allclose(projection_matrix, camera.projection_matrix,
+                              atol=1e-5)
+        assert numpy.allclose(transform[0], camera.worldPosition, atol=1e-5)
+        assert numpy.allclose(transform[1].to_matrix(),
+                              camera.worldOrientation, atol=1e-5)
+        assert numpy.allclose(view.inverted().translation, transform[0],
+                              atol=1e-5)
+    # Static users and camera: the batch is kept, and used for each eye
+    camera.worldPosition = (0.5, -1.0, 2.0)
+    assert device.getBuffersMatrices(camera, depth) is batch
+    device._updateBuffer('right', camera, depth)
+    assert camera.projection_matrix == batch['right'][0]
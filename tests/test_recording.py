@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# file: tests/test_recording.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+"""
+The scenes are built with a test double of the Blender game engine: bge
+scenes cannot be created outside of Blender
+"""
+
+import gc
+import socket
+
+import pytest
+
+mathutils = pytest.importorskip('mathutils')
+import bge
+
+from blendervr.player.network import connector
+from blendervr.player.network import synchronizer
+from blendervr.tools import profiler
+from blendervr.tools import recording
+
+NAMES = ['Cube', 'Lamp', 'Sphere', 'Cone']
+
+
+class _Logger:
+    def debug(self, *args):
+        pass
+
+    info = warning = error = debug
+
+    def log_traceback(self, error):
+        raise
+
+
+class _BlenderVR:
+    """Just what the network needs from the player"""
+
+    def __init__(self, master):
+        self._logger = _Logger()
+        self._master = master
+
+    def isMaster(self):
+        return self._master
+
+
+def _freePort():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(('', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def _scene():
+    scene = bge.types.KX_Scene()
+    for name in NAMES:
+        scene.addObject(name)
+    return scene
+
+
+def _state(scene):
+    return dict((item.name, (tuple(item.worldPosition), item.visible))
+                for item in scene.objects)
+
+
+class _Master:
+    """Master without slaves, running the frames of the player"""
+
+    def __init__(self, path=None):
+        self.scene = bge.logic.scene = _scene()
+        BlenderVR = _BlenderVR(True)
+        configuration = {'port': _freePort(), 'nodes': ['master']}
+        if path is not None:
+            configuration['synchronization'] = {'record': path}
+        self.connector = connector.Master(BlenderVR, configuration)
+        self.synchronizer = synchronizer.Master(BlenderVR, {})
+        self.connector._synchronizer = self.synchronizer
+        self.synchronizer._connector = self.connector
+        self.connector.wait_for_everybody()
+        self.synchronizer.start()
+        self.synchronizer.getSceneSynchronizer().getItem(bge.logic).activate(
+                                                                True, True)
+
+    def frame(self, logic=None):
+        self.connector.run()
+        if logic is not None:
+            logic(self.scene)
+        self.connector.endFrame()
+        self.connector.barrier()
+
+    def quit(self):
+        self.connector.stopRecording()
+        self.connector._socket.close()
+
+
+def _move(name, position, visible=True):
+    def logic(scene):
+        for item in scene.objects:
+            if item.name == name:
+                item.worldPosition = mathutils.Vector(position)
+                item.visible = visible
+    return logic
+
+
+def _replay(path):
+    """State of the scene of a slave that replayed the recording, and its
+    number of frames"""
+    scene = bge.logic.scene = _scene()
+    slave = synchronizer.Slave(_BlenderVR(False))
+    slave.start()
+    frames = recording.Recording(path)
+    recording.replay(frames, slave)
+    state = _state(scene)
+    # Each object is bound to one item of the master
+    assert len(slave._objects._items) == len(NAMES) + 2
+    count = len(frames)
+    # The objects of the test double keep views on the frames
+    del(scene, slave)
+    bge.logic.scene = None
+    gc.collect()
+    frames.close()
+    return state, count
+
+
+def test_recording_started_during_the_session(tmp_path):
+    path = str(tmp_path / 'late.bvr')
+    master = _Master()
+    try:
+        master.frame(_move('Cube', (1.0, 2.0, 3.0)))
+        master.frame(_move('Lamp', (0.0, 0.0, 5.0), visible=False))
+        # Started by the processor, after the synchronization of this frame
+        master.frame(lambda scene: master.connector.startRecording(path))
+        master.frame()
+        master.frame(_move('Sphere', (4.0, 0.0, 0.0)))
+        master.frame()
+    finally:
+        master.quit()
+
+    assert _replay(path) == (_state(master.scene), 3)
+
+
+def test_snapshot_inside_a_recording(tmp_path):
+    path = str(tmp_path / 'whole.bvr')
+    master = _Master(path)
+    try:
+        master.frame(_move('Cube', (1.0, 2.0, 3.0)))
+        master.synchronizer.sendSnapshot()
+        master.frame(_move('Cone', (0.0, 1.0, 0.0), visible=False))
+        master.frame(_move('Cube', (3.0, 2.0, 1.0)))
+        master.frame()
+    finally:
+        master.quit()
+
+    # The items created again by the snapshot are ignored
+    assert _replay(path) == (_state(master.scene), 4)
+
+
+@pytest.mark.parametrize('codec', ['raw', 'quantized'])
+def test_transforms_are_profiled_by_object(tmp_path, codec):
+    path = str(tmp_path / 'profile.bvr')
+    master = _Master(path)
+    master.synchronizer._codec = synchronizer.codec.getCodec(
+                                                        {'codec': codec})
+    master.synchronizer.startProfile()
+    try:
+        for frame in range(4):
+            master.frame(_move('Cube', (float(frame), 2.0, 3.0)))
+        master.frame(_move('Lamp', (0.0, 0.0, 5.0)))
+    finally:
+        live = master.synchronizer.stopProfile()
+        master.quit()
+
+    stream = recording.Recording(path)
+    recorded = profiler.profileRecording(stream)
+    stream.close()
+    # The moving object is the biggest one, whatever the profile
+    for profile in (live, recorded):
+        assert profile.getTopObjects(1)[0][0] == 'Cube'
+    for name in ('Cube', 'Lamp'):
+        assert live.getObjects()[name][0] == recorded.getObjects()[name][0]
+    assert live.getCommands()['TRANSFORMS'][0] == \
+                                    recorded.getCommands()['TRANSFORMS'][0]
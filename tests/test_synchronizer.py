@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# file: tests/test_synchronizer.py
+
+## Copyright (C) LIMSI-CNRS (2014)
+##
+## contributor(s) : Jorge Gascon, Damien Touraine, David Poirier-Quinot,
+## Laurent Pointal, Julian Adenauer,
+##
+## This software is a computer program whose purpose is to distribute
+## blender to render on Virtual Reality device systems.
+##
+## This software is governed by the CeCILL  license under French law and
+## abiding by the rules of distribution of free software.  You can  use,
+## modify and/ or redistribute the software under the terms of the CeCILL
+## license as circulated by CEA, CNRS and INRIA at the following URL
+## "http://www.cecill.info".
+##
+## As a counterpart to the access to the source code and  rights to copy,
+## modify and redistribute granted by the license, users are provided only
+## with a limited warranty  and the software's author,  the holder of the
+## economic rights,  and the successive licensors  have only  limited
+## liability.
+##
+## In this respect, the user's attention is drawn to the risks associated
+## with loading,  using,  modifying and/or developing or reproducing the
+## software by the user in light of its specific status of free software,
+## that may mean  that it is complicated to manipulate,  and  that  also
+## therefore means  that it is reserved for developers  and  experienced
+## professionals having in-depth computer knowledge. Users are therefore
+## encouraged to load and test the software's suitability as regards their
+## requirements in conditions enabling the security of their systems and/or
+## data to be ensured and,  more generally, to use and operate it in the
+## same conditions as regards security.
+##
+## The fact that you are presently reading this means that you have had
+## knowledge of the CeCILL license and that you accept its terms.
+
+import pytest
+
+mathutils = pytest.importorskip('mathutils')
+import bge
+
+from blendervr.player.buffer import Buffer
+from blendervr.player.network import synchronizer
+
+
+class _Logger:
+    def debug(self, *args):
+        pass
+
+    info = warning = error = debug
+
+
+class _BlenderVR:
+    """Just what the synchronizer needs from the player"""
+
+    def __init__(self):
+        self._logger = _Logger()
+
+    def isMaster(self):
+        return True
+
+
+class _Object:
+    pass
+
+
+class _Connector:
+    CMD_SYNCHRO = b's'
+    BUFFER_SIZE = 1 << 20
+
+    def isReady(self):
+        return True
+
+    def send(self, command, buff):
+        pass
+
+
+def _rateState(master, object_id):
+    return (object_id in master._periods, object_id in master._priorities,
+            object_id in master._nextDue, object_id in master._touched,
+            object_id in master._deferred)
+
+
+@pytest.fixture
+def master():
+    return synchronizer.Master(_BlenderVR(), {})
+
+
+def test_removal_clears_the_rate_state(master):
+    master.setSynchronizationRate(1, period=4, priority=2)
+    master.setSynchronizationRate(2, period=0)
+    for object_id in (1, 2, 3):
+        master.addSynchronizedObject(object_id, _Object())
+    master.touchSynchronizedObject(1)
+    master._deferred.append(3)
+    assert _rateState(master, 1) == (True, True, True, True, False)
+    assert _rateState(master, 2) == (True, False, False, True, False)
+
+    for object_id in (1, 2, 3):
+        assert master.removeSynchronizedObject(object_id) is not None
+        assert _rateState(master, object_id) == (False,) * 5
+    assert master._periods == {} and master._priorities == {}
+    assert master._nextDue == {}
+    assert master._touched == set() and master._deferred == []
+
+
+def test_deactivation_keeps_the_rate_class(master):
+    master.setSynchronizationRate(1, period=4, priority=2)
+    master.addSynchronizedObject(1, _Object())
+    master.removeSynchronizedObject(1, keep_rate=True)
+    assert _rateState(master, 1) == (True, True, False, False, False)
+    master.addSynchronizedObject(1, _Object())
+    assert master._nextDue[1] == master._frame + 1
+
+
+def test_removed_object_is_not_polled(master):
+    master.setSynchronizationRate(1, period=2)
+    master.addSynchronizedObject(1, _Object())
+    master.removeSynchronizedObject(1)
+    for frame in range(4):
+        master._frame += 1
+        assert 1 not in master._getDueObjects()
+    assert master._schedule == []
+
+
+def _scene(master, count):
+    """Objects of a scene whose frames are sent by master, and the names of
+    the objects whose transform the master sends at each frame"""
+    bge.logic.scene = bge.types.KX_Scene(count)
+    master._connector = _Connector()
+    master.start()
+    objects = master.getSceneSynchronizer()
+    objects.getItem(bge.logic).activate(True, True)
+    sent = []
+    writeTransforms = objects.writeTransforms
+
+    def spyTransforms(buff):
+        transforms = Buffer()
+        writeTransforms(transforms)
+        buff += transforms
+        if not transforms.isEmpty():
+            ids = Buffer(bytes(transforms.getData())).array('I')
+            sent.append(set(str(master.getObjectByID(int(object_id)))
+                            for object_id in ids))
+        else:
+            sent.append(set())
+    objects.writeTransforms = spyTransforms
+    return bge.logic.scene.objects, sent
+
+
+def test_only_moved_transforms_are_sent(master):
+    scene, sent = _scene(master, 4)
+    master.sendSynchronization()
+    assert sent.pop() == set(str(item) for item in scene)
+    master.sendSynchronization()
+    assert sent.pop() == set()
+    scene[1].worldPosition = mathutils.Vector((1.0, 2.0, 3.0))
+    master.sendSynchronization()
+    assert sent.pop() == set(['object1'])
+    # Changed in place, as the logic bricks do
+    scene[2].worldScale[0] = 2.0
+    master.sendSynchronization()
+    assert sent.pop() == set(['object2'])
+    master.sendSynchronization()
+    assert sent.pop() == set()
+
+
+def test_rated_transforms_wait_for_their_object(master):
+    scene, sent = _scene(master, 3)
+    objects = master.getSceneSynchronizer()
+    rated = objects.getItem(scene[0])
+    rated.setSynchronizationRate(0)
+    master.sendSynchronization()
+    sent.pop()
+    for item in scene:
+        item.worldPosition[2] = 1.0
+    master.sendSynchronization()
+    assert sent.pop() == set(['object1', 'object2'])
+    rated.touch()
+    master.sendSynchronization()
+    assert sent.pop() == set(['object0'])
+
+    # With a byte budget, every transform is sent with its object
+    master.setSynchronizationBudget(1 << 20)
+    scene[1].worldPosition[2] = 2.0
+    master.sendSynchronization()
+    assert sent.pop() == set(['object1'])
+    master.setSynchronizationBudget(0)
+    scene[2].worldPosition[2] = 2.0
+    master.sendSynchronization()
+    assert sent.pop() == set(['object2'])
+
+
+def test_master_draws_the_decoded_transforms():
+    master = synchronizer.Master(_BlenderVR(), {'codec': 'quantized',
+                                                'position_precision': 0.01})
+    scene, sent = _scene(master, 2)
+    objects = master.getSceneSynchronizer()
+    master.sendSynchronization()
+    sent.pop()
+    moving, mirrored = scene
+    moving.worldPosition = mathutils.Vector((1.234, 0.0, 0.0))
+    orientation = mathutils.Matrix.Identity(3)
+    orientation[0][0] = -1.0
+    mirrored.worldOrientation = orientation
+    master.sendSynchronization()
+    assert sent.pop() == set(['object0', 'object1'])
+    # Drawn as the slaves decode it, then given back to the game logic
+    assert moving.worldPosition[0] == pytest.approx(1.23)
+    assert mirrored.worldOrientation == orientation
+    objects.restoreTransforms()
+    assert moving.worldPosition[0] == pytest.approx(1.234)
+
+    # At rest, the decoded transform stays, even once moved under the
+    # precision, and nothing is sent again
+    master.sendSynchronization()
+    assert sent.pop() == set()
+    objects.restoreTransforms()
+    assert moving.worldPosition[0] == pytest.approx(1.23)
+    moving.worldPosition[0] += 0.004
+    master.sendSynchronization()
+    assert sent.pop() == set(['object0'])
+    assert moving.worldPosition[0] == pytest.approx(1.23)
+    objects.restoreTransforms()
+    assert moving.worldPosition[0] == pytest.approx(1.234)